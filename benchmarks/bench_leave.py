@@ -0,0 +1,303 @@
+# bench_leave.py
+#
+# Micro-benchmarks for xero_payroll.leave at synthetic tenant sizes. The leave functions
+# run against an in-memory stand-in for XeroAPI (installed with set_xero_client), so
+# only the leave code itself is measured: time per call, and peak memory allocated
+# during a call (tracemalloc).
+#
+#   python benchmarks/bench_leave.py --sizes 100 1000 10000 100000 1000000
+#   python benchmarks/bench_leave.py --output benchmarks/baselines/leave.json     # store a baseline
+#   python benchmarks/bench_leave.py --baseline benchmarks/baselines/leave.json   # compare, exit 1 on regression
+#
+# --backend list feeds every application through XeroAPI.iter_leave_applications (the
+# path taken when the local leave store is disabled); --backend store syncs them into a
+# LeaveApplicationStore first, so lookups only touch the employee's own rows.
+#
+# Each function is measured cold - every leave application parsed, as in a one-shot
+# webhook process - and warm, with leave's parsed-application cache kept between calls
+# as in the daemon. Baselines are compared on the cold figures.
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta, timezone
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+# The benchmark installs its own store (or none); keep xero_payroll from opening the default one
+os.environ["XERO_LEAVE_STORE_FILE"] = ""
+
+from xero_payroll import leave  # noqa: E402
+from xero_payroll.api import set_xero_client  # noqa: E402
+from xero_payroll.sync import LeaveApplicationStore  # noqa: E402
+
+DEFAULT_SIZES = (100, 1000, 10000, 100000, 1000000)
+
+# Distinct application records generated; larger tenants repeat them under other ids
+TEMPLATE_COUNT = 10000
+
+# Each measurement repeats calls until at least this much time has passed
+MIN_SAMPLE_SECONDS = 0.2
+
+LEAVE_TYPES = (
+    ("Annual Leave", "LT-ANNUAL"),
+    ("Personal/Carer's Leave", "LT-PERSONAL"),
+    ("Long Service Leave", "LT-LSL"),
+    ("Other Unpaid Leave", "LT-UNPAID"),
+)
+
+
+def xero_date(value: date) -> str:
+    moment = datetime(value.year, value.month, value.day, tzinfo=timezone.utc)
+    return "/Date(%d+0000)/" % int(moment.timestamp() * 1000)
+
+
+class SyntheticTenant:
+    """
+    A tenant with `employees` employees and `applications` leave applications, dealt out
+    round robin so every employee holds 1/employees of them. Generated from `seed`, so
+    a given size always produces the same records.
+    """
+
+    def __init__(self, applications: int, employees: int = 50, seed: int = 1, today: date = None):
+        rng = random.Random(seed)
+        today = today or date.today()
+        self.size = applications
+        self.employee_ids = [f"00000000-0000-4000-8000-{i:012d}" for i in range(employees)]
+        self.employees = {
+            employee_id: {
+                "EmployeeID": employee_id,
+                "FirstName": f"First{i}",
+                "LastName": f"Last{i}",
+                "Status": "ACTIVE",
+                "LeaveBalances": [
+                    {"LeaveName": name, "LeaveTypeID": type_id, "NumberOfUnits": round(rng.uniform(0, 200), 4)}
+                    for name, type_id in LEAVE_TYPES
+                ],
+            }
+            for i, employee_id in enumerate(self.employee_ids)
+        }
+        # Templates are shared between applications, so even 1M applications stay small in memory
+        template_count = max(employees, min(applications, TEMPLATE_COUNT) // employees * employees)
+        self.templates = []
+        for t in range(template_count):
+            start = today + timedelta(days=rng.randint(-365, 365))
+            days = rng.randint(1, 5)
+            status = "PROCESSED" if start < today else rng.choice(("SCHEDULED", "APPROVED", "APPROVED"))
+            self.templates.append({
+                "LeaveApplicationID": f"10000000-0000-4000-8000-{t:012d}",
+                "EmployeeID": self.employee_ids[t % employees],
+                "LeaveTypeID": rng.choice(LEAVE_TYPES[:3])[1],
+                "Title": "Leave",
+                "StartDate": xero_date(start),
+                "EndDate": xero_date(start + timedelta(days=days - 1)),
+                "UpdatedDateUTC": "/Date(1735689600000+0000)/",
+                "LeavePeriods": [
+                    {"NumberOfUnits": 7.6, "LeavePeriodStatus": status,
+                     "PayPeriodStartDate": xero_date(start + timedelta(days=d)),
+                     "PayPeriodEndDate": xero_date(start + timedelta(days=d))}
+                    for d in range(days)
+                ],
+            })
+
+    def applications(self, unique_ids: bool = False):
+        """Yields every application; with unique_ids each gets its own LeaveApplicationID (copies)."""
+        templates = self.templates
+        count = len(templates)
+        for i in range(self.size):
+            app = templates[i % count]
+            if unique_ids:
+                app = dict(app, LeaveApplicationID=f"10000000-0000-4000-8000-{i:012d}")
+            yield app
+
+
+class FakeXeroClient:
+    """The parts of XeroAPI the leave functions use, answered from a SyntheticTenant."""
+
+    def __init__(self, tenant: SyntheticTenant):
+        self.tenant = tenant
+        self.calls = 0
+
+    def get_tenant_id(self):
+        return "bench-tenant"
+
+    def remaining_budget(self):
+        return None
+
+    def get(self, endpoint, params=None, memoize=True):
+        self.calls += 1
+        employee = self.tenant.employees.get(endpoint.split("/", 1)[-1])
+        return {"Employees": [employee] if employee else []}
+
+    def iter_leave_applications(self, prefetch=False, modified_since=None, fresh=False, **kwargs):
+        self.calls += 1
+        if modified_since:
+            return iter(())
+        return self.tenant.applications(unique_ids=fresh)
+
+    def iter_employees(self, prefetch=False, **kwargs):
+        self.calls += 1
+        return iter(self.tenant.employees.values())
+
+    def get_employees_detailed(self, employee_ids, max_workers=None):
+        self.calls += 1
+        return [self.tenant.employees.get(employee_id, {}) for employee_id in employee_ids]
+
+
+def benchmarks(employee_id: str):
+    """(name, callable) pairs for the functions under test."""
+    future = date.today() + timedelta(days=180)
+    return [
+        ("get_future_scheduled_leave", lambda: leave.get_future_scheduled_leave(employee_id, "Annual")),
+        ("get_leave_summary", lambda: leave.get_leave_summary(employee_id)),
+        ("predict_leave_balance", lambda: leave.predict_leave_balance(employee_id, "Annual", future)),
+    ]
+
+
+class _Uncached(dict):
+    """Stands in for leave._application_cache in cold runs: nothing is kept, so every record is parsed."""
+
+    def __setitem__(self, key, value):
+        pass
+
+
+def measure(func, repeats: int) -> dict:
+    """Best time per call over `repeats` samples, then one call under tracemalloc for peak allocation."""
+    best = None
+    for _ in range(repeats):
+        calls = 0
+        started = time.perf_counter()
+        while True:
+            func()
+            calls += 1
+            elapsed = time.perf_counter() - started
+            if elapsed >= MIN_SAMPLE_SECONDS:
+                break
+        per_call = elapsed / calls
+        best = per_call if best is None else min(best, per_call)
+
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"ms_per_call": best * 1000.0, "peak_alloc_kb": max(0, peak - baseline) / 1024.0}
+
+
+def run(sizes, employees: int, backend: str, repeats: int, seed: int) -> dict:
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="xero-payroll-bench-leave-")
+    devnull = open(os.devnull, "w")
+    try:
+        for size in sizes:
+            tenant = SyntheticTenant(size, employees, seed)
+            client = FakeXeroClient(tenant)
+            set_xero_client(client)
+            if backend == "store":
+                store = LeaveApplicationStore(os.path.join(workdir, f"store-{size}.sqlite3"))
+                store.sync(client)
+                leave.leave_application_store = store
+            else:
+                leave.leave_application_store = None
+
+            for name, func in benchmarks(tenant.employee_ids[0]):
+                # The functions print diagnostics per application; keep that cost, but not on the terminal
+                with contextlib.redirect_stdout(devnull):
+                    leave._application_cache = _Uncached()
+                    result = measure(func, repeats)
+                    leave._application_cache = {}
+                    warm = measure(func, repeats)
+                result["us_per_application"] = result["ms_per_call"] * 1000.0 / size
+                result["warm_ms_per_call"] = warm["ms_per_call"]
+                result["warm_peak_alloc_kb"] = warm["peak_alloc_kb"]
+                results.setdefault(name, {})[str(size)] = result
+                print(f"  {name:28s} {size:>9,d} apps  {result['ms_per_call']:10.3f} ms/call  "
+                      f"{result['us_per_application']:8.3f} us/app  {result['peak_alloc_kb']:10.1f} KiB peak  "
+                      f"(warm {warm['ms_per_call']:.3f} ms/call, {warm['peak_alloc_kb']:.1f} KiB)")
+    finally:
+        devnull.close()
+        leave._application_cache = {}
+        leave.leave_application_store = None
+        set_xero_client(None)
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Prints current vs baseline timings and returns the (function, size, ratio) that regressed beyond tolerance."""
+    regressions = []
+    print(f"\nCompared with baseline (commit {baseline.get('environment', {}).get('commit')}):")
+    for name, by_size in results.items():
+        for size, result in by_size.items():
+            before = baseline.get("results", {}).get(name, {}).get(size)
+            if not before:
+                continue
+            ratio = result["ms_per_call"] / before["ms_per_call"] if before["ms_per_call"] else float("inf")
+            alloc_ratio = (result["peak_alloc_kb"] / before["peak_alloc_kb"]) if before["peak_alloc_kb"] else None
+            flag = ""
+            if ratio > tolerance:
+                regressions.append((name, size, ratio))
+                flag = "  REGRESSION"
+            alloc_text = f"{alloc_ratio:5.2f}x alloc" if alloc_ratio is not None else "   - alloc"
+            print(f"  {name:28s} {int(size):>9,d} apps  {ratio:5.2f}x time  {alloc_text}{flag}")
+    return regressions
+
+
+def _git_commit():
+    import subprocess
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark xero_payroll.leave on synthetic tenants")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Leave applications per tenant")
+    parser.add_argument("--employees", type=int, default=50, help="Employees the applications are spread over")
+    parser.add_argument("--backend", choices=("list", "store"), default="list")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the results as JSON (usable as a --baseline later)")
+    parser.add_argument("--baseline", help="Compare with results stored by --output")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="Slowdown factor that counts as a regression")
+    args = parser.parse_args()
+
+    print(f"xero_payroll.leave, backend={args.backend}, {args.employees} employees")
+    results = {
+        "config": {"employees": args.employees, "backend": args.backend, "seed": args.seed},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "commit": _git_commit()},
+        "results": run(args.sizes, args.employees, args.backend, max(1, args.repeats), args.seed),
+    }
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != results["config"]:
+            print(f"Warning: baseline config {baseline.get('config')} differs from {results['config']}")
+        regressions = compare(results["results"], baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.2f}x")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
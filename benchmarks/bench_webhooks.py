@@ -0,0 +1,280 @@
+# bench_webhooks.py
+#
+# End-to-end cost of each webhook event type, measured against the local Xero/Wrike
+# stand-in (stub_server.py) so no credentials or network are involved.
+#
+# Two modes, both on by default:
+#   oneshot  `python main.py '<payload>'` per event, as the webhook runner calls it.
+#            The first run of each event type starts from empty caches (cold), the
+#            following runs reuse the token, cache, leave store and person index files.
+#   daemon   one `python main.py --serve` process answering every event over HTTP.
+#
+# For every event type it reports wall time, Xero/Wrike calls and peak RSS.
+#
+#   python benchmarks/bench_webhooks.py --employees 50 --latency-ms 80 --runs 5 --output bench.json
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stub_server import Dataset, StubServer  # noqa: E402
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(REPO_DIR, "main.py")
+
+BOT_TASK_ID = "BENCHBOT0001"
+
+
+def event_payloads() -> dict:
+    """One webhook payload per event type handled by main.handle_webhook_payload."""
+    today = date.today()
+    return {
+        "Idle": {},
+        "Get Leave Summary": {},
+        "Get Leave Balance": {"leaveType": "Annual"},
+        "Predict Leave Balance at Date": {"leaveType": "Annual", "date": (today + timedelta(days=180)).isoformat()},
+        "Get Leave Balance Timeline": {"leaveType": "Annual", "days": 10},
+        "Get Future Scheduled Leave": {"leaveType": "Annual"},
+        "Get Leave Summary Bulk": {},
+        "Get Xero Employee List": {},
+    }
+
+
+def make_state_dir(root: str) -> str:
+    """Fresh directory holding the token files (valid for an hour) and, later, the caches."""
+    state_dir = tempfile.mkdtemp(prefix="state-", dir=root)
+    expires_at = int(time.time()) + 3600
+    for name in ("xero_tokens.json", "WRIKE_tokens.json"):
+        with open(os.path.join(state_dir, name), "w") as f:
+            json.dump({"access_token": "bench", "refresh_token": "bench", "token_type": "Bearer",
+                       "expires_at": expires_at}, f)
+    return state_dir
+
+
+def handler_environ(stub: StubServer, state_dir: str) -> dict:
+    env = dict(os.environ)
+    env.update(stub.environ())
+    env.update({
+        "XERO_TOKEN_FILE": os.path.join(state_dir, "xero_tokens.json"),
+        "WRIKE_TOKEN_PATH": os.path.join(state_dir, "WRIKE_tokens.json"),
+        "PYTHONPATH": REPO_DIR + os.pathsep + env.get("PYTHONPATH", ""),
+        "PYTHONDONTWRITEBYTECODE": "1",
+    })
+    return env
+
+
+def run_oneshot(stub: StubServer, state_dir: str, payload: dict) -> dict:
+    """Runs `python main.py '<payload>'` once and returns its wall time, calls and peak RSS."""
+    stub.reset_counts()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, MAIN, json.dumps(payload)],
+        cwd=state_dir, env=handler_environ(stub, state_dir),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    # wait4 gives this child's own rusage (RUSAGE_CHILDREN would be the max over all children)
+    _, status, usage = os.wait4(process.pid, 0)
+    wall = time.perf_counter() - started
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return {
+        "wall_ms": wall * 1000.0,
+        "calls": stub.counts(),
+        "peak_rss_kb": _rss_kb(usage.ru_maxrss),
+        "exit_code": process.returncode,
+    }
+
+
+def bench_oneshot(stub: StubServer, root: str, events: dict, runs: int) -> dict:
+    results = {}
+    for event_type, extra in events.items():
+        state_dir = make_state_dir(root)
+        payload = dict(extra, taskId=BOT_TASK_ID, status=event_type)
+        samples = [run_oneshot(stub, state_dir, payload) for _ in range(runs)]
+        cold, warm = samples[0], samples[1:]
+        results[event_type] = {
+            "cold_ms": round(cold["wall_ms"], 1),
+            "cold_calls": cold["calls"],
+            "warm_ms": _summary([s["wall_ms"] for s in warm]),
+            "warm_calls": warm[-1]["calls"] if warm else None,
+            "peak_rss_kb": max(s["peak_rss_kb"] for s in samples),
+            "exit_codes": sorted({s["exit_code"] for s in samples}),
+        }
+        print(f"  oneshot {event_type:32s} cold {cold['wall_ms']:8.1f} ms  "
+              f"warm {results[event_type]['warm_ms'].get('median', float('nan')):8.1f} ms  "
+              f"calls {_calls_text(cold['calls'])} / {_calls_text(results[event_type]['warm_calls'])}  "
+              f"rss {results[event_type]['peak_rss_kb'] / 1024:.1f} MiB")
+    return results
+
+
+def bench_daemon(stub: StubServer, root: str, events: dict, runs: int) -> dict:
+    state_dir = make_state_dir(root)
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, MAIN, "--serve", str(port)],
+        cwd=state_dir, env=handler_environ(stub, state_dir),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    results = {}
+    try:
+        started = time.perf_counter()
+        _wait_for_port(port)
+        results["startup_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+        for event_type, extra in events.items():
+            payload = dict(extra, taskId=BOT_TASK_ID, status=event_type)
+            latencies, calls = [], []
+            for _ in range(runs):
+                stub.reset_counts()
+                started = time.perf_counter()
+                _post_json(f"http://127.0.0.1:{port}/", payload)
+                latencies.append((time.perf_counter() - started) * 1000.0)
+                # Status updates are sent after the response; count them with the event
+                stub.wait_idle()
+                calls.append(stub.counts())
+            results[event_type] = {
+                "first_ms": round(latencies[0], 1),
+                "first_calls": calls[0],
+                "repeat_ms": _summary(latencies[1:]),
+                "repeat_calls": calls[-1] if runs > 1 else None,
+            }
+            print(f"  daemon  {event_type:32s} first {latencies[0]:8.1f} ms  "
+                  f"repeat {results[event_type]['repeat_ms'].get('median', float('nan')):8.1f} ms  "
+                  f"calls {_calls_text(calls[0])} / {_calls_text(results[event_type]['repeat_calls'])}")
+        results["peak_rss_kb"] = _proc_peak_rss_kb(process.pid)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return results
+
+
+def _summary(values) -> dict:
+    if not values:
+        return {}
+    ordered = sorted(values)
+    return {
+        "min": round(ordered[0], 1),
+        "median": round(statistics.median(ordered), 1),
+        "p95": round(ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))], 1),
+        "max": round(ordered[-1], 1),
+    }
+
+
+def _calls_text(calls) -> str:
+    if calls is None:
+        return "-"
+    return f"xero={calls.get('xero', 0)}+{calls.get('xero_token', 0)} wrike={calls.get('wrike', 0)}+{calls.get('wrike_token', 0)}"
+
+
+def _rss_kb(ru_maxrss: int) -> int:
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    return ru_maxrss // 1024 if sys.platform == "darwin" else ru_maxrss
+
+
+def _proc_peak_rss_kb(pid: int):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_port(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.02)
+    raise RuntimeError(f"Daemon did not start listening on port {port}")
+
+
+def _post_json(url: str, payload: dict):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"}, method="POST")
+    with urllib.request.urlopen(request, timeout=300) as response:
+        return json.loads(response.read() or b"null")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark webhook events against the local Xero/Wrike stub")
+    parser.add_argument("--employees", type=int, default=20)
+    parser.add_argument("--applications-per-employee", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Delay the stub adds to every answer")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per event type (the first one is cold)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mode", choices=("oneshot", "daemon", "both"), default="both")
+    parser.add_argument("--events", nargs="*", help="Event types to run (default: all)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    events = event_payloads()
+    if args.events:
+        unknown = set(args.events) - set(events)
+        if unknown:
+            parser.error(f"Unknown event type(s): {', '.join(sorted(unknown))}")
+        events = {name: events[name] for name in args.events}
+
+    dataset = Dataset(args.employees, args.applications_per_employee, args.seed)
+    stub = StubServer(dataset, latency=args.latency_ms / 1000.0).start()
+    root = tempfile.mkdtemp(prefix="xero-payroll-bench-")
+    results = {
+        "config": {
+            "employees": args.employees,
+            "applications_per_employee": args.applications_per_employee,
+            "latency_ms": args.latency_ms,
+            "runs": args.runs,
+            "seed": args.seed,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "commit": _git_commit(),
+        },
+    }
+    print(f"Stub on {stub.url}: {args.employees} employees, {len(dataset.applications)} leave applications, "
+          f"{args.latency_ms:g} ms latency")
+    try:
+        if args.mode in ("oneshot", "both"):
+            results["oneshot"] = bench_oneshot(stub, root, events, max(1, args.runs))
+        if args.mode in ("daemon", "both"):
+            results["daemon"] = bench_daemon(stub, root, events, max(1, args.runs))
+    finally:
+        stub.stop()
+        shutil.rmtree(root, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+# stub_server.py
+#
+# Local stand-in for the Xero payroll, Xero identity and Wrike APIs, so the webhook
+# handler can be benchmarked without network access or real credentials.
+#
+#   python benchmarks/stub_server.py --port 8900 --employees 50 --latency-ms 80
+#
+# Point the handler at it with the environment from StubServer.environ().
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Must match main.py's custom field and item type ids
+CIT_TYPE_ID = "IEAF5D2JPIACSO3J"
+PERSON_ID_CF_ID = "IEAF5D2JJUAGXSTI"
+XERO_EMPLOYEE_CF_ID = "IEAF5D2JJUAJ5DXC"
+TARGET_DATE_CF_ID = "IEAF5D2JJUAJ2ZJG"
+LEAVE_TYPE_CF_ID = "IEAF5D2JJUAJ2ZJJ"
+JOB_HISTORY_CF_ID = "IEAF5D2JJUAIWT6G"
+
+# Xero payroll collections are paged 100 records at a time (xero_payroll.api.PAYROLL_PAGE_SIZE)
+XERO_PAGE_SIZE = 100
+
+LEAVE_TYPES = (
+    ("Annual Leave", "LT-ANNUAL"),
+    ("Personal/Carer's Leave", "LT-PERSONAL"),
+    ("Long Service Leave", "LT-LSL"),
+    ("Other Unpaid Leave", "LT-UNPAID"),
+)
+
+# Every record was last modified at this moment, so If-Modified-Since revalidations get 304s
+DATASET_UPDATED = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def xero_date(value) -> str:
+    """Xero's "/Date(ms+0000)/" encoding of a date or datetime."""
+    if isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day, tzinfo=timezone.utc)
+    return "/Date(%d+0000)/" % int(value.timestamp() * 1000)
+
+
+class Dataset:
+    """
+    Deterministic synthetic organisation: `employees` employees, each with a Wrike CIT
+    task linking a Wrike person id to their Xero EmployeeID, and about
+    `applications_per_employee` leave applications spread over the past and next year.
+    The same seed always produces the same records.
+    """
+
+    def __init__(self, employees: int = 20, applications_per_employee: int = 10, seed: int = 1, today: date = None):
+        rng = random.Random(seed)
+        today = today or date.today()
+        updated = xero_date(DATASET_UPDATED)
+
+        self.employees = []
+        self.applications = []
+        self.cit_tasks = []
+        for i in range(employees):
+            employee_id = f"00000000-0000-4000-8000-{i:012d}"
+            self.employees.append({
+                "EmployeeID": employee_id,
+                "FirstName": f"First{i}",
+                "LastName": f"Last{i}",
+                "Status": "ACTIVE",
+                "Email": f"employee{i}@example.com",
+                "OrdinaryEarningsRateID": "ER-ORDINARY",
+                "UpdatedDateUTC": updated,
+                "LeaveBalances": [
+                    {"LeaveName": name, "LeaveTypeID": type_id, "TypeOfUnits": "Hours",
+                     "NumberOfUnits": round(rng.uniform(0, 200), 4)}
+                    for name, type_id in LEAVE_TYPES
+                ],
+            })
+            for j in range(applications_per_employee):
+                start = today + timedelta(days=rng.randint(-365, 365))
+                days = rng.randint(1, 10)
+                status = "PROCESSED" if start < today else rng.choice(("SCHEDULED", "APPROVED"))
+                self.applications.append({
+                    "LeaveApplicationID": f"10000000-0000-4000-8000-{i:06d}{j:06d}",
+                    "EmployeeID": employee_id,
+                    "LeaveTypeID": rng.choice(LEAVE_TYPES)[1],
+                    "Title": "Leave",
+                    "StartDate": xero_date(start),
+                    "EndDate": xero_date(start + timedelta(days=days - 1)),
+                    "UpdatedDateUTC": updated,
+                    "LeavePeriods": [
+                        {"NumberOfUnits": 7.6, "LeavePeriodStatus": status,
+                         "PayPeriodStartDate": xero_date(start + timedelta(days=d)),
+                         "PayPeriodEndDate": xero_date(start + timedelta(days=d))}
+                        for d in range(days)
+                    ],
+                })
+            self.cit_tasks.append({
+                "id": f"CIT{i:08d}",
+                "customItemTypeId": CIT_TYPE_ID,
+                "updatedDate": "2025-01-01T00:00:00Z",
+                "customFields": [
+                    {"id": PERSON_ID_CF_ID, "value": self.person_id(i)},
+                    {"id": XERO_EMPLOYEE_CF_ID, "value": employee_id},
+                ],
+            })
+        self._by_id = {employee["EmployeeID"]: employee for employee in self.employees}
+
+    @staticmethod
+    def person_id(index: int) -> str:
+        return f"KUWRIKE{index:06d}"
+
+    def employee(self, employee_id: str):
+        return self._by_id.get(employee_id)
+
+    def bot_task(self, task_id: str, person_index: int = 0):
+        """The Wrike bot task a webhook refers to, asking about employee `person_index`."""
+        return {
+            "id": task_id,
+            "customFields": [
+                {"id": PERSON_ID_CF_ID, "value": self.person_id(person_index)},
+                {"id": TARGET_DATE_CF_ID, "value": (date.today() + timedelta(days=180)).isoformat()},
+                {"id": LEAVE_TYPE_CF_ID, "value": "Annual"},
+                {"id": JOB_HISTORY_CF_ID, "value": "<pre>Previous run</pre>"},
+            ],
+        }
+
+
+class StubServer:
+    """
+    Serves a Dataset over HTTP on 127.0.0.1 from a background thread, sleeping
+    `latency` seconds before every answer, and counts the calls it receives by
+    service ("xero", "xero_token", "wrike", "wrike_token") and by endpoint.
+    """
+
+    def __init__(self, dataset: Dataset, port: int = 0, latency: float = 0.0):
+        self.dataset = dataset
+        self.latency = latency
+        self.calls = Counter()
+        self.endpoints = Counter()
+        self.last_request = 0.0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._tokens_issued = 0
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(self))
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def environ(self) -> dict:
+        """Environment variables that point xero_payroll and main.py at this server."""
+        return {
+            "XERO_API_ROOT": self.url,
+            "XERO_TOKEN_URL": f"{self.url}/connect/token",
+            "WRIKE_HOST_ROOT": self.url,
+            # requests_oauthlib refuses to send a bearer token over plain http otherwise
+            "OAUTHLIB_INSECURE_TRANSPORT": "1",
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="stub-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset_counts(self):
+        with self._lock:
+            self.calls.clear()
+            self.endpoints.clear()
+
+    def counts(self) -> dict:
+        with self._lock:
+            return dict(self.calls)
+
+    def wait_idle(self, quiet: float = 0.2, timeout: float = 10.0):
+        """Waits until no request has arrived or been in flight for `quiet` seconds (background status updates)."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                idle = self.in_flight == 0 and time.monotonic() - self.last_request >= quiet
+            if idle:
+                return True
+            time.sleep(quiet / 4)
+        return False
+
+    def _record(self, service: str, endpoint: str):
+        with self._lock:
+            self.calls[service] += 1
+            self.endpoints[f"{service} {endpoint}"] += 1
+            self.in_flight += 1
+            self.last_request = time.monotonic()
+
+    def _done(self):
+        with self._lock:
+            self.in_flight -= 1
+            self.last_request = time.monotonic()
+
+    def _issue_token(self) -> dict:
+        with self._lock:
+            self._tokens_issued += 1
+            n = self._tokens_issued
+        return {
+            "access_token": f"stub-access-{n}",
+            "refresh_token": f"stub-refresh-{n}",
+            "token_type": "Bearer",
+            "expires_in": 1800,
+        }
+
+    # --- Routing ---
+
+    def route(self, method: str, path: str, query: dict, headers) -> tuple:
+        """Returns (service, endpoint, status, body) for a request."""
+        if path == "/connect/token":
+            return "xero_token", "connect/token", 200, self._issue_token()
+        if path == "/oauth2/token":
+            return "wrike_token", "oauth2/token", 200, self._issue_token()
+        if path == "/connections":
+            return "xero", "connections", 200, [{"tenantId": "stub-tenant", "tenantName": "Stub Org"}]
+        if path.startswith("/payroll.xro/1.0/"):
+            return self._route_xero(method, path[len("/payroll.xro/1.0/"):], query, headers)
+        if path.startswith("/api/v4/"):
+            return self._route_wrike(method, path[len("/api/v4/"):], query)
+        return "unknown", path, 404, {"error": "not found"}
+
+    def _route_xero(self, method, endpoint, query, headers):
+        parts = endpoint.strip("/").split("/")
+        collection = parts[0].lower()
+        name = parts[0] if len(parts) == 1 else f"{parts[0]}/{{id}}"
+        if method != "GET":
+            return "xero", f"{method} {name}", 200, {"Status": "OK"}
+
+        if _not_modified(headers.get("If-Modified-Since")):
+            return "xero", name, 304, None
+
+        if collection == "employees" and len(parts) == 2:
+            employee = self.dataset.employee(parts[1])
+            if employee is None:
+                return "xero", name, 404, {"Message": "Employee not found"}
+            return "xero", name, 200, {"Employees": [employee]}
+        if collection == "employees":
+            summaries = [
+                {key: employee[key] for key in ("EmployeeID", "FirstName", "LastName", "Status", "Email", "UpdatedDateUTC")}
+                for employee in self.dataset.employees
+            ]
+            return "xero", name, 200, {"Employees": _page(summaries, query)}
+        if collection == "leaveapplications" and len(parts) == 1:
+            return "xero", name, 200, {"LeaveApplications": _page(self.dataset.applications, query)}
+        return "xero", name, 404, {"Message": "Not found"}
+
+    def _route_wrike(self, method, endpoint, query):
+        parts = endpoint.strip("/").split("/")
+        if parts[0] != "tasks":
+            return "wrike", endpoint, 404, {"error": "not found"}
+        if len(parts) == 2:
+            if method == "PUT":
+                return "wrike", "PUT tasks/{id}", 200, {"kind": "tasks", "data": [{"id": parts[1]}]}
+            return "wrike", "tasks/{id}", 200, {"kind": "tasks", "data": [self.dataset.bot_task(parts[1])]}
+
+        tasks = self.dataset.cit_tasks
+        if "updatedDate" in query:
+            start = json.loads(query["updatedDate"]).get("start", "")
+            tasks = [task for task in tasks if task["updatedDate"] > start]
+        if "customField" in query:
+            # Live lookup: customField={id:'<CF_ID>',value:'<person id>'}
+            wanted = query["customField"].split("value:'", 1)[-1].rstrip("'}")
+            tasks = [task for task in tasks if task["customFields"][0]["value"] == wanted]
+
+        page_size = int(query.get("pageSize", 100))
+        start = int(query.get("nextPageToken", 0) or 0)
+        body = {"kind": "tasks", "data": tasks[start:start + page_size]}
+        if start + page_size < len(tasks):
+            body["nextPageToken"] = str(start + page_size)
+        return "wrike", "tasks", 200, body
+
+
+def _page(records, query):
+    if "page" not in query:
+        return records
+    page = int(query["page"])
+    return records[(page - 1) * XERO_PAGE_SIZE: page * XERO_PAGE_SIZE]
+
+
+def _not_modified(since: str) -> bool:
+    if not since:
+        return False
+    try:
+        moment = datetime.strptime(since, "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc)
+    except ValueError:
+        try:
+            moment = parsedate_to_datetime(since)
+        except (TypeError, ValueError):
+            return False
+    return moment >= DATASET_UPDATED
+
+
+def _make_handler(stub: StubServer):
+    class StubRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+
+        def _handle(self, method):
+            url = urlsplit(self.path)
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+
+            service, endpoint, status, body = stub.route(method, url.path, query, self.headers)
+            stub._record(service, endpoint)
+            try:
+                if stub.latency:
+                    time.sleep(stub.latency)
+                payload = b"" if body is None else json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            finally:
+                stub._done()
+
+        def do_GET(self):
+            self._handle("GET")
+
+        def do_POST(self):
+            self._handle("POST")
+
+        def do_PUT(self):
+            self._handle("PUT")
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubRequestHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Xero/Wrike stand-in server")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--employees", type=int, default=20)
+    parser.add_argument("--applications-per-employee", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    stub = StubServer(Dataset(args.employees, args.applications_per_employee, args.seed),
+                      port=args.port, latency=args.latency_ms / 1000.0)
+    print(f"Stub Xero/Wrike server on {stub.url}; environment:")
+    for name, value in stub.environ().items():
+        print(f"  export {name}={value}")
+    try:
+        stub.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
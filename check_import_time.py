@@ -0,0 +1,94 @@
+# check_import_time.py
+#
+# Cold start check for the one-shot webhook handler: imports main under
+# `python -X importtime` and fails if the import takes longer than the budget or
+# pulls in modules that should only load when an event needs them.
+#
+#   python check_import_time.py [--budget-ms 100] [--runs 5]
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Cumulative import time of main, best of --runs, in milliseconds
+DEFAULT_BUDGET_MS = 100
+
+# Loaded on first use only (HTTP clients, OAuth, timezones, the event loop, the daemon's server)
+DEFERRED_MODULES = (
+    "requests",
+    "requests_oauthlib",
+    "urllib3",
+    "pytz",
+    "numpy",
+    "asyncio",
+    "http.server",
+)
+
+
+def measure(module: str = "main"):
+    """
+    Imports `module` in a fresh interpreter with -X importtime.
+
+    Returns:
+        tuple: (cumulative import time of the module in ms, set of every module imported)
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = REPO_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    # Run from a scratch directory so main's logging setup doesn't create webhook.log in the repo
+    with tempfile.TemporaryDirectory() as cwd:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=cwd, env=env, capture_output=True, text=True,
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+
+    total_us = None
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        imported.add(name.strip())
+        if name.rstrip() == f" {module}":
+            total_us = int(cumulative)
+    if total_us is None:
+        raise RuntimeError(f"No import time reported for {module}")
+    return total_us / 1000.0, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the cold import time of main.py")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    best = None
+    imported = set()
+    for _ in range(max(1, args.runs)):
+        elapsed_ms, imported = measure()
+        best = elapsed_ms if best is None else min(best, elapsed_ms)
+
+    loaded = [name for name in DEFERRED_MODULES if name in imported]
+    print(f"import main: {best:.1f} ms (best of {args.runs}, budget {args.budget_ms:.0f} ms)")
+
+    failed = False
+    if best > args.budget_ms:
+        print(f"FAIL: import time over budget by {best - args.budget_ms:.1f} ms")
+        failed = True
+    if loaded:
+        print(f"FAIL: imported eagerly: {', '.join(loaded)}")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
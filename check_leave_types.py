@@ -0,0 +1,133 @@
+# check_leave_types.py
+#
+# Regression check that the leave projections keep leave types apart: approved leave of
+# one type must only come off that type's balance, and the timeline, bulk projection,
+# prediction and summary must agree on every balance. Runs the leave functions against an
+# in-memory tenant (no Xero calls) with Annual and Personal/Carer's leave balances and one
+# approved Personal/Carer's application.
+#
+#   python check_leave_types.py
+
+import contextlib
+import io
+import os
+import sys
+from datetime import date, datetime, timedelta, timezone
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, REPO_DIR)
+
+# Applications are served from the fake client below, not a local store
+os.environ["XERO_LEAVE_STORE_FILE"] = ""
+
+from xero_payroll import leave  # noqa: E402
+from xero_payroll.api import set_xero_client  # noqa: E402
+
+EMPLOYEE_ID = "00000000-0000-4000-8000-000000000001"
+ANNUAL_BALANCE = 112.1
+PERSONAL_BALANCE = 80.0
+PERSONAL_HOURS = 76.0
+
+
+def xero_date(value: date) -> str:
+    moment = datetime(value.year, value.month, value.day, tzinfo=timezone.utc)
+    return "/Date(%d+0000)/" % int(moment.timestamp() * 1000)
+
+
+class FakeXeroClient:
+    """One employee with two leave types, and an approved Personal/Carer's application in `days` days."""
+
+    def __init__(self, today: date, days: int = 30):
+        self.employee = {
+            "EmployeeID": EMPLOYEE_ID,
+            "FirstName": "Check",
+            "LastName": "Employee",
+            "Status": "ACTIVE",
+            "LeaveBalances": [
+                {"LeaveName": "Annual Leave", "LeaveTypeID": "LT-ANNUAL", "NumberOfUnits": ANNUAL_BALANCE},
+                {"LeaveName": "Personal/Carer's Leave", "LeaveTypeID": "LT-PERSONAL", "NumberOfUnits": PERSONAL_BALANCE},
+            ],
+        }
+        start = today + timedelta(days=days)
+        self.applications = [{
+            "LeaveApplicationID": "10000000-0000-4000-8000-000000000001",
+            "EmployeeID": EMPLOYEE_ID,
+            "LeaveTypeID": "LT-PERSONAL",
+            "StartDate": xero_date(start),
+            "EndDate": xero_date(start + timedelta(days=9)),
+            "UpdatedDateUTC": "/Date(1735689600000+0000)/",
+            "LeavePeriods": [{"NumberOfUnits": PERSONAL_HOURS, "LeavePeriodStatus": "APPROVED"}],
+        }]
+
+    def get_tenant_id(self):
+        return "check-tenant"
+
+    def remaining_budget(self):
+        return None
+
+    def get(self, endpoint, params=None, memoize=True):
+        return {"Employees": [self.employee]}
+
+    def iter_leave_applications(self, prefetch=False, **kwargs):
+        return iter(self.applications)
+
+    def get_employees_detailed(self, employee_ids, max_workers=None):
+        return [self.employee for _ in employee_ids]
+
+
+def check(failures: list, name: str, actual: float, expected: float):
+    ok = abs(actual - expected) < 1e-6
+    print(f"  {'ok  ' if ok else 'FAIL'} {name}: {actual:.4f} (expected {expected:.4f})")
+    if not ok:
+        failures.append(name)
+
+
+def main():
+    today = date.today()
+    # The summary projects six months ahead
+    end = today + timedelta(days=180)
+    set_xero_client(FakeXeroClient(today))
+    failures = []
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            annual = leave.leave_balance_timeline(EMPLOYEE_ID, "Annual", today, end)
+            personal = leave.leave_balance_timeline(EMPLOYEE_ID, "PersonalCarers", today, end)
+            future_annual = leave.get_future_scheduled_leave(EMPLOYEE_ID, "Annual")
+            projected = leave.project_leave_balances_bulk([EMPLOYEE_ID], [end])
+            predicted = {leave_type: leave.predict_leave_balance(EMPLOYEE_ID, leave_type, end)
+                         for leave_type in ("Annual", "PersonalCarers")}
+            summary = leave.get_leave_summary(EMPLOYEE_ID)
+
+        print("leave_balance_timeline:")
+        check(failures, "Annual, end of timeline", annual.balance_on(end),
+              ANNUAL_BALANCE + leave._accrued_hours("Annual Leave", today, end))
+        check(failures, "Personal/Carer's, end of timeline", personal.balance_on(end),
+              PERSONAL_BALANCE + leave._accrued_hours("Personal/Carer's Leave", today, end) - PERSONAL_HOURS)
+        print("project_leave_balances_bulk:")
+        for (_, leave_type), row in zip(projected["rows"], projected["balances"]):
+            timeline = {"Annual": annual, "PersonalCarers": personal}.get(leave_type)
+            if timeline is not None:
+                check(failures, f"{leave_type}, same as its timeline", float(row[0]), timeline.balance_on(end))
+            if leave_type in predicted:
+                check(failures, f"{leave_type}, same as predict_leave_balance", float(row[0]), predicted[leave_type])
+        print("predict_leave_balance:")
+        check(failures, "Annual, same as its timeline", predicted["Annual"], annual.balance_on(end))
+        check(failures, "Personal/Carer's, same as its timeline", predicted["PersonalCarers"], personal.balance_on(end))
+        print("get_leave_summary:")
+        # "accrued" is the distance between the current and the six-month predicted balance
+        future_balances = summary["future_balances"]
+        check(failures, "Annual, accrued", future_balances["Annual Leave"]["accrued"],
+              abs(annual.balance_on(end) - ANNUAL_BALANCE))
+        check(failures, "Personal/Carer's, accrued", future_balances["Personal/Carer's Leave"]["accrued"],
+              abs(personal.balance_on(end) - PERSONAL_BALANCE))
+        print("get_future_scheduled_leave:")
+        check(failures, "Annual", future_annual, 0.0)
+    finally:
+        set_xero_client(None)
+
+    print("FAIL" if failures else "OK")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
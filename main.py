@@ -2,45 +2,57 @@
 
 import sys
 import json
+import atexit
+import threading
+from collections import OrderedDict
 import logging
 from datetime import date, timedelta
-from xero_payroll.api import xero_api_client, create_xero_client
+from xero_payroll.api import get_xero_client, set_xero_client, create_xero_client
+from xero_payroll import logconfig, metrics, tracing
+from xero_payroll.filelock import locked, write_json_atomic
+from xero_payroll.tokens import TokenManager
 from xero_payroll.leave import (
     get_employee_leave_balance,
     get_future_scheduled_leave,
     get_leave_summary,
+    get_leave_summary_bulk_async,
+    leave_balance_timeline,
     predict_leave_balance,
     create_leave_request,
     approve_leave_request,
     reject_leave_request,
     LEAVE_TYPES,
 )
-import pytz
 from datetime import datetime
-import requests
 import time
 from urllib.parse import urljoin
 from pathlib import Path
-from urllib3.util.retry import Retry
-from requests.adapters import HTTPAdapter
-from html import escape
 import re
-import ast
-import html
+import functools
 from typing import Any, Dict, List, Optional
 
+# requests, pytz, asyncio and the like are imported where they're used, so a one-shot
+# run only pays for what its event type needs (see check_import_time.py)
+
 TAG_RE = re.compile(r"<[^>]+>")
+PRE_TAG_RE = re.compile(r"</?pre[^>]*>", re.IGNORECASE)
+
+# normalize_cf_value only cleans the first CF_WINDOW_FACTOR x max_len characters of a long
+# value (cleaning never lengthens text), as long as that leaves CF_WINDOW_MARGIN characters
+# past max_len so a tag or entity cut in half can't show in the output
+CF_WINDOW_FACTOR = 4
+CF_WINDOW_MARGIN = 256
 
 
 # Set up logging - both console and file
 import os
 #log_file = os.path.join(os.path.dirname(__file__), "xero_payroll_webhook.log")
-# Setup shared logging
-logging.basicConfig(
+# Setup shared logging; records are written by a background thread (see xero_payroll.logconfig),
+# set XERO_PAYROLL_LOG_LEVEL=DEBUG for request and payload dumps
+logconfig.configure(
     #filename="/home/ubuntu/webhook_magic/webhook.log",
     filename="webhook.log",
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s: [Xero_Payroll] %(message)s"
+    fmt="%(asctime)s %(levelname)s: [Xero_Payroll] %(message)s"
 )
 logger = logging.getLogger(__name__)
 
@@ -80,7 +92,7 @@ WRIKE_CLIENT_ID     = os.getenv("WRIKE_CLIENT_ID",     "TmHomnYj")
 WRIKE_CLIENT_SECRET = os.getenv("WRIKE_CLIENT_SECRET", "U4K3svn7hS8pPLPhzZkgjXvlMLknrPAn3pf4gaHJY81JVvdABhEHKgWvbCTCbj1D")
 
 
-WRIKE_HOST_ROOT = "https://www.wrike.com"
+WRIKE_HOST_ROOT = os.getenv("WRIKE_HOST_ROOT", "https://www.wrike.com")
 #this is Wrike root
 
 # this is Wrike API base for convenience
@@ -90,20 +102,27 @@ WRIKE_API_BASE = f"{WRIKE_HOST_ROOT}/api/v4"
 WRIKE_TOKEN_PATH = Path(os.getenv("WRIKE_TOKEN_PATH", "../WRIKE_tokens.json"))
 #WRIKE_TOKEN_PATH = "/home/ubuntu/webhook_magic/WRIKE_tokens.json"
 
+# Refresh the Wrike access token this many seconds before obtained_at + expires_in
+WRIKE_REFRESH_MARGIN = int(os.getenv("WRIKE_TOKEN_REFRESH_MARGIN", "300"))
+
 # ========= TOKEN IO =========
+# Kept in memory and only re-read when the file changes; writes are atomic and refreshes
+# single-flight across processes (see xero_payroll.tokens.TokenManager)
+WRIKE_tokens = TokenManager(WRIKE_TOKEN_PATH, margin=WRIKE_REFRESH_MARGIN, name="wrike")
+
 def load_WRIKE_token():
-    if WRIKE_TOKEN_PATH.exists():
-        with WRIKE_TOKEN_PATH.open("r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
+    return WRIKE_tokens.load() or {}
 
 def save_WRIKE_token(tokens: dict):
     WRIKE_TOKEN_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with WRIKE_TOKEN_PATH.open("w", encoding="utf-8") as f:
-        json.dump(tokens, f, indent=2)
+    WRIKE_tokens.save(tokens)
 
 # ========= SESSION WITH RETRIES =========
-def make_WRIKE_session() -> requests.Session:
+def make_WRIKE_session() -> "requests.Session":
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
     s = requests.Session()
     retry = Retry(
         total=5,
@@ -117,24 +136,234 @@ def make_WRIKE_session() -> requests.Session:
     s.mount("http://",  HTTPAdapter(max_retries=retry))
     return s
 
-WRIKE_session = make_WRIKE_session()
+# Built on first use by get_WRIKE_session(); assign a session here to replace it
+WRIKE_session = None
+
+
+def get_WRIKE_session():
+    global WRIKE_session
+    if WRIKE_session is None:
+        WRIKE_session = make_WRIKE_session()
+    return WRIKE_session
 
 CIT_TYPE_ID = "IEAF5D2JPIACSO3J"
 PERSON_ID_CF_ID = "IEAF5D2JJUAGXSTI"
 XERO_EMPLOYEE_CF_ID = "IEAF5D2JJUAJ5DXC"
 
 
+# Persistent person -> Xero employee index built from the CIT tasks (set WRIKE_PERSON_INDEX_PATH="" to disable)
+WRIKE_PERSON_INDEX_PATH = os.getenv("WRIKE_PERSON_INDEX_PATH", str(WRIKE_TOKEN_PATH.parent / "WRIKE_person_index.json"))
+WRIKE_PERSON_INDEX_MAX_AGE = 300            # seconds between incremental refreshes
+WRIKE_PERSON_INDEX_FULL_REBUILD = 24 * 60 * 60  # full rebuild picks up deleted tasks
+WRIKE_TASKS_PAGE_SIZE = 1000
+WRIKE_DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def _Xero_employee_id_from_task(task: Dict[str, Any]) -> Optional[str]:
+    """Normalized XERO_EMPLOYEE_CF_ID value of a CIT task, or None if blank."""
+    custom_fields = task.get("customFields") or []
+
+    xero_cf = next((cf for cf in custom_fields if cf.get("id") == XERO_EMPLOYEE_CF_ID), None)
+    if not xero_cf:
+        return None
+
+    value = xero_cf.get("value")
+    if value is None:
+        return None
+
+    # Some CF types can come back list-valued; normalize.
+    if isinstance(value, list):
+        value = value[0] if value else None
+
+    return str(value).strip() or None
+
+
+class WrikePersonIndex:
+    """
+    Local copy of the person -> Xero employee mapping held in the CIT_TYPE_ID tasks, so a
+    webhook's lookup is a dict access instead of a Wrike /tasks search.
+
+    The index lives in a JSON file shared by all webhook processes. It is refreshed
+    incrementally (tasks whose updatedDate is after the last refresh) at most every
+    max_age seconds, rebuilt in full every full_rebuild_interval, and refreshes are
+    single-flight under a lock file.
+    """
+
+    def __init__(self, path: str, max_age: int = WRIKE_PERSON_INDEX_MAX_AGE,
+                 full_rebuild_interval: int = WRIKE_PERSON_INDEX_FULL_REBUILD):
+        self.path = str(path)
+        self.max_age = max_age
+        self.full_rebuild_interval = full_rebuild_interval
+        self._state = None
+        self._stamp = None
+        self._by_person: Dict[str, List[Dict[str, Any]]] = {}
+
+    def lookup(self, person_id: str) -> List[Dict[str, Any]]:
+        """
+        Returns the mapping entries ({"task_id", "xero_employee_id"}) for a person:
+        [] if the index doesn't know them, more than one if the mapping is duplicated.
+        """
+        self._load()
+        return self._by_person.get(str(person_id).strip(), [])
+
+    def refresh(self, force_full: bool = False) -> bool:
+        """
+        Brings the index up to date unless another process did so within max_age.
+
+        Returns:
+            bool: True if Wrike was queried
+        """
+        state = self._load()
+        if not force_full and time.time() - state.get("refreshed_at", 0) < self.max_age:
+            return False
+
+        with locked(self.path + ".lock"):
+            # Another process may have refreshed while we waited for the lock
+            state = self._load()
+            now = time.time()
+            if not force_full and now - state.get("refreshed_at", 0) < self.max_age:
+                return False
+
+            full = force_full or not state.get("updated_since") or now - state.get("rebuilt_at", 0) >= self.full_rebuild_interval
+            tasks = {} if full else dict(state.get("tasks", {}))
+            updated_since = None if full else state["updated_since"]
+            newest = updated_since
+
+            for task in self._fetch_tasks(updated_since):
+                task_id = task.get("id")
+                person = self._person_id(task)
+                if task.get("customItemTypeId") == CIT_TYPE_ID and person:
+                    tasks[task_id] = {"person_id": person, "xero_employee_id": _Xero_employee_id_from_task(task)}
+                else:
+                    # No longer a CIT person task (type changed or person cleared)
+                    tasks.pop(task_id, None)
+                if task.get("updatedDate") and (newest is None or task["updatedDate"] > newest):
+                    newest = task["updatedDate"]
+
+            if newest is None:
+                newest = time.strftime(WRIKE_DATE_FORMAT, time.gmtime(now))
+            state = {
+                "tasks": tasks,
+                # Overlap by a second so an update landing in the same second isn't skipped
+                "updated_since": (datetime.strptime(newest, WRIKE_DATE_FORMAT) - timedelta(seconds=1)).strftime(WRIKE_DATE_FORMAT),
+                "refreshed_at": now,
+                "rebuilt_at": now if full else state.get("rebuilt_at", now),
+            }
+            write_json_atomic(self.path, state)
+            self._set_state(state, self._file_stamp())
+            logging.info(f"[WrikePersonIndex] {'Rebuilt' if full else 'Refreshed'} index: {len(tasks)} CIT task(s)")
+            return True
+
+    @staticmethod
+    def _person_id(task: Dict[str, Any]) -> Optional[str]:
+        for cf in task.get("customFields") or []:
+            if cf.get("id") == PERSON_ID_CF_ID:
+                value = cf.get("value")
+                if isinstance(value, list):
+                    value = value[0] if value else None
+                if value is None:
+                    return None
+                return str(value).strip() or None
+        return None
+
+    def _fetch_tasks(self, updated_since: Optional[str]):
+        """Yields the tasks updated after updated_since (or every task with a person set), page by page."""
+        params = {
+            "plainTextCustomFields": "true",
+            "fields": json.dumps(["customFields", "customItemTypeId"]),
+            "pageSize": WRIKE_TASKS_PAGE_SIZE,
+        }
+        if updated_since:
+            params["updatedDate"] = json.dumps({"start": updated_since})
+        else:
+            params["customFields"] = json.dumps([{"id": PERSON_ID_CF_ID, "comparator": "IsNotEmpty"}])
+
+        while True:
+            resp = WRIKE_get("/tasks", params=params)
+            if not resp.ok:
+                raise RuntimeError(f"Wrike /tasks index refresh failed ({resp.status_code}): {resp.text}")
+            payload = resp.json() if resp.text else {}
+            yield from payload.get("data") or []
+            next_page = payload.get("nextPageToken")
+            if not next_page:
+                return
+            params["nextPageToken"] = next_page
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load(self) -> Dict[str, Any]:
+        """Returns the index state, re-reading the file only when it changed."""
+        stamp = self._file_stamp()
+        if self._state is None or stamp != self._stamp:
+            state = {}
+            if stamp is not None:
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        state = json.load(f)
+                except (OSError, json.JSONDecodeError):
+                    state = {}
+            self._set_state(state, stamp)
+        return self._state
+
+    def _set_state(self, state: Dict[str, Any], stamp):
+        by_person: Dict[str, List[Dict[str, Any]]] = {}
+        for task_id, entry in state.get("tasks", {}).items():
+            by_person.setdefault(entry["person_id"], []).append(
+                {"task_id": task_id, "xero_employee_id": entry.get("xero_employee_id")}
+            )
+        self._state = state
+        self._stamp = stamp
+        self._by_person = by_person
+
+
+WRIKE_person_index = WrikePersonIndex(WRIKE_PERSON_INDEX_PATH) if WRIKE_PERSON_INDEX_PATH else None
+
+
+@tracing.traced("wrike.person_lookup")
 def get_Xero_employee_id_from_Wrike(person_id: str) -> Optional[str]:
     """
     Finds the Wrike CIT (custom item type = CIT_TYPE_ID) where custom field PERSON_ID_CF_ID == person_id,
     then returns the value from custom field XERO_EMPLOYEE_CF_ID.
 
+    Answered from WRIKE_person_index when it knows the person and their Xero ID; Wrike is
+    only searched on a miss.
+
     Returns:
         str  -> Xero employee id
         None -> not found / blank
     Raises:
         RuntimeError / ValueError on API errors or ambiguous duplicates
     """
+    span = tracing.current_or_noop()
+    span.set_attribute("wrike.person_id", person_id)
+    if WRIKE_person_index is not None:
+        try:
+            WRIKE_person_index.refresh()
+        except Exception as e:
+            logging.warning(f"[get_Xero_employee_id_from_Wrike] Person index refresh failed, using it as is: {e}")
+        entries = WRIKE_person_index.lookup(person_id)
+        if len(entries) > 1:
+            raise ValueError(
+                f"Multiple CIT tasks found for person_id={person_id} (type={CIT_TYPE_ID}): "
+                f"{[entry['task_id'] for entry in entries]}"
+            )
+        if entries and entries[0]["xero_employee_id"]:
+            logging.info("[get_Xero_employee_id_from_Wrike] person_id=%s found in index (task %s)", person_id, entries[0]["task_id"])
+            span.set_attribute("wrike.person_lookup.source", "index")
+            return entries[0]["xero_employee_id"]
+        # Unknown person or Xero ID not filled in as of the last refresh: ask Wrike directly
+
+    span.set_attribute("wrike.person_lookup.source", "live")
+    return _query_Xero_employee_id_from_Wrike(person_id)
+
+
+def _query_Xero_employee_id_from_Wrike(person_id: str) -> Optional[str]:
+    """Live Wrike /tasks search behind get_Xero_employee_id_from_Wrike."""
 
     # Wrike's /tasks filter for a custom field is commonly expressed as:
     # customField={id:'<CF_ID>',value:'<VALUE>'}
@@ -149,7 +378,9 @@ def get_Xero_employee_id_from_Wrike(person_id: str) -> Optional[str]:
     }
 
     resp = WRIKE_get("/tasks", params=params)
-    logging.info(f"[get_Xero_employee_id_from_Wrike] WRIKE /tasks response: {resp.status_code}, {resp.text}")   
+    logging.info("[get_Xero_employee_id_from_Wrike] WRIKE /tasks response: %s", resp.status_code)
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("[get_Xero_employee_id_from_Wrike] WRIKE /tasks body: %s", resp.text)
 
     if not resp.ok:
         # Include response text to make debugging faster
@@ -172,28 +403,14 @@ def get_Xero_employee_id_from_Wrike(person_id: str) -> Optional[str]:
             f"{[t.get('id') for t in cit_tasks]}"
         )
 
-    task = cit_tasks[0]
-    custom_fields = task.get("customFields") or []
-
-    xero_cf = next((cf for cf in custom_fields if cf.get("id") == XERO_EMPLOYEE_CF_ID), None)
-    if not xero_cf:
-        return None
-
-    value = xero_cf.get("value")
-    if value is None:
-        return None
-
-    # Some CF types can come back list-valued; normalize.
-    if isinstance(value, list):
-        value = value[0] if value else None
-
-    return str(value).strip() or None
+    return _Xero_employee_id_from_task(cit_tasks[0])
 
 # ========= AUTH HELPERS =========
 def WRIKE_auth_headers(access_token: str) -> dict:
     return {"Authorization": f"Bearer {access_token}"}
 
 def WRIKE_refresh_access_token(refresh_token: str) -> dict:
+    """Exchanges a refresh token at Wrike's token endpoint. Returns the new tokens; WRIKE_tokens saves them."""
     if not (WRIKE_CLIENT_ID and WRIKE_CLIENT_SECRET and WRIKE_HOST_ROOT):
         raise RuntimeError(
             "Missing WRIKE_CLIENT_ID, WRIKE_CLIENT_SECRET, or WRIKE_HOST_ROOT. "
@@ -208,7 +425,9 @@ def WRIKE_refresh_access_token(refresh_token: str) -> dict:
         "client_secret": WRIKE_CLIENT_SECRET,
     }
 
-    logging.info(f"[WRIKE_refresh_access_token] Refreshing at: {token_url}, {refresh_token}, {WRIKE_CLIENT_ID}, {WRIKE_CLIENT_SECRET}")
+    logging.info("[WRIKE_refresh_access_token] Refreshing at: %s", token_url)
+    import requests
+
     try:
         resp = requests.post(token_url, data=data, timeout=15)
     except requests.RequestException as e:
@@ -237,10 +456,22 @@ def WRIKE_refresh_access_token(refresh_token: str) -> dict:
         "expires_in": tokens.get("expires_in"),
         "obtained_at": int(time.time()),
     }
-    save_WRIKE_token(tokens)
-    logging.info("[WRIKE_refresh_access_token] Token refreshed and saved.")
+    logging.info("[WRIKE_refresh_access_token] Token refreshed.")
     return tokens
 
+def _WRIKE_refresh_stored_token(current: dict) -> dict:
+    if not (current or {}).get("refresh_token"):
+        raise RuntimeError("No Wrike refresh_token found. Re-authorize to obtain one.")
+    return WRIKE_refresh_access_token(current["refresh_token"])
+
+def WRIKE_refresh_tokens(tokens: dict, force: bool = False) -> dict:
+    """
+    Single-flight refresh of the stored Wrike tokens: if another process already replaced
+    `tokens`, its result is used instead of spending the refresh token again.
+    """
+    WRIKE_TOKEN_PATH.parent.mkdir(parents=True, exist_ok=True)
+    return WRIKE_tokens.refresh(_WRIKE_refresh_stored_token, tokens or None, force=force)
+
 # ========= CORE REQUEST (AUTO-REFRESH) =========
 def WRIKE_request(
     method: str,
@@ -255,55 +486,81 @@ def WRIKE_request(
     Makes a Wrike API call, auto-refreshing the token on 401 once.
     `path_or_url` can be '/tasks/ID' or a full URL.
     """
-    logging.debug(f"In WRIKE_request...")
+    logging.debug("In WRIKE_request...")
     url = path_or_url if path_or_url.startswith("http") else urljoin(WRIKE_API_BASE + "/", path_or_url.lstrip("/"))
 
-    logging.debug(f"Loading WRIKE token...")
+    logging.debug("Loading WRIKE token...")
     tokens = load_WRIKE_token()
+    if tokens.get("refresh_token"):
+        # Refresh ahead of expiry: inline once expired, otherwise in the background while this call proceeds
+        if WRIKE_tokens.is_expired(tokens):
+            tokens = WRIKE_refresh_tokens(tokens)
+        elif WRIKE_tokens.needs_refresh(tokens):
+            WRIKE_tokens.refresh_in_background(_WRIKE_refresh_stored_token, tokens)
 
     #headers = WRIKE_auth_headers(tokens["access_token"])
-    logging.debug(f"creating WRIKE headers...")
+    logging.debug("creating WRIKE headers...")
     headers = WRIKE_auth_headers(tokens.get("access_token", ""))
-    logging.debug(f"WRIKE headers = {headers}")
-
-    resp = WRIKE_session.request(method, url, headers=headers, params=params, json=json_body, data=data)
-    logging.debug(f"Request URL: {resp.request.method} {resp.request.url}")
-    logging.debug(f"Status: {resp.status_code}")
-    logging.debug(f"Headers: {dict(resp.headers)}")
-    logging.debug(f"Location header: {resp.headers.get('Location')}")
-    logging.debug(f"Body (first 500): {resp.text[:500]}")
-    logging.debug(f"resp={resp}")
-    logging.debug(f"Status: {resp.status_code}")
-    logging.debug(f"Location header: {resp.headers.get('Location')}")
+
+    session = get_WRIKE_session()
+    resp = _WRIKE_send(session, method, url, headers=headers, params=params, json=json_body, data=data)
+    # resp.text decodes the whole body, so only touch it when DEBUG records are kept
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("Request URL: %s %s", resp.request.method, resp.request.url)
+        logging.debug("Status: %s", resp.status_code)
+        logging.debug("Headers: %s", dict(resp.headers))
+        logging.debug("Location header: %s", resp.headers.get('Location'))
+        logging.debug("Body (first 500): %s", resp.text[:500])
     # Refresh on 401
     if resp.status_code == 401 and allow_refresh:
         logging.info("Wrike access token likely expired. Refreshing…")
         if not tokens.get("refresh_token"):
             raise RuntimeError("No Wrike refresh_token found. Re-authorize to obtain one.")
         logging.debug("About to try to get refresh token…")
-        tokens = WRIKE_refresh_access_token(tokens["refresh_token"])
+        tokens = WRIKE_refresh_tokens(tokens, force=True)
         logging.debug("Getting auth headers…")
         headers = WRIKE_auth_headers(tokens["access_token"])
         logging.debug("trying request again…")
-        resp = WRIKE_session.request(method, url, headers=headers, params=params, json=json_body, data=data)
+        metrics.inc("wrike_api_retries_total", reason="401")
+        resp = _WRIKE_send(session, method, url, headers=headers, params=params, json=json_body, data=data)
 
     # Rate limit handling
     if resp.status_code == 429:
         retry_after = int(resp.headers.get("Retry-After", 5))
         logging.warning(f"Wrike rate limit hit (429). Retrying after {retry_after}s…")
         time.sleep(retry_after)
-        resp = WRIKE_session.request(method, url, headers=headers, params=params, json=json_body, data=data)
+        metrics.inc("wrike_api_retries_total", reason="429")
+        resp = _WRIKE_send(session, method, url, headers=headers, params=params, json=json_body, data=data)
 
     # Follow redirects if any
     if resp.status_code in (300, 301, 302, 303, 307, 308):
         loc = resp.headers.get("Location")
         if loc:
-            logging.debug(f"Following Wrike redirect to {loc}")
+            logging.debug("Following Wrike redirect to %s", loc)
             next_url = loc if loc.startswith("http") else urljoin(WRIKE_HOST_ROOT + "/", loc.lstrip("/"))
-            resp = WRIKE_session.request(method, next_url, headers=headers, params=params, json=json_body, data=data)
+            metrics.inc("wrike_api_retries_total", reason="redirect")
+            resp = _WRIKE_send(session, method, next_url, headers=headers, params=params, json=json_body, data=data)
 
     return resp
 
+def _WRIKE_send(session, method, url, **kwargs):
+    """One HTTP exchange with Wrike, recorded in the metrics and traced when those are enabled."""
+    if not metrics.enabled() and not tracing.enabled():
+        return session.request(method, url, **kwargs)
+    endpoint = url.split("/api/v4/", 1)[-1]
+    started = time.perf_counter()
+    resp = None
+    with tracing.span(f"wrike.{method} {metrics.endpoint_label(endpoint)}", tracing.KIND_CLIENT,
+                      **{"http.method": method, "wrike.endpoint": endpoint.split("?", 1)[0]}) as span:
+        try:
+            resp = session.request(method, url, **kwargs)
+            span.set_attribute("http.status_code", resp.status_code)
+            if resp.status_code >= 400:
+                span.set_error(f"HTTP {resp.status_code}")
+            return resp
+        finally:
+            metrics.record_http("wrike_api", method, endpoint, resp, time.perf_counter() - started)
+
 # ========= CONVENIENCE WRAPPERS =========
 def WRIKE_get(path_or_url, **kw):    return WRIKE_request("GET", path_or_url, **kw)
 def WRIKE_put(path_or_url, **kw):    return WRIKE_request("PUT", path_or_url, **kw)
@@ -311,12 +568,14 @@ def WRIKE_post(path_or_url, **kw):   return WRIKE_request("POST", path_or_url, *
 def WRIKE_patch(path_or_url, **kw):  return WRIKE_request("PATCH", path_or_url, **kw)
 def WRIKE_delete(path_or_url, **kw): return WRIKE_request("DELETE", path_or_url, **kw)
 
+@tracing.traced("wrike.get_task")
 def get_Wrike_Task(taskId):
+    tracing.current_or_noop().set_attribute("wrike.task_id", taskId)
 
     WRIKE_URL = (
-        f'https://www.wrike.com/api/v4/tasks/{taskId}'
+        f'{WRIKE_API_BASE}/tasks/{taskId}'
     )
-    logging.info(f"[get_Wrike_Task] WRIKE_URL={WRIKE_URL}")
+    logging.info("[get_Wrike_Task] WRIKE_URL=%s", WRIKE_URL)
     response = WRIKE_request("GET",WRIKE_URL)
 
     #response = requests.get(WRIKE_URL, headers=wrike_headers, json=payload)
@@ -327,7 +586,7 @@ def get_Wrike_Task(taskId):
         root=None
     else:
         root = response.json()
-        logging.info(f"[get_Wrike_Task] returning task details (root)={root}")
+        logging.debug("[get_Wrike_Task] returning task details (root)=%s", root)
         #if root.get('data') and len(root['data']) > 0:
         #    found_id = root['data'][0]['id']
         #else:
@@ -348,7 +607,11 @@ def normalize_cf_value(value: Any, *, max_len: int = 1200, strip_html_tags: bool
     - Convert <br> to newline
     - Remove <pre> wrappers
     - Optionally strip remaining HTML tags
-    - Try to pretty-print embedded dict/list strings (Python-literal style)
+    - Pretty-print lines holding a JSON object/array (job history writes each summary as one JSON line)
+
+    Only as much of the value as the max_len output needs is cleaned, values that will be
+    truncated anyway are not parsed, and results are cached per (value, max_len), since the
+    same fields come round on every webhook of a task.
     """
     if value is None:
         return "None"
@@ -360,45 +623,61 @@ def normalize_cf_value(value: Any, *, max_len: int = 1200, strip_html_tags: bool
         except Exception:
             return str(value)[:max_len]
 
-    s = value
+    return _normalize_cf_text(value, max_len, strip_html_tags)
 
-    # Unescape HTML entities first (turn &lt; into < etc.)
-    s = html.unescape(s)
 
-    # Normalize breaks and whitespace
-    s = s.replace("\r\n", "\n").replace("\r", "\n")
-    s = s.replace("<br>", "\n").replace("<br/>", "\n").replace("<br />", "\n")
+@functools.lru_cache(maxsize=256)
+def _normalize_cf_text(value: str, max_len: int, strip_html_tags: bool) -> str:
+    window = CF_WINDOW_FACTOR * max_len
+    if len(value) > window + CF_WINDOW_MARGIN:
+        s = _clean_cf_text(value[:window], strip_html_tags)
+        if len(s) <= max_len + CF_WINDOW_MARGIN:
+            # Mostly markup: the window didn't yield enough text, clean all of it
+            s = _clean_cf_text(value, strip_html_tags)
+    else:
+        s = _clean_cf_text(value, strip_html_tags)
 
-    # Remove common wrappers but keep their content
-    s = re.sub(r"</?pre[^>]*>", "", s, flags=re.IGNORECASE).strip()
+    # Truncate for logs; a value cut short is shown as is rather than parsed and re-indented
+    if len(s) > max_len:
+        return s[:max_len] + " …(truncated)"
+
+    # Job history is text with each summary written as one line of JSON, so JSON is
+    # looked for line by line (a value that is JSON as a whole is a single such line)
+    if "{" in s or "[" in s:
+        lines = s.split("\n")
+        for i, line in enumerate(lines):
+            line = line.strip()
+            if (line.startswith("{") and line.endswith("}")) or (line.startswith("[") and line.endswith("]")):
+                try:
+                    lines[i] = json.dumps(json.loads(line), ensure_ascii=False, indent=2)
+                except ValueError:
+                    pass
+        s = "\n".join(lines)
+        if len(s) > max_len:
+            s = s[:max_len] + " …(truncated)"
 
-    # Optional: strip any remaining HTML tags (e.g., <b>)
-    if strip_html_tags:
-        s = TAG_RE.sub("", s)
+    return s
 
-    s = s.strip()
 
-    # Try to parse embedded Python-literal dict/list (your leave summary is like "{'employee_name': ...}")
-    # This will also handle lists like "[{'id': '...', 'value': ...}]"
-    parsed = None
-    try:
-        # Only attempt if it looks like a literal structure
-        if (s.startswith("{") and s.endswith("}")) or (s.startswith("[") and s.endswith("]")):
-            parsed = ast.literal_eval(s)
-    except Exception:
-        parsed = None
+def _clean_cf_text(s: str, strip_html_tags: bool) -> str:
+    import html
 
-    if parsed is not None:
-        try:
-            s = json.dumps(parsed, ensure_ascii=False, indent=2)
-        except Exception:
-            s = str(parsed)
+    # Unescape HTML entities first (turn &lt; into < etc.)
+    s = html.unescape(s)
 
-    # Truncate for logs
-    if len(s) > max_len:
-        s = s[:max_len] + " …(truncated)"
+    # Normalize breaks and whitespace
+    s = s.replace("\r\n", "\n").replace("\r", "\n")
+    if "<" in s:
+        s = s.replace("<br>", "\n").replace("<br/>", "\n").replace("<br />", "\n")
 
-    return s
+        # Remove common wrappers but keep their content
+        s = PRE_TAG_RE.sub("", s).strip()
+
+        # Optional: strip any remaining HTML tags (e.g., <b>)
+        if strip_html_tags:
+            s = TAG_RE.sub("", s)
+
+    return s.strip()
 
 def log_custom_fields_readable(
     logger,
@@ -408,7 +687,7 @@ def log_custom_fields_readable(
     max_len: int = 1200,
 ) -> None:
     """
-    Logs each custom field on its own line with readable formatting.
+    Logs each custom field on its own line with readable formatting, at DEBUG level.
     """
     id_to_name = id_to_name or {}
     idx = build_custom_field_index(custom_fields)
@@ -416,7 +695,7 @@ def log_custom_fields_readable(
     for fid, raw in idx.items():
         name = id_to_name.get(fid, "Unknown")
         pretty = normalize_cf_value(raw, max_len=max_len)
-        logger.info(f"[custom_fields] {name} ({fid}) =\n{pretty}")
+        logger.debug("[custom_fields] %s (%s) =\n%s", name, fid, pretty)
 
 
 
@@ -430,6 +709,7 @@ def wrike_text_cf_value(text: str) -> str:
 
     # Optional but recommended: wrap in <pre> (allowed for text custom fields) and escape HTML
     # so your logs don't accidentally become interpreted markup.
+    from html import escape
     return f"<pre>{escape(text)}</pre>"
 
 def handle_webhook_payload(payload):
@@ -454,47 +734,49 @@ def handle_webhook_payload(payload):
 
     try:
         # Check if API client is initialized
+        xero_api_client = get_xero_client()
         if not xero_api_client:
             raise ValueError("[handle_webhook_payload] Xero API client not initialized. Token file may not exist or be invalid.")
         
-        logger.info(f"[handle_webhook_payload] Processing webhook payload: {payload}")
+        logger.debug("[handle_webhook_payload] Processing webhook payload: %s", payload)
         
         # Handle array of events (extract first event)
         if isinstance(payload, list):
             if len(payload) == 0:
                 raise ValueError("[handle_webhook_payload] Empty payload list received")
-            logger.info(f"[handle_webhook_payload] Payload is a list, extracting first event from {len(payload)} events")
+            logger.info("[handle_webhook_payload] Payload is a list, extracting first event from %d events", len(payload))
             payload = payload[0]
         
         # Get the event type and relevant data
         event_type = payload.get("status")
         if not event_type:
             raise ValueError("[handle_webhook_payload] No status/eventType specified in payload")
+        tracing.current_or_noop().set_attribute("webhook.event_type", event_type)
             
         response_data = {"status": "success", "data": None}
         
         if event_type == "Idle":
             # No action needed for idle events
             logger.info("[handle_webhook_payload] Received Idle event - no action taken")
-            exit(0)
+            return response_data
         elif event_type == "Completed":
             # No action needed for completed events
             logger.info("[handle_webhook_payload] Received Completed event - no action taken")
-            exit(0)
+            return response_data
         elif event_type == "Automation Running":
             # No action needed for completed events
             logger.info("[handle_webhook_payload] Received Automation Running event - no action taken")
-            exit(0)
+            return response_data
         elif event_type == "Error":
             # No action needed for completed events
             logger.info("[handle_webhook_payload] Received Error event - no action taken")
-            exit(0)
+            return response_data
         else:
             response=get_Wrike_Task(bot_task_id)
             custom_fields = response['data'][0]['customFields']
 
-            job_summary=f"Received Inputs:\n{custom_fields}"
-            logging.info(f"🚀 [handle_webhook_payload] got custom fields {custom_fields}")
+            job_summary=f"Received Inputs:\n{json.dumps(custom_fields, ensure_ascii=False)}"
+            logging.debug("🚀 [handle_webhook_payload] got custom fields %s", custom_fields)
 
             # Build an index once
             cf_index = build_custom_field_index(custom_fields)
@@ -516,19 +798,19 @@ def handle_webhook_payload(payload):
             JOB_HISTORY_GLOBAL=job_history
 
             # Optional: log the full set readably (recommended while debugging)
-            log_custom_fields_readable(
-                logging,
-                custom_fields,
-                id_to_name={
-                    custom_field_ids["job_history"]: "Job History",
-                    custom_field_ids["person_name"]: "Person Name",
-                    custom_field_ids["target_date"]: "Target Date",
-                    custom_field_ids["leave_type"]: "Leave Type",
-                    # add others as you like
-                },
-                max_len=1500,
-            )
-            #logging.info(f"🚀 [handle_webhook_payload] extracted custom fields: person_name={person_name}, target_date={target_date}, leave_type={leave_type}, job_history={job_history}")
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                log_custom_fields_readable(
+                    logging,
+                    custom_fields,
+                    id_to_name={
+                        custom_field_ids["job_history"]: "Job History",
+                        custom_field_ids["person_name"]: "Person Name",
+                        custom_field_ids["target_date"]: "Target Date",
+                        custom_field_ids["leave_type"]: "Leave Type",
+                        # add others as you like
+                    },
+                    max_len=1500,
+                )
             # Also log the extracted values in readable form
             logging.info(
                 "[handle_webhook_payload] 🚀 extracted custom fields: person_name=%s, target_date=%s, leave_type=%s, job_history=\n%s",
@@ -540,10 +822,10 @@ def handle_webhook_payload(payload):
             # now need to find XERO employee ID from Wrike custom fields
 
             if person_name:
-                logging.info(f"🚀 [handle_webhook_payload] looking up Xero_employee_id for wrike_id={person_name}"      )
+                logging.info("🚀 [handle_webhook_payload] looking up Xero_employee_id for wrike_id=%s", person_name)
                 Xero_employee_id = get_Xero_employee_id_from_Wrike(person_name)
 
-            logging.info(f"🚀 [handle_webhook_payload] resolved Xero_employee_id={Xero_employee_id} for wrike_id={person_name}"  )
+            logging.info("🚀 [handle_webhook_payload] resolved Xero_employee_id=%s for wrike_id=%s", Xero_employee_id, person_name)
 
             if Xero_employee_id:
                 employee_id = Xero_employee_id
@@ -555,6 +837,9 @@ def handle_webhook_payload(payload):
                     "b5c4187a-1d2d-4712-8764-6bd01ef4af7d" # For testing purposes
                     #payload.get("taskId")  # Fallback to taskId if no employee ID
                 )
+            span = tracing.current_or_noop()
+            span.set_attribute("wrike.person_id", person_name)
+            span.set_attribute("xero.employee_id", employee_id)
 
             if event_type == "Get Leave Summary":
 
@@ -565,13 +850,13 @@ def handle_webhook_payload(payload):
                 if not employee_id:
                     raise ValueError("No employeeId specified for leave summary request")
                     
-                logger.info(f"[handle_webhook_payload] Getting leave summary for employee: {employee_id}")
+                logger.info("[handle_webhook_payload] Getting leave summary for employee: %s", employee_id)
                 job_summary=job_summary+f"\nProcessing Get Leave Summary for employee {employee_id}"
                 #job_summary=wrike_text_cf_value(job_summary)
                 bot_response=update_Wrike_bot(bot_task_id, status_automation_running, job_summary)
                 summary = get_leave_summary(employee_id)
                 response_data["data"] = summary
-                job_summary=f"\n\n<b>Leave Summary:</b>\n{summary}"
+                job_summary=f"\n\n<b>Leave Summary:</b>\n{json.dumps(summary, ensure_ascii=False, default=str)}"
                 #job_summary=wrike_text_cf_value(job_summary)
 
                 
@@ -614,6 +899,34 @@ def handle_webhook_payload(payload):
                 predicted = predict_leave_balance(employee_id, leave_type, future_date)
                 response_data["data"] = {"predicted_balance": predicted}
                 
+            elif event_type == "Get Leave Balance Timeline":
+                # Handle "when will I have enough leave?" requests
+
+                leave_type = payload.get("leaveType")
+                if not leave_type:
+                    logger.info("[handle_webhook_payload] No leaveType specified for leave balance timeline request - defaulting to annual leave")
+                    leave_type = "Annual"
+
+                start_date = date.fromisoformat(payload.get("startDate")) if payload.get("startDate") else None
+                end_date = date.fromisoformat(payload.get("endDate")) if payload.get("endDate") else None
+
+                # Target balance in hours, or in days of 8 hours
+                target_hours = payload.get("hours")
+                if target_hours is None and payload.get("days") is not None:
+                    target_hours = float(payload.get("days")) * 8.0
+
+                timeline = leave_balance_timeline(employee_id, leave_type, start_date, end_date)
+                response_data["data"] = {"timeline": timeline.as_dict()}
+
+                if target_hours is not None:
+                    first_date = timeline.first_date_with_balance(float(target_hours))
+                    response_data["data"]["target_hours"] = float(target_hours)
+                    response_data["data"]["first_date"] = first_date.isoformat() if first_date else None
+                    job_summary=job_summary+(
+                        f"\n\n<b>Leave Balance Timeline:</b>\n{leave_type} leave reaches {float(target_hours):.2f} hours on "
+                        f"{first_date.isoformat() if first_date else 'no date in the timeline'}"
+                    )
+
             elif event_type == "Get Future Scheduled Leave":
                 # Handle future scheduled leave request
 
@@ -628,6 +941,15 @@ def handle_webhook_payload(payload):
                 scheduled_leave = get_future_scheduled_leave(employee_id, leave_type)
                 response_data["data"] = {"scheduled_leave": scheduled_leave}
                 
+            elif event_type == "Get Leave Summary Bulk":
+                # Handle org-wide leave summary request (optionally limited to payload employeeIds);
+                # the per-employee Xero calls overlap, up to Xero's concurrency limit
+                logger.info("[handle_webhook_payload] Getting bulk leave summary")
+                import asyncio
+                summaries = asyncio.run(get_leave_summary_bulk_async(payload.get("employeeIds")))
+                response_data["data"] = summaries
+                job_summary=job_summary+f"\n\n<b>Bulk Leave Summary:</b>\n{len(summaries)} employee(s) summarised"
+
             elif event_type == "Get Xero Employee List":
                 # Handle employee list request
                 employees = xero_api_client.list_employees()
@@ -653,8 +975,12 @@ def handle_webhook_payload(payload):
         return response_data
         
     except Exception as e:
-        logger.error(f"[handle_webhook_payload] Error processing webhook payload: {e}", exc_info=True)
-        bot_response=update_Wrike_bot(bot_task_id, status_error, job_summary+f"\nError: {str(e)}")
+        logger.error("[handle_webhook_payload] Error processing webhook payload: %s", e, exc_info=True)
+        try:
+            bot_response=update_Wrike_bot(bot_task_id, status_error, job_summary+f"\nError: {str(e)}")
+        except Exception as update_error:
+            # Don't let a failed status update mask the original error (or kill the daemon)
+            logger.error("[handle_webhook_payload] Could not report error to Wrike bot: %s", update_error)
         return {
             "status": "error",
             "error": str(e)
@@ -665,7 +991,7 @@ def display_employee_list():
     Retrieves and displays a list of all employees from Xero.
     """
     try:
-        employees = xero_api_client.list_employees()
+        employees = get_xero_client().list_employees()
         print("\n=== Xero Employees ===")
         print("ID | Name | Status | Email")
         print("-" * 50)
@@ -682,8 +1008,8 @@ def main():
     """
     Main function to demonstrate the Xero Payroll API integration.
     """
-    global xero_api_client
-    
+    xero_api_client = get_xero_client()
+
     # Example of how to initialize with tokens
     if not xero_api_client:
         # You would normally get these values from your secure storage
@@ -699,6 +1025,7 @@ def main():
         
         try:
             xero_api_client = create_xero_client(initial_token, tenant_id)
+            set_xero_client(xero_api_client)
             print("API client initialized successfully!")
         except Exception as e:
             print(f"Error initializing API client: {e}")
@@ -814,6 +1141,18 @@ def main():
 
 
 def update_Wrike_bot(Bot_Task_ID, newStatus, New_Description):
+    """
+    Queues a status/job history update of the Wrike bot task on WRIKE_status_outbox and
+    returns straight away; the PUT is sent by the outbox's background worker.
+    """
+    params = _WRIKE_bot_update_params(newStatus, New_Description)
+    logging.info("[update_Wrike_bot] Queueing Wrike Bot Task ID %s update to status %s", Bot_Task_ID, newStatus)
+    WRIKE_status_outbox.enqueue(Bot_Task_ID, newStatus, params)
+
+
+def _WRIKE_bot_update_params(newStatus, New_Description):
+    import pytz
+
     # Set Melbourne timezone
     mel_tz = pytz.timezone("Australia/Melbourne")
 
@@ -837,11 +1176,13 @@ def update_Wrike_bot(Bot_Task_ID, newStatus, New_Description):
         "value": wrike_text_cf_value(job_history),
     }]
 
-    params = {
+    return {
         "customFields": json.dumps(custom_fields, ensure_ascii=False),
         "customStatus": newStatus,
     }
 
+
+def _send_WRIKE_bot_update(Bot_Task_ID, newStatus, params):
     response = WRIKE_request("PUT", f"/tasks/{Bot_Task_ID}", params=params)
     logging.info("[update_Wrike_bot] Updating Wrike Bot Task ID %s to status %s", Bot_Task_ID, newStatus)
 
@@ -860,7 +1201,241 @@ def update_Wrike_bot(Bot_Task_ID, newStatus, New_Description):
     if response.status_code != 200:
         logging.error(f"[update_Wrike_bot] Error Updating Bot task id {Bot_Task_ID} to status {newStatus}")
         logging.error(f"[update_Wrike_bot] Response: {response}")
-        sys.exit(1)
+
+    return response
+
+
+# ========= BOT STATUS OUTBOX =========
+WRIKE_STATUS_MAX_ATTEMPTS = 5
+WRIKE_STATUS_BACKOFF = 1.0        # seconds before the first retry, doubling after each failure
+WRIKE_STATUS_FLUSH_TIMEOUT = 60   # longest shutdown waits for queued updates
+
+
+class WrikeStatusOutbox:
+    """
+    Sends bot task status updates from a background worker so webhook processing never
+    waits on Wrike.
+
+    Updates are kept per task and a newer update replaces one that hasn't been sent yet
+    (e.g. "Automation Running" followed quickly by "Completed" sends only "Completed"),
+    so superseded states cost no PUT. Updates for a task are sent in order. Network
+    errors, 429 and 5xx are retried with exponential backoff; other failures are logged
+    and dropped. flush() waits for the queue to drain and runs at interpreter exit.
+    """
+
+    def __init__(self, send, max_attempts: int = WRIKE_STATUS_MAX_ATTEMPTS, backoff: float = WRIKE_STATUS_BACKOFF):
+        """
+        Args:
+            send (callable): send(task_id, status, params) -> response, performing the PUT
+            max_attempts (int): Attempts per update before it is dropped
+            backoff (float): Delay before the first retry in seconds
+        """
+        self._send = send
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._worker = None
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    def enqueue(self, task_id: str, status: str, params: Dict[str, Any]):
+        """Queues an update, replacing any update of the same task that hasn't been sent yet."""
+        with self._cond:
+            if task_id in self._pending:
+                self.coalesced += 1
+                logging.info(f"[WrikeStatusOutbox] Task {task_id}: {self._pending[task_id]['status']} superseded by {status}")
+            # The update is sent later on the worker thread; its span joins the trace of the webhook that queued it
+            self._pending[task_id] = {"status": status, "params": params, "attempts": 0, "not_before": 0.0,
+                                      "trace_parent": tracing.current_span()}
+            self._pending.move_to_end(task_id)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="wrike-status-outbox", daemon=True)
+                self._worker.start()
+            self._cond.notify_all()
+
+    def flush(self, timeout: float = WRIKE_STATUS_FLUSH_TIMEOUT) -> bool:
+        """
+        Blocks until every queued update has been sent (or given up on).
+
+        Returns:
+            bool: False if updates were still queued when the timeout expired
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logging.warning(f"[WrikeStatusOutbox] {len(self._pending)} status update(s) not sent before shutdown: "
+                                    f"{list(self._pending)}")
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _next_ready(self):
+        """Pops the oldest update whose backoff has passed, waiting for one. Called with the lock held."""
+        while True:
+            now = time.monotonic()
+            for task_id, entry in self._pending.items():
+                if entry["not_before"] <= now:
+                    del self._pending[task_id]
+                    return task_id, entry
+            wake_at = min((entry["not_before"] for entry in self._pending.values()), default=None)
+            self._cond.wait(None if wake_at is None else wake_at - now)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                task_id, entry = self._next_ready()
+                self._in_flight += 1
+            error = None
+            retry = False
+            try:
+                with tracing.use_span(entry["trace_parent"]), \
+                        tracing.span("wrike.update_status", **{"wrike.task_id": task_id, "wrike.status": entry["status"],
+                                                               "wrike.attempt": entry["attempts"] + 1}):
+                    response = self._send(task_id, entry["status"], entry["params"])
+                if response.status_code == 200:
+                    self.sent += 1
+                else:
+                    error = f"status {response.status_code}"
+                    retry = response.status_code == 429 or response.status_code >= 500
+            except Exception as e:
+                error = str(e)
+                retry = True
+            with self._cond:
+                self._in_flight -= 1
+                if error is not None:
+                    self._settle(task_id, entry, retry, error)
+                self._cond.notify_all()
+
+    def _settle(self, task_id, entry, retry, error):
+        """Re-queues a failed update with backoff unless a newer one replaced it. Called with the lock held."""
+        entry["attempts"] += 1
+        if task_id in self._pending:
+            logging.info(f"[WrikeStatusOutbox] Task {task_id}: failed {entry['status']} update superseded, not retrying")
+            return
+        if retry and entry["attempts"] < self.max_attempts:
+            delay = self.backoff * 2 ** (entry["attempts"] - 1)
+            logging.warning(f"[WrikeStatusOutbox] Task {task_id}: {entry['status']} update failed ({error}), "
+                            f"retry {entry['attempts']} in {delay:g}s")
+            entry["not_before"] = time.monotonic() + delay
+            self._pending[task_id] = entry
+            self._pending.move_to_end(task_id, last=False)
+            return
+        self.dropped += 1
+        logging.error(f"[WrikeStatusOutbox] Task {task_id}: giving up on {entry['status']} update after "
+                      f"{entry['attempts']} attempt(s): {error}")
+
+
+WRIKE_status_outbox = WrikeStatusOutbox(_send_WRIKE_bot_update)
+atexit.register(WRIKE_status_outbox.flush)
+
+
+# ========= DAEMON MODE =========
+# Instead of spawning `python main.py '<json>'` per webhook, the daemon keeps the
+# interpreter, the Xero client, WRIKE_session and the loaded tokens warm and
+# accepts payloads as HTTP POST bodies, e.g.
+#   curl -X POST --data-binary @payload.json http://127.0.0.1:8787/
+DAEMON_HOST = os.getenv("XERO_PAYROLL_DAEMON_HOST", "127.0.0.1")
+DAEMON_PORT = int(os.getenv("XERO_PAYROLL_DAEMON_PORT", "8787"))
+
+
+def process_webhook(payload):
+    """
+    Records the bot task id for a decoded payload and dispatches it to handle_webhook_payload.
+    Shared by the one-shot command line mode and the daemon.
+    """
+    global bot_task_id
+
+    if isinstance(payload, list) and payload:
+        bot_task_id = payload[0].get("taskId", "unknown_task_id")
+    elif isinstance(payload, dict):
+        bot_task_id = payload.get("taskId", "unknown_task_id")
+    else:
+        bot_task_id = "unknown_task_id"
+
+    logger.info("taskId: %s", bot_task_id)
+
+    xero_api_client = get_xero_client()
+    if not xero_api_client:
+        # handle_webhook_payload reports the missing client back to Wrike
+        return handle_webhook_payload(payload)
+
+    # One request-cache scope per event, so repeated Xero GETs within it are free. The span
+    # is the root of the event's trace (see xero_payroll.tracing).
+    with tracing.span("handle_webhook_payload", **{"wrike.task_id": bot_task_id}) as span, \
+            xero_api_client.request_cache() as cache_stats:
+        result = handle_webhook_payload(payload)
+        if result.get("status") == "error":
+            span.set_error(result.get("error"))
+    logger.info("[process_webhook] Xero request cache: %s hits, %s misses", cache_stats["hits"], cache_stats["misses"])
+    metrics.flush()
+
+    return result
+
+
+def make_webhook_handler():
+    """Builds the daemon's request handler class (http.server is only imported in daemon mode)."""
+    from http.server import BaseHTTPRequestHandler
+
+    class WebhookRequestHandler(BaseHTTPRequestHandler):
+        """Accepts one webhook payload per POST and replies with the handler result as JSON."""
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length)
+
+            try:
+                payload = json.loads(body)
+            except json.JSONDecodeError as e:
+                logger.error(f"[daemon] Error decoding webhook payload: {e}")
+                self._send_json(400, {"status": "error", "error": f"Invalid JSON payload: {str(e)}"})
+                return
+
+            try:
+                result = process_webhook(payload)
+                status_code = 200
+            except Exception as e:
+                logger.error(f"[daemon] Error processing request: {e}", exc_info=True)
+                result = {"status": "error", "error": str(e)}
+                status_code = 500
+
+            self._send_json(status_code, result)
+
+        def _send_json(self, status_code, data):
+            body = json.dumps(data, default=str).encode("utf-8")
+            self.send_response(status_code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Route http.server's access log into webhook.log instead of stderr
+            logger.info("[daemon] " + format, *args)
+
+    return WebhookRequestHandler
+
+
+def serve_webhooks(host: str = DAEMON_HOST, port: int = DAEMON_PORT):
+    """
+    Runs the webhook daemon until interrupted. Events are handled one at a time,
+    since the handler keeps per-event state (bot_task_id, job history) in module globals.
+    """
+    from http.server import HTTPServer
+
+    server = HTTPServer((host, port), make_webhook_handler())
+    logger.info(f"[daemon] Xero Payroll webhook daemon listening on http://{host}:{port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("[daemon] Shutting down")
+    finally:
+        server.server_close()
+        WRIKE_status_outbox.flush()
 
 
 if __name__ == "__main__":
@@ -874,35 +1449,33 @@ if __name__ == "__main__":
     logger.info("="*60)
     
 
+    # Long-running mode: python main.py --serve [port]
+    if len(sys.argv) > 1 and sys.argv[1] == "--serve":
+        port = int(sys.argv[2]) if len(sys.argv) > 2 else DAEMON_PORT
+        serve_webhooks(DAEMON_HOST, port)
+
     # Check if we have a webhook payload
-    if len(sys.argv) > 1:
+    elif len(sys.argv) > 1:
         try:
             # Parse the webhook payload from command line argument
             logger.info("Received webhook payload, parsing JSON...")
             payload = json.loads(sys.argv[1])
             
-            logger.info(f"Payload decoded successfully: {payload}")
-            
-            if isinstance(payload, list) and payload:
-                bot_task_id = payload[0].get("taskId", "unknown_task_id")
-            elif isinstance(payload, dict):
-                bot_task_id = payload.get("taskId", "unknown_task_id")
-            else:
-                bot_task_id = "unknown_task_id"
+            logger.info("Payload decoded successfully")
+            logger.debug("Payload: %s", payload)
 
-            logger.info("taskId: %s", bot_task_id)
-
-
-            
             skip_duplicate_check = False
 
             # Process the webhook payload
-            result = handle_webhook_payload(payload)
+            result = process_webhook(payload)
             
-            # Print the result as JSON
-            json_output = json.dumps(result, indent=2)
-            #print(json_output)
-            logger.info(f"Result: {json_output}")
+            logger.info("Result: %s", result.get("status"))
+            if logger.isEnabledFor(logging.DEBUG):
+                # Log the result as JSON
+                logger.debug("Result: %s", json.dumps(result, indent=2))
+
+            # Make sure the bot task shows the final status before the process exits
+            WRIKE_status_outbox.flush()
 
             #TODO: update bot task with result
 
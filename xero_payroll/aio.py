@@ -0,0 +1,87 @@
+# aio.py
+
+import asyncio
+import weakref
+
+from .api import get_xero_client
+from .ratelimit import CONCURRENT_LIMIT
+
+
+class AsyncXeroAPI:
+    """
+    asyncio front end to XeroAPI with the same get/post/put/list_employees surface.
+
+    Each call runs the blocking client in a worker thread, so token refresh, caching,
+    rate limiting and retries behave exactly as in XeroAPI, while many calls can wait
+    on the network at once. At most `concurrency` calls are in flight, matching Xero's
+    limit of 5 concurrent calls per tenant.
+    """
+
+    def __init__(self, client, concurrency: int = CONCURRENT_LIMIT):
+        """
+        Args:
+            client (XeroAPI): The blocking client doing the actual calls
+            concurrency (int): Calls allowed in flight at once
+        """
+        self.client = client
+        self.concurrency = concurrency
+        # asyncio primitives belong to one event loop, so keep a semaphore per loop
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        return semaphore
+
+    async def run(self, func, *args, **kwargs):
+        """Runs a blocking callable that talks to Xero in a worker thread, holding one concurrency slot."""
+        async with self._semaphore():
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+    async def get(self, endpoint, params=None, memoize=True):
+        """Async XeroAPI.get."""
+        return await self.run(self.client.get, endpoint, params, memoize=memoize)
+
+    async def get_fresh(self, endpoint, params=None, modified_since=None):
+        """Async XeroAPI.get_fresh."""
+        return await self.run(self.client.get_fresh, endpoint, params, modified_since=modified_since)
+
+    async def post(self, endpoint, data):
+        """Async XeroAPI.post."""
+        return await self.run(self.client.post, endpoint, data)
+
+    async def put(self, endpoint, data):
+        """Async XeroAPI.put."""
+        return await self.run(self.client.put, endpoint, data)
+
+    async def list_employees(self):
+        """Async XeroAPI.list_employees (pages are still fetched in order)."""
+        return await self.run(self.client.list_employees)
+
+    async def get_many(self, endpoints, params=None):
+        """
+        GETs several endpoints concurrently.
+
+        Returns:
+            list: One response per endpoint, in input order; a failed call's slot holds its exception
+        """
+        return await asyncio.gather(*(self.get(endpoint, params) for endpoint in endpoints), return_exceptions=True)
+
+
+# Default instance around the default blocking client, created with it on first use
+_default_async_client = None
+
+
+def get_async_xero_client():
+    """
+    Returns an AsyncXeroAPI around get_xero_client()'s client (None if that isn't available).
+    """
+    global _default_async_client
+    client = get_xero_client()
+    if client is None:
+        return None
+    if _default_async_client is None or _default_async_client.client is not client:
+        _default_async_client = AsyncXeroAPI(client)
+    return _default_async_client
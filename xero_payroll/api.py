@@ -2,9 +2,16 @@
 import time
 import os
 import json
-import requests
-from requests_oauthlib import OAuth2Session
-import pytz
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from . import metrics, tracing
+from .cache import ResponseCache, is_empty_collection, modified_since_stamp
+from .ratelimit import CONCURRENT_LIMIT, RateLimiter
+from .tokens import TokenManager
+
+# requests, requests_oauthlib and .transport (which needs requests) are imported when a
+# client is constructed, so importing this module stays cheap
 
 # --- Configuration ---
 CLIENT_ID = "4660E56A39F34A2C8E413794795D48A8"
@@ -18,6 +25,19 @@ if os.path.exists("/home/ubuntu/webhook_magic"):
 else:
     # Development: Local Windows machine
     TOKEN_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "xero_tokens.json")
+TOKEN_FILE = os.getenv("XERO_TOKEN_FILE", TOKEN_FILE)
+
+# Persistent GET response cache shared by all webhook processes (set XERO_CACHE_FILE="" to disable)
+CACHE_FILE = os.getenv("XERO_CACHE_FILE", os.path.join(os.path.dirname(TOKEN_FILE), "xero_cache.sqlite3"))
+
+# Shared rate limit state, so all webhook processes pace their calls together
+RATE_LIMIT_FILE = os.getenv("XERO_RATE_LIMIT_FILE", os.path.join(os.path.dirname(TOKEN_FILE), "xero_ratelimit.json"))
+
+# How many times a call answered with 429 is queued again (after Retry-After) before giving up
+RATE_LIMIT_RETRIES = 3
+
+# Locally indexed copy of LeaveApplications kept in sync incrementally (set XERO_LEAVE_STORE_FILE="" to disable)
+LEAVE_STORE_FILE = os.getenv("XERO_LEAVE_STORE_FILE", os.path.join(os.path.dirname(TOKEN_FILE), "xero_leave_store.sqlite3"))
 
 SCOPE = [
     "openid",
@@ -31,17 +51,23 @@ SCOPE = [
 ]
 
 # --- Xero API Endpoints ---
-BASE_URL = "https://api.xero.com/api.xro/2.0"
-PAYROLL_AU_URL = "https://api.xero.com/payroll.xro/1.0"
+# XERO_API_ROOT / XERO_TOKEN_URL can point the client at a stand-in server (see benchmarks/)
+XERO_API_ROOT = os.getenv("XERO_API_ROOT", "https://api.xero.com")
+BASE_URL = f"{XERO_API_ROOT}/api.xro/2.0"
+PAYROLL_AU_URL = f"{XERO_API_ROOT}/payroll.xro/1.0"
+CONNECTIONS_URL = f"{XERO_API_ROOT}/connections"
+
+# Paged payroll endpoints return at most this many records per page
+PAYROLL_PAGE_SIZE = 100
 AUTHORIZATION_URL = "https://login.xero.com/identity/connect/authorize"
-TOKEN_URL = "https://identity.xero.com/connect/token"
+TOKEN_URL = os.getenv("XERO_TOKEN_URL", "https://identity.xero.com/connect/token")
 
 tenant_id = "993a65df-7298-40d2-8cdd-ca4a71f09e26"
 
 class XeroAPI:
     """A wrapper for the Xero API."""
 
-    def __init__(self, client_id, client_secret, token_file, initial_token=None, tenant_id=None):
+    def __init__(self, client_id, client_secret, token_file, initial_token=None, tenant_id=None, response_cache=None, rate_limiter=None, transport=None):
         """
         Initializes the XeroAPI client.
         
@@ -51,11 +77,38 @@ class XeroAPI:
             token_file (str): Path to the file where tokens will be stored
             initial_token (dict, optional): Initial token dictionary containing access_token and refresh_token
             tenant_id (str, optional): The Xero tenant ID. If not provided, will be fetched from the API
+            response_cache (ResponseCache, optional): Persistent cache consulted by get() for endpoints with a TTL
+            rate_limiter (RateLimiter, optional): Paces every call to stay within Xero's rate limits
+            transport (XeroTransport, optional): Pooled, retrying adapter for the Xero hosts (one is created if omitted)
         """
         self.client_id = client_id
         self.client_secret = client_secret
         self.token_file = token_file
         self.tenant_id = tenant_id
+        self.response_cache = response_cache
+        self.rate_limiter = rate_limiter
+
+        import requests
+        from requests_oauthlib import OAuth2Session
+        from .transport import XeroTransport
+
+        # All Xero traffic, including token refreshes before the OAuth session exists, shares one set of keep-alive pools
+        self.transport = transport or XeroTransport(hosts=(XERO_API_ROOT, TOKEN_URL))
+        self.http = self.transport.mount_on(requests.Session())
+
+        # Request-scoped GET memoization (see request_cache); None when no scope is open.
+        # Worker threads (get_employees_detailed, AsyncXeroAPI) share it, hence the lock.
+        self._request_cache = None
+        self._request_cache_lock = threading.Lock()
+        self.request_cache_hits = 0
+        self.request_cache_misses = 0
+
+        # Per-thread OAuth sessions of worker threads, see _session()
+        self._owner_thread = threading.get_ident()
+        self._sessions = threading.local()
+
+        # Token file shared with other processes: atomic writes, single-flight refresh
+        self.tokens = TokenManager(token_file)
         
         # Try to load existing token from file first
         self.token = self.load_token()
@@ -69,7 +122,6 @@ class XeroAPI:
             raise ValueError("No token available. Please provide an initial token.")
         
         # Check if token is expired and refresh if needed
-        import time
         if self.token.get("expires_at") and self.token.get("expires_at") < time.time():
             print(f"Token is expired (expires_at: {self.token.get('expires_at')}, now: {time.time()}), attempting refresh...")
             try:
@@ -77,39 +129,26 @@ class XeroAPI:
             except Exception as e:
                 print(f"Warning: Token refresh failed, but will attempt to use existing token anyway")
                 print(f"If API calls fail, you'll need to re-authorize the application")
-                # Don't raise here - let the OAuth2Session handle auto-refresh on next request
-            
-        auto_refresh_kwargs = {
-            "client_id": self.client_id,
-            "client_secret": self.client_secret,
-        }
+                # Don't raise here - the next API call retries the refresh
         
+        # No auto_refresh_url: refreshes go through self.tokens (see _ensure_token) so that
+        # only one process at a time uses the rotating refresh token
         self.oauth = OAuth2Session(
             self.client_id,
             token=self.token,
-            auto_refresh_url=TOKEN_URL,
-            auto_refresh_kwargs=auto_refresh_kwargs,
-            token_updater=self.save_token,
         )
+        self.transport.mount_on(self.oauth)
 
     def load_token(self):
-        try:
-            with open(self.token_file, "r") as f:
-                tok = json.load(f)
-            # ensure expires_at exists if only expires_in is present
-            if "expires_at" not in tok and "expires_in" in tok:
-                tok["expires_at"] = int(time.time()) + int(tok["expires_in"])
-            return tok
-        except (FileNotFoundError, json.JSONDecodeError):
-            return None
+        """Returns the token from the token file (cached in memory until the file changes), or None."""
+        return self.tokens.load()
     
     def save_token(self, token):
-        # normalise expires_at for future checks
-        if "expires_at" not in token and "expires_in" in token:
-            token["expires_at"] = int(time.time()) + int(token["expires_in"])
-        with open(self.token_file, "w") as f:
-            json.dump(token, f)
+        """Atomically writes a token to the token file and makes it current."""
+        self.tokens.save(token)
         self.token = token
+        if getattr(self, "oauth", None) is not None:
+            self.oauth.token = token
 
     def get_authorization_url(self):
         """Generates the authorization URL for the user to grant access."""
@@ -125,46 +164,50 @@ class XeroAPI:
         self.save_token(self.token)
         return self.token
 
+    def _request_token_refresh(self, token):
+        """Exchanges a token's refresh_token at TOKEN_URL and returns the new token (not saved)."""
+        print(f"Attempting to refresh token with refresh_token: {token.get('refresh_token', 'MISSING')[:20]}...")
+        response = self.http.post(
+            TOKEN_URL,
+            headers={"Content-Type": "application/x-www-form-urlencoded"},  # add this
+            data={
+                "grant_type": "refresh_token",
+                "refresh_token": token.get("refresh_token"),
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+            },
+            timeout=self.transport.timeout_for(TOKEN_URL),
+        )
+        response.raise_for_status()
+        new_token = response.json()
+        if "expires_at" not in new_token and "expires_in" in new_token:
+            new_token["expires_at"] = int(time.time()) + int(new_token["expires_in"])
+        return new_token
+
+    def _use_token(self, token):
+        if token is not self.token:
+            self.token = token
+            if getattr(self, "oauth", None) is not None:
+                self.oauth.token = token
+        return token
+
     def _refresh_token_internal(self):
         """Internal method to refresh token before OAuth session is fully set up."""
         try:
-            import requests
-            print(f"Attempting to refresh token with refresh_token: {self.token.get('refresh_token', 'MISSING')[:20]}...")
-            response = requests.post(
-                TOKEN_URL,
-                headers={"Content-Type": "application/x-www-form-urlencoded"},  # add this
-                data={
-                    "grant_type": "refresh_token",
-                    "refresh_token": self.token.get("refresh_token"),
-                    "client_id": self.client_id,
-                    "client_secret": self.client_secret,
-                },
-                timeout=30,
-            )
-            response.raise_for_status()
-            new_token = response.json()
-            if "expires_at" not in new_token and "expires_in" in new_token:
-                new_token["expires_at"] = int(time.time()) + int(new_token["expires_in"])
-            self.save_token(new_token)
-            return new_token
+            return self._use_token(self.tokens.refresh(self._request_token_refresh, self.token))
         except Exception as e:
             print(f"Failed to refresh token during initialization: {e}")
             raise
 
     def refresh_token(self):
-        """Refreshes the access token."""
+        """Refreshes the access token (or picks up the one another process just refreshed)."""
         try:
             print("Refreshing access token...")
-            self.token = self.oauth.refresh_token(
-                TOKEN_URL, client_id=self.client_id, client_secret=self.client_secret
-            )
-            if "expires_at" not in self.token and "expires_in" in self.token:
-                self.token["expires_at"] = int(time.time()) + int(self.token["expires_in"])
-            self.save_token(self.token)
+            self._use_token(self.tokens.refresh(self._request_token_refresh, self.token, force=True))
             print("Token refreshed successfully")
             
             # Check connections after refresh
-            connections = self.oauth.get("https://api.xero.com/connections").json()
+            connections = self.oauth.get(CONNECTIONS_URL).json()
             if connections:
                 print(f"Connected to {len(connections)} Xero organization(s)")
                 for conn in connections:
@@ -177,12 +220,24 @@ class XeroAPI:
             print(f"Error refreshing token: {str(e)}")
             raise
 
+    def _ensure_token(self):
+        """
+        Picks up a token refreshed by another process and keeps ours fresh: within the
+        refresh margin a background refresh is started and the call goes ahead with the
+        still-valid token; only an already expired token is refreshed inline.
+        """
+        token = self._use_token(self.tokens.load() or self.token)
+        if self.tokens.is_expired(token):
+            self._use_token(self.tokens.refresh(self._request_token_refresh, token))
+        elif self.tokens.needs_refresh(token):
+            self.tokens.refresh_in_background(self._request_token_refresh, token)
+
     def get_tenant_id(self):
         """Retrieves the tenant ID required for API calls."""
         return "993a65df-7298-40d2-8cdd-ca4a71f09e26"
         if not self.tenant_id:
             try:
-                response = self.oauth.get("https://api.xero.com/connections")
+                response = self.oauth.get(CONNECTIONS_URL)
                 response.raise_for_status()
                 connections = response.json()
                 
@@ -202,33 +257,272 @@ class XeroAPI:
                 raise
         return self.tenant_id
 
-    def get(self, endpoint, params=None):
-        if not self.token:
-            raise ValueError("No token available.")
+    def begin_request_cache(self):
+        """Opens a request scope: until end_request_cache(), repeated GETs of the same endpoint and params are served from memory."""
+        with self._request_cache_lock:
+            self._request_cache = {}
+            self.request_cache_hits = 0
+            self.request_cache_misses = 0
+
+    def end_request_cache(self):
+        """
+        Closes the request scope and drops the memoized responses.
+
+        Returns:
+            dict: hit/miss counts for the scope that was just closed
+        """
+        with self._request_cache_lock:
+            self._request_cache = None
+            return {"hits": self.request_cache_hits, "misses": self.request_cache_misses}
+
+    @contextmanager
+    def request_cache(self):
+        """
+        Context manager around begin_request_cache/end_request_cache, e.g. one webhook event:
+
+            with xero_api_client.request_cache() as stats:
+                summary = get_leave_summary(employee_id)
+            print(stats)  # {'hits': ..., 'misses': ...}
+        """
+        self.begin_request_cache()
+        stats = {}
+        try:
+            yield stats
+        finally:
+            stats.update(self.end_request_cache())
+
+    @staticmethod
+    def _request_cache_key(endpoint, params):
+        return (endpoint, json.dumps(params, sort_keys=True, default=str) if params else None)
+
+    def _send(self, method, endpoint, headers, **kwargs):
+        """
+        Sends one payroll API call through the rate limiter and returns the raw response.
+        Refreshes the token once on 401, and on 429 queues the call again once Xero's
+        Retry-After has passed (up to RATE_LIMIT_RETRIES times).
+        """
+        url = f"{PAYROLL_AU_URL}/{endpoint}"
+        tenant_id = headers["xero-tenant-id"]
+        refreshed = False
+        rate_limited = 0
+        while True:
+            self._ensure_token()
+            if self.rate_limiter is not None:
+                with self.rate_limiter.slot(tenant_id):
+                    r = self._request(method, url, endpoint, headers, **kwargs)
+                self.rate_limiter.record(tenant_id, r)
+            else:
+                r = self._request(method, url, endpoint, headers, **kwargs)
+
+            if r.status_code == 401 and not refreshed:
+                metrics.inc("xero_api_retries_total", reason="401")
+                # token just expired or was revoked; refresh and retry once
+                try:
+                    print(f"[Xero] 401 body: {getattr(r, 'text', '')}")
+                except Exception:
+                    pass
+                self.refresh_token()
+                refreshed = True
+                continue
+            if r.status_code == 429 and self.rate_limiter is not None and rate_limited < RATE_LIMIT_RETRIES:
+                print(f"[Xero] 429 rate limited ({r.headers.get('X-Rate-Limit-Problem', 'unknown')} limit), queueing retry")
+                metrics.inc("xero_api_retries_total", reason="429")
+                rate_limited += 1
+                continue
+            return r
+
+    def _session(self):
+        """
+        The OAuth session for a call on the current thread. requests sessions aren't safe to
+        share between threads, so calls on the thread that created the client use self.oauth
+        and each worker thread gets its own session, with the current token and mounted on
+        self.transport (so all of them share its connection pools).
+        """
+        if threading.get_ident() == self._owner_thread:
+            return self.oauth
+        session = getattr(self._sessions, "oauth", None)
+        if session is None:
+            from requests_oauthlib import OAuth2Session
+
+            session = self._sessions.oauth = self.transport.mount_on(OAuth2Session(self.client_id, token=self.token))
+        elif session.token is not self.token:
+            # Refreshed since this thread's last call
+            session.token = self.token
+        return session
+
+    def _request(self, method, url, endpoint, headers, **kwargs):
+        """One HTTP exchange on the OAuth session, recorded in the metrics and traced when those are enabled."""
+        timeout = self.transport.timeout_for(endpoint)
+        if not metrics.enabled() and not tracing.enabled():
+            return self._session().request(method, url, headers=headers, timeout=timeout, **kwargs)
+        started = time.perf_counter()
+        r = None
+        with tracing.span(f"xero.{method} {metrics.endpoint_label(endpoint)}", tracing.KIND_CLIENT,
+                          **{"http.method": method, "xero.endpoint": endpoint}) as span:
+            try:
+                r = self._session().request(method, url, headers=headers, timeout=timeout, **kwargs)
+                span.set_attribute("http.status_code", r.status_code)
+                if r.status_code >= 400:
+                    span.set_error(f"HTTP {r.status_code}")
+                return r
+            finally:
+                metrics.record_http("xero_api", method, endpoint, r, time.perf_counter() - started)
+
+    def remaining_budget(self):
+        """
+        Returns the tenant's remaining Xero call budget, so batch jobs can pace themselves.
+
+        Returns:
+            dict: minute, day and retry_after as reported by RateLimiter.remaining, or None without a rate limiter
+        """
+        if self.rate_limiter is None:
+            return None
+        return self.rate_limiter.remaining(self.get_tenant_id())
+
+    def connection_stats(self):
+        """
+        Returns connection reuse per Xero host (see XeroTransport.stats), to confirm calls
+        ride on kept-alive connections instead of paying a TLS handshake each.
+        """
+        return self.transport.stats()
+
+    def _fetch(self, endpoint, params=None, extra_headers=None):
+        """Sends one GET to the payroll API and returns the raw response."""
         headers = {
             "xero-tenant-id": self.get_tenant_id(),
             "Accept": "application/json",
         }
-        url = f"{PAYROLL_AU_URL}/{endpoint}"
-        r = self.oauth.get(url, headers=headers, params=params, timeout=30)
-        if r.status_code == 401:
-            # token just expired or was revoked; refresh and retry once
-            try:
-                print(f"[Xero] 401 body: {getattr(r, 'text', '')}")
-            except Exception:
-                pass
-            self.refresh_token()
-            r = self.oauth.get(url, headers=headers, params=params, timeout=30)
+        if extra_headers:
+            headers.update(extra_headers)
+        return self._send("GET", endpoint, headers, params=params)
+
+    def _get_through_response_cache(self, endpoint, params):
+        """
+        Serves a GET from the persistent cache while the entry is within its TTL, otherwise
+        revalidates it with If-Modified-Since. Xero answers an unchanged resource with a 304
+        or an empty record list; for a collection, a non-empty answer holds only the changed
+        records, so the full collection is fetched again.
+
+        A paged collection is revalidated once, through page 1: Xero filters the whole
+        collection by If-Modified-Since, so any change shows up there, and drops every cached
+        entry of the collection. Later pages are served from the cache only while page 1's
+        entry is current (nothing changed since they were stored), and fetched plainly otherwise.
+        """
+        cache = self.response_cache
+        tenant_id = self.get_tenant_id()
+        key = cache.make_key(tenant_id, endpoint, params)
+        entry = cache.lookup(key)
+        now = time.time()
+        ttl = cache.ttl_for(endpoint)
+
+        page = int((params or {}).get("page", 1))
+        if page > 1:
+            first = cache.lookup(cache.make_key(tenant_id, endpoint, dict(params, page=1)))
+            if entry and first and now - first["fetched_at"] < ttl:
+                cache.hits += 1
+                metrics.inc("xero_api_cache_total", cache="response", result="hit")
+                return entry["data"]
+            r = self._fetch(endpoint, params)
+        elif entry and now - entry["fetched_at"] < ttl:
+            cache.hits += 1
+            metrics.inc("xero_api_cache_total", cache="response", result="hit")
+            return entry["data"]
+        elif entry:
+            r = self._fetch(endpoint, params, {"If-Modified-Since": entry["last_modified"]})
+            if r.status_code == 304 or (r.ok and is_empty_collection(r.json())):
+                cache.revalidated += 1
+                metrics.inc("xero_api_cache_total", cache="response", result="revalidated")
+                cache.touch(key, now)
+                return entry["data"]
+            if r.ok:
+                # Changed: the other cached pages (and records) of the collection may be stale too
+                cache.invalidate(tenant_id, endpoint)
+                if "/" not in endpoint:
+                    r = self._fetch(endpoint, params)
+        else:
+            r = self._fetch(endpoint, params)
+
+        cache.misses += 1
+        metrics.inc("xero_api_cache_total", cache="response", result="miss")
+        r.raise_for_status()
+        data = r.json()
+        cache.store(key, tenant_id, endpoint, data, now, modified_since_stamp(r))
+        return data
+
+    def get(self, endpoint, params=None, memoize=True):
+        if not self.token:
+            raise ValueError("No token available.")
+
+        cache = None
+        cache_key = None
+        if memoize and self._request_cache is not None:
+            cache_key = self._request_cache_key(endpoint, params)
+            with self._request_cache_lock:
+                cache = self._request_cache
+                hit = cache is not None and cache_key in cache
+                if hit:
+                    self.request_cache_hits += 1
+                    data = cache[cache_key]
+                elif cache is not None:
+                    self.request_cache_misses += 1
+            if hit:
+                metrics.inc("xero_api_cache_total", cache="request", result="hit")
+                return data
+            if cache is not None:
+                metrics.inc("xero_api_cache_total", cache="request", result="miss")
+
+        if self.response_cache is not None and self.response_cache.ttl_for(endpoint) is not None:
+            data = self._get_through_response_cache(endpoint, params)
+        else:
+            r = self._fetch(endpoint, params)
+            r.raise_for_status()
+            data = r.json()
+
+        if cache is not None:
+            with self._request_cache_lock:
+                # Unless the scope was closed (or a new one opened) meanwhile
+                if self._request_cache is cache:
+                    cache[cache_key] = data
+        return data
+
+    def get_fresh(self, endpoint, params=None, modified_since=None):
+        """
+        GETs straight from Xero, bypassing the request and response caches.
+
+        Args:
+            endpoint (str): Payroll endpoint, e.g. "LeaveApplications"
+            params (dict, optional): Query parameters
+            modified_since (str, optional): UTC timestamp (yyyy-mm-ddThh:mm:ss); Xero then
+                returns only records created or modified since then
+
+        Returns:
+            dict: The decoded response, or an empty dict if Xero answered 304 Not Modified
+        """
+        if not self.token:
+            raise ValueError("No token available.")
+        extra_headers = {"If-Modified-Since": modified_since} if modified_since else None
+        r = self._fetch(endpoint, params, extra_headers)
+        if r.status_code == 304:
+            return {}
         r.raise_for_status()
         return r.json()
 
+    def _invalidate_cached_reads(self, endpoint):
+        # Any write may change what a cached GET would return
+        with self._request_cache_lock:
+            if self._request_cache:
+                self._request_cache.clear()
+        if self.response_cache is not None:
+            self.response_cache.invalidate(self.get_tenant_id(), endpoint)
+
     def post(self, endpoint, data):
         headers = {
             "xero-tenant-id": self.get_tenant_id(),
             "Content-Type": "application/json",
             "Accept": "application/json",
         }
-        r = self.oauth.post(f"{PAYROLL_AU_URL}/{endpoint}", headers=headers, json=data, timeout=30)
+        r = self._send("POST", endpoint, headers, json=data)
+        self._invalidate_cached_reads(endpoint)
         r.raise_for_status()
         return r.json()
 
@@ -239,10 +533,61 @@ class XeroAPI:
             "Content-Type": "application/json",
             "Accept": "application/json",
         }
-        r = self.oauth.put(f"{PAYROLL_AU_URL}/{endpoint}", headers=headers, json=data, timeout=30)
+        r = self._send("PUT", endpoint, headers, json=data)
+        self._invalidate_cached_reads(endpoint)
         r.raise_for_status()
         return r.json()
     
+    def iter_pages(self, endpoint, collection, params=None, modified_since=None, fresh=False, prefetch=False):
+        """
+        Lazily yields every record of a paged payroll collection, walking page=1, 2, ...
+        until a short page comes back. Pages are not kept in the request cache, so memory
+        stays bounded by one page (two with prefetch).
+
+        Args:
+            endpoint (str): Payroll endpoint, e.g. "LeaveApplications"
+            collection (str): Key of the record list in the response, e.g. "LeaveApplications"
+            params (dict, optional): Extra query parameters sent with every page
+            modified_since (str, optional): Only records changed since this UTC timestamp (implies fresh)
+            fresh (bool): Bypass the persistent response cache
+            prefetch (bool): Fetch the next page on a background thread while the current one is consumed
+        """
+        def fetch(page):
+            page_params = dict(params or {}, page=page)
+            if fresh or modified_since:
+                response = self.get_fresh(endpoint, page_params, modified_since)
+            else:
+                response = self.get(endpoint, page_params, memoize=False)
+            return response.get(collection, [])
+
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        if executor:
+            # page fetches on the prefetch thread belong to the caller's trace
+            fetch = tracing.propagate(fetch)
+        try:
+            page = 1
+            pending = executor.submit(fetch, page) if executor else None
+            while True:
+                records = pending.result() if executor else fetch(page)
+                more = len(records) >= PAYROLL_PAGE_SIZE
+                if executor and more:
+                    pending = executor.submit(fetch, page + 1)
+                yield from records
+                if not more:
+                    break
+                page += 1
+        finally:
+            if executor:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+    def iter_employees(self, prefetch=False, **kwargs):
+        """Yields every employee record (as returned by GET Employees), one page at a time. See iter_pages."""
+        return self.iter_pages("Employees", "Employees", prefetch=prefetch, **kwargs)
+
+    def iter_leave_applications(self, prefetch=False, **kwargs):
+        """Yields every leave application record, one page at a time. See iter_pages."""
+        return self.iter_pages("LeaveApplications", "LeaveApplications", prefetch=prefetch, **kwargs)
+
     def list_employees(self):
         """
         Retrieves a list of all employees from Xero Payroll.
@@ -257,15 +602,9 @@ class XeroAPI:
         """
         print("\nAttempting to list employees...")
         
-        response = self.get("Employees")
-        #print("\nFull API Response:")
-        #print(json.dumps(response, indent=2))
-        
-        employees = response.get("Employees", [])  # Note: Changed to match Xero's response structure
-        
         # Format the response to include only necessary information
         employee_list = []
-        for employee in employees:
+        for employee in self.iter_employees():
             employee_info = {
                 "EmployeeID": employee.get("EmployeeID"),
                 "FirstName": employee.get("FirstName"),
@@ -277,6 +616,34 @@ class XeroAPI:
             
         return employee_list
 
+    def get_employees_detailed(self, employee_ids, max_workers=CONCURRENT_LIMIT):
+        """
+        Fetches the full Employees/{id} record (LeaveBalances, OrdinaryEarningsRateID, ...)
+        of many employees in parallel on a bounded thread pool. Every call still goes
+        through the rate limiter, so max_workers beyond Xero's concurrent limit only queues.
+
+        Args:
+            employee_ids (list): EmployeeIDs to fetch
+            max_workers (int): Calls in flight at once
+
+        Returns:
+            list: One employee dict per input ID, in input order; an employee that could not
+                  be fetched gets the exception raised for it instead
+        """
+        employee_ids = list(employee_ids)
+
+        def fetch(employee_id):
+            try:
+                response = self.get(f"Employees/{employee_id}")
+                return response.get("Employees", [{}])[0]
+            except Exception as e:
+                return e
+
+        if not employee_ids:
+            return []
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(employee_ids)))) as executor:
+            return list(executor.map(tracing.propagate(fetch), employee_ids))
+
 
 # Function to create the API client instance
 def create_xero_client(initial_token=None, tenant_id="993a65df-7298-40d2-8cdd-ca4a71f09e26"):
@@ -295,23 +662,60 @@ def create_xero_client(initial_token=None, tenant_id="993a65df-7298-40d2-8cdd-ca
         client_secret=CLIENT_SECRET,
         token_file=TOKEN_FILE,
         initial_token=initial_token,
-        tenant_id=tenant_id
+        tenant_id=tenant_id,
+        response_cache=ResponseCache(CACHE_FILE) if CACHE_FILE else None,
+        rate_limiter=RateLimiter(RATE_LIMIT_FILE) if RATE_LIMIT_FILE else None,
     )
 
-# Default instance - will try to load token from file
-xero_api_client = None
-try:
-    print(f"Attempting to initialize Xero API client from: {TOKEN_FILE}")
-    print(f"Token file exists: {os.path.exists(TOKEN_FILE)}")
-    xero_api_client = create_xero_client()
-    print(f"✓ Xero API client initialized successfully")
-except ValueError as e:
-    print(f"❌ ValueError: Xero API client not initialized - {e}")
-    print(f"Token file location: {TOKEN_FILE}")
-    print(f"Token file exists: {os.path.exists(TOKEN_FILE)}")
-except Exception as e:
-    print(f"❌ Error initializing Xero API client: {e}")
-    print(f"Token file location: {TOKEN_FILE}")
-    print(f"Token file exists: {os.path.exists(TOKEN_FILE)}")
-    import traceback
-    traceback.print_exc()
+# Default instance, created from TOKEN_FILE on first use (see get_xero_client)
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_xero_client():
+    """
+    Returns the default XeroAPI client, creating it on first call. Nothing touches the
+    token file or the network until then.
+
+    Returns:
+        XeroAPI: The shared client, or None if it could not be created (retried on the next call)
+    """
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = _create_default_client()
+    return _default_client
+
+
+def set_xero_client(client):
+    """Replaces the default client returned by get_xero_client (e.g. one built with an explicit token)."""
+    global _default_client
+    _default_client = client
+
+
+def _create_default_client():
+    try:
+        print(f"Attempting to initialize Xero API client from: {TOKEN_FILE}")
+        print(f"Token file exists: {os.path.exists(TOKEN_FILE)}")
+        client = create_xero_client()
+        print(f"✓ Xero API client initialized successfully")
+        return client
+    except ValueError as e:
+        print(f"❌ ValueError: Xero API client not initialized - {e}")
+        print(f"Token file location: {TOKEN_FILE}")
+        print(f"Token file exists: {os.path.exists(TOKEN_FILE)}")
+    except Exception as e:
+        print(f"❌ Error initializing Xero API client: {e}")
+        print(f"Token file location: {TOKEN_FILE}")
+        print(f"Token file exists: {os.path.exists(TOKEN_FILE)}")
+        import traceback
+        traceback.print_exc()
+    return None
+
+
+def __getattr__(name):
+    # `xero_payroll.api.xero_api_client` still works, but now builds the client on first access
+    if name == "xero_api_client":
+        return get_xero_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
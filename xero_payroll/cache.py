@@ -0,0 +1,145 @@
+# cache.py
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+# Seconds a stored response is served without contacting Xero. Once an entry is older
+# than this it is revalidated with If-Modified-Since. "Employees" also covers
+# "Employees/{id}" unless that endpoint has its own entry; endpoints that resolve
+# to no TTL are never cached.
+DEFAULT_TTLS = {
+    "Employees": 300,
+    "LeaveApplications": 300,
+}
+
+# Xero expects If-Modified-Since as a UTC timestamp in this format
+XERO_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+class ResponseCache:
+    """
+    Disk-backed (SQLite) cache of Xero payroll GET responses shared by every process
+    that points at the same file. Entries are keyed by tenant, endpoint and params.
+    """
+
+    def __init__(self, path: str, ttls: dict = None):
+        """
+        Args:
+            path (str): SQLite database file, created on first use
+            ttls (dict, optional): endpoint -> TTL in seconds, defaults to DEFAULT_TTLS
+        """
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    cache_key TEXT PRIMARY KEY,
+                    tenant_id TEXT NOT NULL,
+                    collection TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    last_modified TEXT NOT NULL
+                )"""
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def ttl_for(self, endpoint: str):
+        """Returns the TTL for an endpoint, or None if it should not be cached."""
+        if endpoint in self.ttls:
+            return self.ttls[endpoint]
+        return self.ttls.get(_collection(endpoint))
+
+    @staticmethod
+    def make_key(tenant_id: str, endpoint: str, params=None) -> str:
+        return json.dumps([tenant_id, endpoint, params or {}], sort_keys=True, default=str)
+
+    def lookup(self, key: str):
+        """Returns the stored entry as a dict with data, fetched_at and last_modified, or None."""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT body, fetched_at, last_modified FROM responses WHERE cache_key = ?", (key,)
+            ).fetchone()
+        if not row:
+            return None
+        return {"data": json.loads(row[0]), "fetched_at": row[1], "last_modified": row[2]}
+
+    def store(self, key: str, tenant_id: str, endpoint: str, data, fetched_at: float, last_modified: str):
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, tenant_id, _collection(endpoint).lower(), json.dumps(data), fetched_at, last_modified),
+            )
+            conn.commit()
+
+    def touch(self, key: str, fetched_at: float):
+        """Marks an entry as freshly revalidated without rewriting its body."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("UPDATE responses SET fetched_at = ? WHERE cache_key = ?", (fetched_at, key))
+            conn.commit()
+
+    def invalidate(self, tenant_id: str, endpoint: str):
+        """Drops every entry of the endpoint's collection, e.g. after a POST to it."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "DELETE FROM responses WHERE tenant_id = ? AND collection = ?",
+                (tenant_id, _collection(endpoint).lower()),
+            )
+            conn.commit()
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "revalidated": self.revalidated, "misses": self.misses}
+
+
+def _collection(endpoint: str) -> str:
+    """'Employees/abc' -> 'Employees'"""
+    return endpoint.split("/", 1)[0]
+
+
+def is_empty_collection(data) -> bool:
+    """True for a Xero response whose record lists are all empty (nothing modified since)."""
+    if not isinstance(data, dict):
+        return False
+    lists = [value for value in data.values() if isinstance(value, list)]
+    return bool(lists) and not any(lists)
+
+
+def modified_since_stamp(response) -> str:
+    """
+    Timestamp to send as If-Modified-Since on the next revalidation. Taken from the
+    response's Date header where possible so local clock skew doesn't lose updates.
+    """
+    server_date = response.headers.get("Date") if response is not None else None
+    moment = None
+    if server_date:
+        # email.utils is slow to import and requests has loaded it by the time a response exists
+        from email.utils import parsedate_to_datetime
+        try:
+            moment = parsedate_to_datetime(server_date)
+        except (TypeError, ValueError):
+            moment = None
+    if moment is None:
+        moment = datetime.fromtimestamp(time.time(), tz=timezone.utc)
+    return moment.astimezone(timezone.utc).strftime(XERO_TIMESTAMP_FORMAT)
@@ -0,0 +1,95 @@
+# filelock.py
+
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows (local development)
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def locked(path: str):
+    """
+    Holds an exclusive lock on `path` (created if missing) for the duration of the block,
+    blocking until other processes release it. Used to coordinate state shared between
+    webhook processes through small files next to the token file.
+    """
+    try:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+    except PermissionError:
+        # Lock file created by another user (umask applies); flock works on a read-only descriptor
+        fd = os.open(path, os.O_RDONLY)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        else:
+            # msvcrt locks a byte range; LK_LOCK retries for ~10s before raising
+            while True:
+                try:
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        yield
+    finally:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        os.close(fd)
+
+
+def write_json_atomic(path: str, data, fsync: bool = True):
+    """
+    Writes `data` as JSON to a temporary file next to `path` and renames it over `path`,
+    so concurrent readers see either the old or the new content, never a partial file.
+    The file keeps the permissions it already had. Pass fsync=False for state that may
+    be lost in a crash (the rename is still atomic, only durability is given up).
+    """
+    write_text_atomic(path, json.dumps(data), fsync)
+
+
+def write_text_atomic(path: str, text: str, fsync: bool = True):
+    """Like write_json_atomic, for text that is already rendered."""
+    path = str(path)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        # mkstemp creates the file 0600
+        os.chmod(tmp_path, _file_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _read_umask() -> int:
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# The umask can only be read by setting it, process-wide, which would race with other
+# threads creating files; so it is read once, at import
+_UMASK = _read_umask()
+
+
+def _file_mode(path: str) -> int:
+    try:
+        return os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
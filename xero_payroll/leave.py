@@ -1,9 +1,35 @@
 # leave.py
 
+import json
+import os
+import time
 from datetime import date, datetime
-from .api import xero_api_client
+from . import metrics, tracing
+from .api import get_xero_client
+from .dates import parse_xero_date, xero_dates_to_datetime64
+from .logconfig import Diagnostics
+from .models import APPROVED_STATUSES, Employee, LeaveApplication
+from .ratelimit import MINUTE_LIMIT, RateLimitExceeded
+from .sync import leave_application_store
 from .utils import calculate_accrued_leave
 
+# Progress output of the functions below; DEBUG logging unless XERO_PAYROLL_DIAGNOSTICS says otherwise
+diagnostics = Diagnostics(__name__)
+
+# Parsed leave applications by LeaveApplicationID, as (UpdatedDateUTC, LeaveApplication), so
+# an unchanged record is only parsed once per process (the daemon keeps them across
+# webhooks). Emptied when it reaches APPLICATION_CACHE_SIZE entries.
+APPLICATION_CACHE_SIZE = 200000
+_application_cache = {}
+
+# A bulk leave summary costs one Employees/{id} GET per employee, on top of the pages of
+# the employee list and of the leave applications. The GETs go out BULK_BATCH_SIZE at a
+# time, each batch waiting until the minute's budget can take all of it, so webhooks still
+# get calls in between. A run is refused, and a later batch not started, if it would leave
+# fewer than BULK_DAY_RESERVE of the tenant's daily Xero calls for the webhooks.
+BULK_BATCH_SIZE = int(os.getenv("XERO_PAYROLL_BULK_BATCH_SIZE", "50"))
+BULK_DAY_RESERVE = int(os.getenv("XERO_PAYROLL_BULK_DAY_RESERVE", "1000"))
+
 # --- Leave Types ---
 # These are the standard leave types mapped to their display names in Xero
 LEAVE_TYPES = {
@@ -13,171 +39,339 @@ LEAVE_TYPES = {
     # Add other leave types as they become available in your Xero setup
 }
 
+def _employee(response: dict) -> Employee:
+    """The Employee record of an Employees/{id} response (empty if there is none)."""
+    return Employee.from_xero(response.get("Employees", [{}])[0])
+
+def _fetch_employee(employee_id: str) -> Employee:
+    """Fetches one employee's record (Employees/{id}) with the default Xero client."""
+    return _employee(get_xero_client().get(f"Employees/{employee_id}"))
+
+def _cache_application(leave_application_id, updated, app: dict):
+    """
+    Parses a raw leave application dict and keeps the record in _application_cache.
+    Returns None, with a warning, for a malformed record.
+    """
+    try:
+        record = LeaveApplication.from_xero(app)
+    except (TypeError, ValueError) as e:
+        diagnostics.warning("Could not process leave application: %s", e)
+        return None
+    if leave_application_id and updated is not None:
+        if len(_application_cache) >= APPLICATION_CACHE_SIZE:
+            _application_cache.clear()
+        _application_cache[leave_application_id] = (updated, record)
+    return record
+
+def _parse_applications(applications) -> list:
+    """
+    Turns raw leave application dicts into LeaveApplication records, skipping malformed
+    ones. Records parsed before and not updated since come from _application_cache.
+    """
+    parsed = []
+    for app in applications:
+        leave_application_id = app.get("LeaveApplicationID")
+        updated = app.get("UpdatedDateUTC")
+        cached = _application_cache.get(leave_application_id)
+        if cached is not None and updated is not None and cached[0] == updated:
+            parsed.append(cached[1])
+            continue
+        record = _cache_application(leave_application_id, updated, app)
+        if record is not None:
+            parsed.append(record)
+    return parsed
+
+def _stored_applications(tenant_id: str, employee_id: str, leave_type_id: str = None, start_after: date = None, start_until: date = None) -> list:
+    """
+    An employee's applications from the local store (filtered as in
+    LeaveApplicationStore.application_rows_for_employee); only new or changed records are JSON-decoded.
+    """
+    parsed = []
+    rows = leave_application_store.application_rows_for_employee(tenant_id, employee_id, leave_type_id, start_after, start_until)
+    for leave_application_id, updated, body in rows:
+        cached = _application_cache.get(leave_application_id)
+        if cached is not None and updated is not None and cached[0] == updated:
+            parsed.append(cached[1])
+            continue
+        record = _cache_application(leave_application_id, updated, json.loads(body))
+        if record is not None:
+            parsed.append(record)
+    return parsed
+
+def _starts_within(app: dict, after: date, until: date) -> bool:
+    """Whether a raw leave application starts after `after` and by `until` (either may be None); undated ones do."""
+    start = parse_xero_date(app.get("StartDate"))
+    return start is None or ((after is None or start > after) and (until is None or start <= until))
+
+def _employee_leave_applications(employee_id: str, leave_type_id: str = None, after: date = None, until: date = None) -> list:
+    """
+    Returns the leave applications (LeaveApplication records) of one employee, optionally
+    only those of one LeaveTypeID and starting after `after` and by `until` (undated ones
+    kept). Served from the incrementally synced local store when it is enabled, otherwise
+    filtered out of the full LeaveApplications list. Either way the filters are applied
+    before parsing, so a one-shot process only builds records for the applications it uses.
+    """
+    xero_api_client = get_xero_client()
+    employee_id = str(employee_id).strip()
+    if leave_application_store is not None:
+        leave_application_store.sync(xero_api_client)
+        return _stored_applications(xero_api_client.get_tenant_id(), employee_id, leave_type_id, after, until)
+
+    # The tenant-wide scan only tests the EmployeeID; the rest runs on this employee's few records
+    applications = [
+        app for app in xero_api_client.iter_leave_applications()
+        if str(app.get("EmployeeID", "")).strip() == employee_id
+    ]
+    if leave_type_id:
+        leave_type_id = str(leave_type_id).strip()
+        applications = [app for app in applications if str(app.get("LeaveTypeID", "")).strip() == leave_type_id]
+    if after is not None or until is not None:
+        applications = [app for app in applications if _starts_within(app, after, until)]
+    return _parse_applications(applications)
+
+def _starting_after(applications: list, after: date) -> list:
+    """
+    The raw leave applications starting after `after` (undated ones kept). Their StartDate
+    column is decoded in one vectorized pass, so applications the caller would skip are
+    dropped before they are parsed.
+    """
+    if not applications:
+        return applications
+    import numpy as np
+
+    starts = xero_dates_to_datetime64([app.get("StartDate") for app in applications])
+    keep = np.isnat(starts) | (starts > np.datetime64(after, "D"))
+    return [app for app, kept in zip(applications, keep.tolist()) if kept]
+
+def _leave_applications_by_employee(employee_ids: list, after: date = None) -> dict:
+    """
+    Returns {EmployeeID: [LeaveApplication]} for the given employees. Uses the local store when
+    enabled, otherwise groups a single pass over the full LeaveApplications list. With `after`,
+    only applications starting after that date (or undated) are returned.
+    """
+    xero_api_client = get_xero_client()
+    if leave_application_store is not None:
+        leave_application_store.sync(xero_api_client)
+        tenant_id = xero_api_client.get_tenant_id()
+        return {
+            employee_id: _stored_applications(tenant_id, employee_id, start_after=after)
+            for employee_id in employee_ids
+        }
+
+    grouped = {employee_id: [] for employee_id in employee_ids}
+    matching = [
+        app for app in xero_api_client.iter_leave_applications(prefetch=True)
+        if str(app.get("EmployeeID", "")).strip() in grouped
+    ]
+    if after is not None:
+        matching = _starting_after(matching, after)
+    for app in matching:
+        grouped[str(app.get("EmployeeID", "")).strip()].append(app)
+    return {employee_id: _parse_applications(applications) for employee_id, applications in grouped.items()}
+
+def _check_bulk_budget(xero_api_client, calls: int):
+    """
+    Refuses bulk work that would leave fewer than BULK_DAY_RESERVE of the day's Xero calls.
+    Bulk runs check once the employee list and leave application pages are fetched, so
+    the remaining budget already has those calls taken off.
+
+    Args:
+        xero_api_client (XeroAPI): Client whose tenant budget is checked
+        calls (int): Xero calls the work still needs
+
+    Returns:
+        dict: The budget as returned by XeroAPI.remaining_budget (None without a rate limiter)
+
+    Raises:
+        RateLimitExceeded: The work would leave fewer than BULK_DAY_RESERVE calls for today
+    """
+    budget = xero_api_client.remaining_budget()
+    day_remaining = budget.get("day") if budget else None
+    if day_remaining is not None and day_remaining - calls < BULK_DAY_RESERVE:
+        raise RateLimitExceeded(
+            f"Bulk leave work needs {calls} more Xero calls, but only {day_remaining} are "
+            f"left today and {BULK_DAY_RESERVE} are kept for webhooks"
+        )
+    return budget
+
+def _batch_wait(xero_api_client, batch_size: int) -> float:
+    """
+    Seconds to wait before sending a batch of batch_size bulk calls: until Xero's
+    Retry-After has passed and the minute's budget can take the whole batch.
+
+    Raises:
+        RateLimitExceeded: The batch would leave fewer than BULK_DAY_RESERVE calls for today
+    """
+    budget = _check_bulk_budget(xero_api_client, batch_size)
+    if not budget:
+        return 0.0
+    short = min(batch_size, MINUTE_LIMIT) - budget["minute"]
+    return max(budget["retry_after"], short * 60.0 / MINUTE_LIMIT, 0.0)
+
+def _employees_in_batches(xero_api_client, employee_ids: list):
+    """
+    Yields (EmployeeID, employee dict) in input order, fetching the detail records
+    BULK_BATCH_SIZE at a time (see _batch_wait). An employee that could not be fetched
+    gets the exception instead, and so does every employee left once a batch would eat
+    into BULK_DAY_RESERVE.
+    """
+    for start in range(0, len(employee_ids), BULK_BATCH_SIZE):
+        batch = employee_ids[start:start + BULK_BATCH_SIZE]
+        try:
+            wait = _batch_wait(xero_api_client, len(batch))
+        except RateLimitExceeded as e:
+            diagnostics.warning("Stopping with %d employees left: %s", len(employee_ids) - start, e)
+            yield from ((employee_id, e) for employee_id in employee_ids[start:])
+            return
+        if wait > 0:
+            diagnostics("Waiting %.1fs for Xero's call budget before %d more employees", wait, len(batch))
+            time.sleep(wait)
+        yield from zip(batch, xero_api_client.get_employees_detailed(batch))
+
+@metrics.timed("leave_function_seconds", errors="leave_function_errors_total")
+@tracing.traced()
 def get_employee_leave_balance(employee_id: str, leave_type: str) -> float:
     """Retrieves the current leave balance for a selected employee and leave type."""
-    response = xero_api_client.get(f"Employees/{employee_id}")
-    employee = response.get("Employees", [{}])[0]
+    employee = _fetch_employee(employee_id)
     
     # Get the Xero leave name for our internal leave type
     xero_leave_name = LEAVE_TYPES.get(leave_type)
     if not xero_leave_name:
         return 0.0
     
+    return _leave_balance(employee, xero_leave_name)
+
+def _leave_balance(employee: Employee, xero_leave_name: str) -> float:
+    """Current balance of the named leave type on an employee record (0.0 if absent)."""
     # Search by leave name
-    for balance in employee.get("LeaveBalances", []):
-        if balance.get("LeaveName") == xero_leave_name:
-            return float(balance.get("NumberOfUnits", 0.0))
-    
-    return 0.0
+    balance = employee.balance(xero_leave_name)
+    return balance.hours if balance else 0.0
 
+@metrics.timed("leave_function_seconds", errors="leave_function_errors_total")
+@tracing.traced()
 def get_future_scheduled_leave(employee_id: str, leave_type: str) -> float:
     """Finds the future scheduled leave for an employee for a given leave category."""
-    from datetime import datetime
     today = date.today()
     
-    # Get all leave applications
-    response = xero_api_client.get("LeaveApplications")
-    applications = response.get("LeaveApplications", [])
-    
     # Get the Xero leave name for our internal leave type
     xero_leave_name = LEAVE_TYPES.get(leave_type)
     if not xero_leave_name:
-        print(f"Warning: Leave type '{leave_type}' is not configured in this Xero account")
+        diagnostics.warning("Leave type '%s' is not configured in this Xero account", leave_type)
         return 0.0
     
     # First get the leave type ID from the employee's leave balances
-    response = xero_api_client.get(f"Employees/{employee_id}")
-    employee = response.get("Employees", [{}])[0]
-    
-    leave_type_id = None
-    for balance in employee.get("LeaveBalances", []):
-        if balance.get("LeaveName") == xero_leave_name:
-            leave_type_id = balance.get("LeaveTypeID")
-            break
+    employee = _fetch_employee(employee_id)
+    balance = employee.balance(xero_leave_name)
+    leave_type_id = balance.leave_type_id if balance else None
     
     if not leave_type_id:
-        print(f"Warning: Could not find leave type ID for {xero_leave_name}")
+        diagnostics.warning("Could not find leave type ID for %s", xero_leave_name)
         return 0.0
 
-    response = xero_api_client.get("LeaveApplications")
-    applications = response.get("LeaveApplications", [])
+    applications = _employee_leave_applications(employee_id, leave_type_id, after=today)
     
     # Debug output
-    print(f"\nSearching for future leave applications of type: {leave_type}")
-    print(f"Found {len(applications)} total leave applications")
-    
-    # Debug output to understand what we're working with
-    #print(f"\nEmployee ID: {employee_id}")
-    #print(f"Leave Type ID: {leave_type_id}")
+    diagnostics("\nSearching for future leave applications of type: %s", leave_type)
+    diagnostics("Found %d future leave applications of this type for this employee", len(applications))
     
+    # Record IDs come stripped (see models.LeaveApplication), so only ours needs cleaning
+    employee_id = str(employee_id).strip()
     total_hours = 0.0
     future_applications = []
     for app in applications:
-        # Clean up the IDs by stripping whitespace and ensuring they're strings
-        app_employee_id = str(app.get("EmployeeID", "")).strip()
-        app_leave_type_id = str(app.get("LeaveTypeID", "")).strip()
-        employee_id = str(employee_id).strip()
-        leave_type_id = str(leave_type_id).strip()
-        
-        # Debug output for each application
-        #print(f"\nChecking application:")
-        #print(f"Application Employee ID: '{app_employee_id}' (len: {len(app_employee_id)})")
-        #print(f"Expected Employee ID:    '{employee_id}' (len: {len(employee_id)})")
-        #print(f"Application Leave Type:  '{app_leave_type_id}' (len: {len(app_leave_type_id)})")
-        #print(f"Expected Leave Type:     '{leave_type_id}' (len: {len(leave_type_id)})")
-        
-        # Check byte-by-byte comparison
-        #print("Employee ID bytes:", [ord(c) for c in app_employee_id])
-        #print("Expected ID bytes:", [ord(c) for c in employee_id])
-        
-        # Check if this application belongs to our employee
-        if app_employee_id != employee_id:
-            #print("-> Employee ID did not match")
-            continue
-            
-        # Check if this is the right leave type
-        if app_leave_type_id != leave_type_id:
-            #print("-> Leave Type ID did not match")
+        # Check if this application belongs to our employee, and is the right leave type
+        if app.employee_id != employee_id or app.leave_type_id != leave_type_id:
             continue
             
         # Process leave application dates
-        start_date_str = app.get("StartDate", "")
-        if start_date_str:
-            try:
-                # Extract timestamp from Xero date format
-                timestamp = int(start_date_str.split('(')[1].split(')')[0].split('+')[0]) / 1000
-                app_date = datetime.fromtimestamp(timestamp).date()
-                
-                #print(f"\nProcessing Leave Application:")
-                #print(f"Title: {app.get('Title', 'Untitled')}")
-                #print(f"Start Date: {app_date}")
-                #print(f"Today: {today}")
-                
-                if app_date <= today:
-                    #print(f"-> Skipping as {app_date} is not in the future")
-                    continue
-                
-                # Found a future leave application, check its status
-                periods = app.get('LeavePeriods', [])
-                if not periods:
-                    #print("-> No leave periods found")
-                    continue
-                    
-                # Check if any periods are approved or processed
-                valid_statuses = {'APPROVED', 'PROCESSED'}
-                valid_periods = [p for p in periods if p.get('LeavePeriodStatus') in valid_statuses]
-                
-                if not valid_periods:
-                    print("-> No approved or processed leave periods found")
-                    continue
-                
-                print(f"-> Found {len(valid_periods)} approved/processed leave periods!")
-                for period in valid_periods:
-                    #print(f"   - Hours: {period.get('NumberOfUnits')}")
-                    #print(f"     Status: {period.get('LeavePeriodStatus')}")
-                    #print(f"     Period: {period.get('PayPeriodStartDate')} to {period.get('PayPeriodEndDate')}")
-                    total_hours += float(period.get('NumberOfUnits', 0.0))
+        if app.start_date is not None:
+            if app.start_date <= today:
+                continue
+            
+            # Found a future leave application, check its status
+            if not app.periods:
+                continue
                 
-            except Exception as e:
-                print(f"Warning: Could not process leave application: {str(e)}")
+            # Check if any periods are approved or processed
+            valid_periods = [p for p in app.periods if p.status in APPROVED_STATUSES]
+            
+            if not valid_periods:
+                diagnostics("-> No approved or processed leave periods found")
                 continue
+            
+            diagnostics("-> Found %d approved/processed leave periods!", len(valid_periods))
+            for period in valid_periods:
+                total_hours += period.hours
         
         # Only include APPROVED or SUBMITTED applications
-        period_status = next((p.get("LeavePeriodStatus") for p in app.get("LeavePeriods", [])), None)
-        if period_status not in ["PROCESSED", "APPROVED"]:
+        if app.status not in APPROVED_STATUSES:
             continue
             
         # Add up the hours
-        leave_periods = app.get("LeavePeriods", [])
-        period_hours = sum(float(period.get("NumberOfUnits", 0.0)) for period in leave_periods)
-        total_hours += period_hours
+        total_hours += app.hours
         
         # Store for debug output
         future_applications.append({
-            'title': app.get('Title', 'Untitled'),
-            'start': app.get('StartDate'),
-            'end': app.get('EndDate'),
-            'hours': period_hours
+            'start': app.start_date,
+            'end': app.end_date,
+            'hours': app.hours
         })
     
     # Debug output
     if future_applications:
-        print(f"\nFound {len(future_applications)} future leave application(s):")
+        diagnostics("\nFound %d future leave application(s):", len(future_applications))
         #for app in future_applications:
-        #    print(f"- {app['title']}: {app['start']} to {app['end']}, Hours: {app['hours']}")
+        #    print(f"- {app['start']} to {app['end']}, Hours: {app['hours']}")
     else:
-        print("\nNo future leave applications found for this employee and leave type")
+        diagnostics("\nNo future leave applications found for this employee and leave type")
                 
     return total_hours
 
-def get_leave_summary(employee_id: str) -> dict:
-    """Returns a comprehensive leave summary for all categories for the selected employee."""
-    from datetime import datetime, timedelta
+def _accrued_hours(xero_leave_name: str, today: date, future_date: date, hours_per_week: float = 38.0) -> float:
+    """Leave accrued between today and future_date at the standard rate for the given Xero leave name."""
+    # Calculate accrual rates based on leave type name from Xero
+    days_between = (future_date - today).days
+    daily_hours = hours_per_week / 5  # Convert weekly hours to daily hours
     
-    # Get employee details and current balances
-    response = xero_api_client.get(f"Employees/{employee_id}")
-    employee = response.get("Employees", [{}])[0]
-    employee_name = f"{employee.get('FirstName', '')} {employee.get('LastName', '')}".strip()
+    if xero_leave_name == "Annual Leave":
+        # Standard annual leave accrual (4 weeks per year)
+        return calculate_accrued_leave(today, future_date, hours_per_week)
+    elif xero_leave_name == "Personal/Carer's Leave":
+        # Personal/Carer's leave accrues at 10 days per year
+        yearly_hours = 10 * daily_hours  # 10 days per year
+        return (yearly_hours / 365) * days_between
+    elif xero_leave_name == "Long Service Leave":
+        # Long Service Leave accrues at 6.5 weeks per 10 years
+        # 6.5 weeks = 32.5 days per 10 years = 3.25 days per year
+        yearly_days = 3.25  # days per year
+        yearly_hours = yearly_days * daily_hours
+        return abs((yearly_hours / 365) * days_between)  # Ensure positive accrual
+    # Other leave types don't accrue
+    return 0.0
+
+def _scheduled_leave(applications: list, today: date, future_date: date):
+    """
+    Yields each application starting after today and by future_date that has APPROVED/PROCESSED
+    periods; only its approved_hours count. Callers pass one leave type's applications, or
+    group by leave_type_id, since leave only comes off the balance of its own type.
+    """
+    for app in applications:
+        start_date = app.start_date
+            
+        # Only count if the start date is in the future
+        if start_date is not None and today < start_date <= future_date:
+            # Only count APPROVED or PROCESSED periods
+            if any(period.status in APPROVED_STATUSES for period in app.periods):
+                yield app
+
+def _build_leave_summary(employee: Employee, applications: list, today: date) -> dict:
+    """
+    Builds the get_leave_summary structure from an employee record (with LeaveBalances)
+    and that employee's leave applications, without any Xero calls.
+    """
+    from datetime import timedelta
+
+    employee_name = employee.name
     
     # Initialize summary structure
     summary = {
@@ -186,29 +380,18 @@ def get_leave_summary(employee_id: str) -> dict:
         "future_leave_requests": [],
         "future_balances": {}
     }
-    #logging.info(f"\nGenerating leave summary for employee: {employee_name} (ID: {employee_id})")
     # Process current balances and get leave type mappings
     leave_type_mapping = {}  # Maps LeaveTypeID to LeaveName
     
-    # Debug - print raw leave balances from Xero
-    print("\nRaw Leave Balances from Xero:")
-    print("-" * 40)
-    for balance in employee.get("LeaveBalances", []):
-        print(f"Leave Type: {balance.get('LeaveName')}")
-        print(f"Balance: {balance.get('NumberOfUnits')} hours")
-        print(f"Leave Type ID: {balance.get('LeaveTypeID')}")
-        print("-" * 20)
-    
-    for balance in employee.get("LeaveBalances", []):
-        leave_name = balance.get("LeaveName")
+    for balance in employee.leave_balances:
+        leave_name = balance.leave_name
         if not leave_name:
             continue
             
-        leave_type_id = balance.get("LeaveTypeID")
-        current_balance = float(balance.get("NumberOfUnits", 0.0))
+        current_balance = balance.hours
         
         summary["current_balances"][leave_name] = current_balance
-        leave_type_mapping[leave_type_id] = leave_name
+        leave_type_mapping[balance.leave_type_id] = leave_name
         
         # Initialize future balances
         summary["future_balances"][leave_name] = {
@@ -218,84 +401,57 @@ def get_leave_summary(employee_id: str) -> dict:
         }
     
     # Get future leave requests
-    today = datetime.now().date()
     six_months = today + timedelta(days=180)
     
-    response = xero_api_client.get("LeaveApplications")
-    for app in response.get("LeaveApplications", []):
-        if app.get("EmployeeID") != employee_id:
-            continue
+    for app in applications:
+        start_date = app.start_date
             
-        # Parse leave application date
-        start_date_str = app.get("StartDate", "")
-        if not start_date_str:
+        # Skip if undated or not in the future
+        if start_date is None or start_date <= today:
             continue
             
-        try:
-            timestamp = int(start_date_str.split('(')[1].split(')')[0].split('+')[0]) / 1000
-            start_date = datetime.fromtimestamp(timestamp).date()
+        # Get the leave details
+        leave_type = leave_type_mapping.get(app.leave_type_id)
+        if not leave_type:
+            continue
             
-            # Skip if not in the future
-            if start_date <= today:
-                continue
-                
-            # Get the leave details
-            leave_type = leave_type_mapping.get(app.get("LeaveTypeID"))
-            if not leave_type:
-                continue
-                
-            # Calculate total hours for this request
-            total_hours = sum(
-                float(period.get("NumberOfUnits", 0.0))
-                for period in app.get("LeavePeriods", [])
-                if period.get("LeavePeriodStatus") in {"APPROVED", "PROCESSED"}
-            )
+        # Total hours of the APPROVED/PROCESSED periods of this request
+        total_hours = app.approved_hours
+        
+        if total_hours > 0:
+            # Add to future leave requests list
+            request_info = {
+                "date": start_date.isoformat(),
+                "leave_type": leave_type,
+                "days": total_hours / 8.0,  # Convert hours to days
+                "status": "Approved/Processed"
+            }
+            summary["future_leave_requests"].append(request_info)
             
-            if total_hours > 0:
-                # Add to future leave requests list
-                request_info = {
-                    "date": start_date.strftime("%Y-%m-%d"),
-                    "leave_type": leave_type,
-                    "days": total_hours / 8.0,  # Convert hours to days
-                    "status": "Approved/Processed"
-                }
-                summary["future_leave_requests"].append(request_info)
-                
-                # Update future balances if within 6 months
-                if start_date <= six_months:
-                    summary["future_balances"][leave_type]["requested"] += total_hours
-                    
-        except:
-            continue
+            # Update future balances if within 6 months
+            if start_date <= six_months:
+                summary["future_balances"][leave_type]["requested"] += total_hours
     
     # Sort future leave requests by date
     summary["future_leave_requests"].sort(key=lambda x: x["date"])
     
+    # Scheduled leave over the next six months by leave type, as predict_leave_balance counts it
+    scheduled_to_six_months = {}
+    for app in _scheduled_leave(applications, today, six_months):
+        leave_type = leave_type_mapping.get(app.leave_type_id)
+        scheduled_to_six_months[leave_type] = scheduled_to_six_months.get(leave_type, 0.0) + app.approved_hours
+    
     # Calculate future accrual and remaining balances
     for leave_type in summary["future_balances"]:
-        # Calculate 6-month future date for accrual prediction
-        future_date = six_months
-        
-        # Get the internal leave type name
-        internal_leave_type = None
-        for key, value in LEAVE_TYPES.items():
-            if value == leave_type:
-                internal_leave_type = key
-                break
-                
-        if internal_leave_type:
-            # Convert to our internal leave type
+        # Only our configured leave types accrue
+        if leave_type in LEAVE_TYPES.values():
             current = summary["future_balances"][leave_type]["raw_balance"]
             
-            # Get the predicted balance which includes accrual
-            predicted = predict_leave_balance(employee_id, internal_leave_type, future_date)
+            # The predicted balance includes accrual, as in predict_leave_balance
+            predicted = current + _accrued_hours(leave_type, today, six_months) - scheduled_to_six_months.get(leave_type, 0.0)
             
             # Calculate only the accrued portion (always positive)
             accrued_amount = abs(predicted - current)
-            
-            # Don't accrue for Other Unpaid Leave
-            if leave_type == "Other Unpaid Leave":
-                accrued_amount = 0.0
         else:
             accrued_amount = 0.0
             
@@ -308,88 +464,241 @@ def get_leave_summary(employee_id: str) -> dict:
     
     return summary
 
+@metrics.timed("leave_function_seconds", errors="leave_function_errors_total")
+@tracing.traced()
+def get_leave_summary(employee_id: str) -> dict:
+    """Returns a comprehensive leave summary for all categories for the selected employee."""
+    # Get employee details and current balances
+    employee = _fetch_employee(employee_id)
+    
+    #logging.info(f"\nGenerating leave summary for employee: {employee_name} (ID: {employee_id})")
+    _print_raw_leave_balances(employee)
+    
+    today = datetime.now().date()
+    # The summary only looks at leave starting after today
+    return _build_leave_summary(employee, _employee_leave_applications(employee_id, after=today), today)
+
+def _print_raw_leave_balances(employee: Employee):
+    # Debug - print raw leave balances from Xero
+    diagnostics("\nRaw Leave Balances from Xero:")
+    diagnostics("-" * 40)
+    for balance in employee.leave_balances:
+        diagnostics("Leave Type: %s", balance.leave_name)
+        diagnostics("Balance: %s hours", balance.hours)
+        diagnostics("Leave Type ID: %s", balance.leave_type_id)
+        diagnostics("-" * 20)
+
+@metrics.timed("leave_function_seconds", errors="leave_function_errors_total")
+@tracing.traced()
+def get_leave_summary_bulk(employee_ids: list = None, active_only: bool = True) -> dict:
+    """
+    Returns get_leave_summary's structure for many employees in one pass: employees and
+    leave applications are fetched once and the applications grouped by EmployeeID,
+    instead of O(employees x leave types) calls. Each employee still needs one
+    Employees/{id} GET, as only the detail record carries LeaveBalances; those run
+    in parallel (see XeroAPI.get_employees_detailed), in batches paced against the call
+    budget (see BULK_BATCH_SIZE).
+
+    Args:
+        employee_ids (list, optional): EmployeeIDs to summarise; defaults to every employee
+        active_only (bool): When listing every employee, skip those not ACTIVE
+
+    Returns:
+        dict: EmployeeID -> summary, or {"error": "..."} for an employee that could not be
+              fetched (including those left when the day's calls ran down to BULK_DAY_RESERVE)
+
+    Raises:
+        RateLimitExceeded: Not enough of the day's Xero calls left for the run
+    """
+    xero_api_client = get_xero_client()
+    today = datetime.now().date()
+    if employee_ids is None:
+        employee_ids = [
+            employee.get("EmployeeID") for employee in xero_api_client.iter_employees(prefetch=True)
+            if not active_only or employee.get("Status") == "ACTIVE"
+        ]
+    employee_ids = [str(employee_id).strip() for employee_id in employee_ids]
+    # The summary only looks at leave starting after today
+    applications_by_employee = _leave_applications_by_employee(employee_ids, after=today)
+    _check_bulk_budget(xero_api_client, len(employee_ids))
+
+    summaries = {}
+    for employee_id, employee in _employees_in_batches(xero_api_client, employee_ids):
+        if isinstance(employee, Exception):
+            if not isinstance(employee, RateLimitExceeded):
+                diagnostics.warning("Could not fetch employee %s: %s", employee_id, employee)
+            summaries[employee_id] = {"error": str(employee)}
+            continue
+        summaries[employee_id] = _build_leave_summary(
+            Employee.from_xero(employee), applications_by_employee[employee_id], today
+        )
+    return summaries
+
+@metrics.timed("leave_function_seconds", errors="leave_function_errors_total")
+@tracing.traced()
 def predict_leave_balance(employee_id: str, leave_type: str, future_date: date, hours_per_week: float = 38.0) -> float:
     """
     Predicts the leave balance for an employee on a future date.
-    Calculates accrual for different leave types based on standard rates.
+    Calculates accrual for different leave types based on standard rates, less the
+    APPROVED/PROCESSED leave of this leave type scheduled until then.
     """
-    # Get current balance
-    current_balance = get_employee_leave_balance(employee_id, leave_type)
-    
-    # Get scheduled leave
-    total_scheduled = 0.0
-    
     # Convert internal leave type to Xero leave type name for balance check
     xero_leave_name = LEAVE_TYPES.get(leave_type)
     if not xero_leave_name:
-        return current_balance  # Return current balance if leave type not found
+        return 0.0  # No balance for a leave type that isn't configured
+    
+    # Get current balance, and the leave type ID whose leave comes off it
+    balance = _fetch_employee(employee_id).balance(xero_leave_name)
+    current_balance = balance.hours if balance else 0.0
+    leave_type_id = balance.leave_type_id if balance else None
     
     # Calculate accrual based on leave type
     today = date.today()
-    accrued_leave = 0.0
+    accrued_leave = _accrued_hours(xero_leave_name, today, future_date, hours_per_week)
     
-    # Calculate accrual rates based on leave type name from Xero
-    days_between = (future_date - today).days
-    daily_hours = hours_per_week / 5  # Convert weekly hours to daily hours
-    
-    if xero_leave_name == "Annual Leave":
-        # Standard annual leave accrual (4 weeks per year)
-        accrued_leave = calculate_accrued_leave(today, future_date, hours_per_week)
-    elif xero_leave_name == "Personal/Carer's Leave":
-        # Personal/Carer's leave accrues at 10 days per year
-        yearly_hours = 10 * daily_hours  # 10 days per year
-        accrued_leave = (yearly_hours / 365) * days_between
-    elif xero_leave_name == "Long Service Leave":
-        # Long Service Leave accrues at 6.5 weeks per 10 years
-        # 6.5 weeks = 32.5 days per 10 years = 3.25 days per year
-        yearly_days = 3.25  # days per year
-        yearly_hours = yearly_days * daily_hours
-        accrued_leave = abs((yearly_hours / 365) * days_between)  # Ensure positive accrual
-    # Other leave types don't accrue
-    else:
-        accrued_leave = 0.0
-    
-    # Get scheduled leave
-    response = xero_api_client.get("LeaveApplications")
-    applications = response.get("LeaveApplications", [])
+    # Get scheduled leave of this type (only what starts between today and future_date counts)
+    total_scheduled = 0.0
+    applications = _employee_leave_applications(employee_id, leave_type_id, after=today, until=future_date) if leave_type_id else []
     
     # Add debug logging
-    print(f"\nDebug - Leave Balance Prediction:")
-    print(f"Current Balance: {current_balance:.2f} hours")
-    print(f"Accrued Leave: {accrued_leave:.2f} hours")
+    diagnostics("\nDebug - Leave Balance Prediction:")
+    diagnostics("Current Balance: %.2f hours", current_balance)
+    diagnostics("Accrued Leave: %.2f hours", accrued_leave)
     
-    for app in applications:
-        if app.get("EmployeeID") != employee_id:
-            continue
-            
-        start_date_str = app.get("StartDate", "")
-        if not start_date_str:
-            continue
-            
-        try:
-            timestamp = int(start_date_str.split('(')[1].split(')')[0].split('+')[0]) / 1000
-            start_date = datetime.fromtimestamp(timestamp).date()
-            
-            # Only count if the start date is in the future
-            if today < start_date <= future_date:
-                # Only count APPROVED or PROCESSED periods
-                leave_periods = app.get("LeavePeriods", [])
-                valid_periods = [p for p in leave_periods 
-                               if p.get("LeavePeriodStatus") in {"APPROVED", "PROCESSED"}]
-                
-                if valid_periods:
-                    period_hours = sum(float(period.get("NumberOfUnits", 0.0)) 
-                                     for period in valid_periods)
-                    total_scheduled += period_hours
-                    print(f"Found scheduled leave: {period_hours} hours from {start_date}")
-        except:
-            continue
+    for app in _scheduled_leave(applications, today, future_date):
+        total_scheduled += app.approved_hours
+        diagnostics("Found scheduled leave: %s hours from %s", app.approved_hours, app.start_date)
     
     predicted = current_balance + accrued_leave - total_scheduled
-    print(f"Scheduled Leave: {total_scheduled:.2f} hours")
-    print(f"Predicted Balance: {predicted:.2f} hours")
+    diagnostics("Scheduled Leave: %.2f hours", total_scheduled)
+    diagnostics("Predicted Balance: %.2f hours", predicted)
     return predicted
 
+@metrics.timed("leave_function_seconds", errors="leave_function_errors_total")
+@tracing.traced()
+def project_leave_balances_bulk(employee_ids: list, target_dates: list, hours_per_week: float = 38.0) -> dict:
+    """
+    Projects every configured leave type of each employee to many target dates in one
+    NumPy operation (see projection.project_leave_balances). Each row subtracts only the
+    APPROVED/PROCESSED leave scheduled for its own leave type, so a value matches what
+    predict_leave_balance returns for that employee, leave type and date. The
+    Employees/{id} GETs go out in batches paced against the call budget, as in
+    get_leave_summary_bulk.
+
+    Returns:
+        dict: "rows" -> [(EmployeeID, leave type)], "dates" -> target_dates,
+              "balances" -> ndarray of shape (len(rows), len(target_dates)) in hours,
+              "errors" -> {EmployeeID: message} for employees that could not be fetched
+              (their rows are NaN)
+
+    Raises:
+        RateLimitExceeded: Not enough of the day's Xero calls left for the run
+    """
+    from .projection import project_leave_balances, scheduled_leave_arrays
+
+    xero_api_client = get_xero_client()
+    employee_ids = [str(employee_id).strip() for employee_id in employee_ids]
+    # The projection only subtracts leave starting after today
+    applications_by_employee = _leave_applications_by_employee(employee_ids, after=date.today())
+    _check_bulk_budget(xero_api_client, len(employee_ids))
+
+    rows = []
+    current_balances = []
+    leave_names = []
+    row_applications = []
+    errors = {}
+    for employee_id, employee in _employees_in_batches(xero_api_client, employee_ids):
+        if isinstance(employee, Exception):
+            if not isinstance(employee, RateLimitExceeded):
+                diagnostics.warning("Could not fetch employee %s: %s", employee_id, employee)
+            errors[employee_id] = str(employee)
+            for leave_type, xero_leave_name in LEAVE_TYPES.items():
+                rows.append((employee_id, leave_type))
+                current_balances.append(float("nan"))
+                leave_names.append(xero_leave_name)
+                row_applications.append([])
+            continue
+        employee = Employee.from_xero(employee)
+        for leave_type, xero_leave_name in LEAVE_TYPES.items():
+            balance = employee.balance(xero_leave_name)
+            leave_type_id = balance.leave_type_id if balance else None
+            rows.append((employee_id, leave_type))
+            current_balances.append(balance.hours if balance else 0.0)
+            leave_names.append(xero_leave_name)
+            # Each row only loses leave of its own type
+            row_applications.append([
+                app for app in applications_by_employee[employee_id]
+                if leave_type_id and app.leave_type_id == leave_type_id
+            ])
+
+    balances = project_leave_balances(
+        current_balances,
+        hours_per_week,
+        leave_names,
+        target_dates,
+        scheduled=scheduled_leave_arrays(row_applications),
+    )
+    return {"rows": rows, "dates": list(target_dates), "balances": balances, "errors": errors}
+
+@metrics.timed("leave_function_seconds", errors="leave_function_errors_total")
+@tracing.traced()
+def leave_balance_timeline(employee_id: str, leave_type: str, start: date = None, end: date = None, hours_per_week: float = 38.0):
+    """
+    Builds the daily projected balance curve of one leave type between start and end
+    (inclusive): accrual, with the rates of predict_leave_balance, less a prefix sum of
+    the APPROVED/PROCESSED leave scheduled for this leave type. The returned timeline answers
+    balance_on(day) and first_date_with_balance(hours) without further Xero calls.
+
+    Args:
+        employee_id (str): The Xero EmployeeID
+        leave_type (str): Internal leave type, a key of LEAVE_TYPES
+        start (date, optional): First day of the curve, defaults to today
+        end (date, optional): Last day of the curve, defaults to a year after start
+
+    Returns:
+        projection.LeaveBalanceTimeline
+    """
+    from datetime import timedelta
+    import numpy as np
+    from .projection import LeaveBalanceTimeline, project_leave_balances, scheduled_leave_arrays
+
+    xero_leave_name = LEAVE_TYPES.get(leave_type)
+    if not xero_leave_name:
+        raise ValueError(f"Leave type '{leave_type}' is not configured in this Xero account")
+
+    start = start or date.today()
+    end = end or start + timedelta(days=365)
+    if end < start:
+        raise ValueError(f"Timeline end {end} is before its start {start}")
+
+    employee = _fetch_employee(employee_id)
+    # Only this leave type's applications come off its balance
+    balance = employee.balance(xero_leave_name)
+    leave_type_id = balance.leave_type_id if balance else None
+    applications = _employee_leave_applications(employee_id, leave_type_id, after=date.today()) if leave_type_id else []
+
+    days = np.arange(np.datetime64(start, "D"), np.datetime64(end, "D") + 1)
+    balances = project_leave_balances(
+        [_leave_balance(employee, xero_leave_name)],
+        hours_per_week,
+        [xero_leave_name],
+        days,
+        scheduled=scheduled_leave_arrays([applications]),
+    )[0]
+    return LeaveBalanceTimeline(days, balances)
+
+
+def _post_leave_application(endpoint: str, data: dict):
+    """POSTs a leave application write and marks the local store stale so its next lookup sees the change."""
+    xero_api_client = get_xero_client()
+    response = xero_api_client.post(endpoint, data)
+    if leave_application_store is not None:
+        leave_application_store.mark_stale(xero_api_client.get_tenant_id())
+    return response
+
+
+@metrics.timed("leave_function_seconds", errors="leave_function_errors_total")
+@tracing.traced()
 def create_leave_request(employee_id: str, leave_type: str, start_date: str, end_date: str, description: str, hours: float):
     """Lodges a leave request for an employee."""
     # Get the Xero leave name for our internal leave type
@@ -398,14 +707,9 @@ def create_leave_request(employee_id: str, leave_type: str, start_date: str, end
         raise ValueError(f"Leave type '{leave_type}' is not configured in this Xero account")
 
     # Get the leave type ID from the employee's leave balances
-    response = xero_api_client.get(f"Employees/{employee_id}")
-    employee = response.get("Employees", [{}])[0]
-    
-    leave_type_id = None
-    for balance in employee.get("LeaveBalances", []):
-        if balance.get("LeaveName") == xero_leave_name:
-            leave_type_id = balance.get("LeaveTypeID")
-            break
+    employee = _fetch_employee(employee_id)
+    balance = employee.balance(xero_leave_name)
+    leave_type_id = balance.leave_type_id if balance else None
             
     if not leave_type_id:
         raise ValueError(f"Could not find leave type ID for {xero_leave_name}")
@@ -424,15 +728,17 @@ def create_leave_request(employee_id: str, leave_type: str, start_date: str, end
             }
         ]
     }
-    return xero_api_client.post("leaveapplications", data)
+    return _post_leave_application("leaveapplications", data)
 
+@metrics.timed("leave_function_seconds", errors="leave_function_errors_total")
+@tracing.traced()
 def approve_leave_request(leave_application_id: str):
     """Approves a leave request."""
     # The Xero API uses a POST to a sub-resource for approval.
     # This is a conceptual example. The actual endpoint might differ.
     # It's common to update the status of the leave application.
     # Let's assume we update the status to 'Approved'.
-    response = xero_api_client.get(f"leaveapplications/{leave_application_id}")
+    response = get_xero_client().get(f"leaveapplications/{leave_application_id}")
     leave_application = response['leaveApplications'][0]
     
     # Update the status. This is a simplified example.
@@ -440,18 +746,20 @@ def approve_leave_request(leave_application_id: str):
     leave_application['status'] = 'Approved' # This is a guess, check API docs.
 
     # The endpoint to update is usually the same as the GET but with a PUT/POST
-    return xero_api_client.post(f"leaveapplications/{leave_application_id}", leave_application)
+    return _post_leave_application(f"leaveapplications/{leave_application_id}", leave_application)
 
 
+@metrics.timed("leave_function_seconds", errors="leave_function_errors_total")
+@tracing.traced()
 def reject_leave_request(leave_application_id: str):
     """Rejects a leave request."""
     # Similar to approval, this would likely involve updating the status.
-    response = xero_api_client.get(f"leaveapplications/{leave_application_id}")
+    response = get_xero_client().get(f"leaveapplications/{leave_application_id}")
     leave_application = response['leaveApplications'][0]
     
     leave_application['status'] = 'Rejected' # This is a guess, check API docs.
 
-    return xero_api_client.post(f"leaveapplications/{leave_application_id}", leave_application)
+    return _post_leave_application(f"leaveapplications/{leave_application_id}", leave_application)
 
 
 def update_leave_balance(employee_id: str, leave_type: str, new_balance: float):
@@ -467,14 +775,9 @@ def update_leave_balance(employee_id: str, leave_type: str, new_balance: float):
         raise ValueError(f"Leave type '{leave_type}' is not configured in this Xero account")
 
     # Get the leave type ID from the employee's leave balances
-    response = xero_api_client.get(f"Employees/{employee_id}")
-    employee = response.get("Employees", [{}])[0]
-    
-    leave_type_id = None
-    for balance in employee.get("LeaveBalances", []):
-        if balance.get("LeaveName") == xero_leave_name:
-            leave_type_id = balance.get("LeaveTypeID")
-            break
+    employee = _fetch_employee(employee_id)
+    balance = employee.balance(xero_leave_name)
+    leave_type_id = balance.leave_type_id if balance else None
             
     if not leave_type_id:
         raise ValueError(f"Could not find leave type ID for {xero_leave_name}")
@@ -482,8 +785,8 @@ def update_leave_balance(employee_id: str, leave_type: str, new_balance: float):
     # The Xero API might not allow direct PUT/POST to update a leave balance.
     # This is a conceptual function. You would typically adjust balances
     # through pay items in a pay run.
-    print("Warning: Direct leave balance updates may not be supported. "
-          "This is a conceptual function.")
+    diagnostics.warning("Direct leave balance updates may not be supported. "
+                        "This is a conceptual function.")
     
     # Example of what the payload *could* look like if it were supported.
     data = {
@@ -496,5 +799,123 @@ def update_leave_balance(employee_id: str, leave_type: str, new_balance: float):
         ]
     }
     # This endpoint is hypothetical.
-    # return xero_api_client.post(f"Employees/{employee_id}", data)
+    # return get_xero_client().post(f"Employees/{employee_id}", data)
     raise NotImplementedError("Direct leave balance updates are not typically supported via the API.")
+
+
+# --- Async counterparts ---
+# Same results as the functions above, for callers running an event loop. Xero calls go
+# through AsyncXeroAPI, so independent calls (e.g. one Employees/{id} per employee) overlap
+# instead of running back to back, at most 5 at a time. asyncio and .aio are only imported
+# by these functions.
+
+def _async_client():
+    from .aio import get_async_xero_client
+    return get_async_xero_client()
+
+async def _employee_and_applications_async(employee_id: str, after: date = None):
+    """Fetches an employee record and their leave applications (starting after `after`) concurrently."""
+    import asyncio
+
+    async_xero_api_client = _async_client()
+    response, applications = await asyncio.gather(
+        async_xero_api_client.get(f"Employees/{employee_id}"),
+        async_xero_api_client.run(_employee_leave_applications, employee_id, None, after),
+    )
+    return _employee(response), applications
+
+async def get_employee_leave_balance_async(employee_id: str, leave_type: str) -> float:
+    """Async get_employee_leave_balance."""
+    employee = _employee(await _async_client().get(f"Employees/{employee_id}"))
+    xero_leave_name = LEAVE_TYPES.get(leave_type)
+    if not xero_leave_name:
+        return 0.0
+    return _leave_balance(employee, xero_leave_name)
+
+async def get_future_scheduled_leave_async(employee_id: str, leave_type: str) -> float:
+    """Async get_future_scheduled_leave."""
+    return await _async_client().run(get_future_scheduled_leave, employee_id, leave_type)
+
+async def get_leave_summary_async(employee_id: str) -> dict:
+    """Async get_leave_summary; the employee record and leave applications are fetched concurrently."""
+    today = datetime.now().date()
+    employee, applications = await _employee_and_applications_async(employee_id, after=today)
+    _print_raw_leave_balances(employee)
+    return _build_leave_summary(employee, applications, today)
+
+async def _employees_in_batches_async(async_xero_api_client, employee_ids: list) -> list:
+    """Async _employees_in_batches, returning the (EmployeeID, Employees/{id} response) pairs as a list."""
+    import asyncio
+
+    pairs = []
+    for start in range(0, len(employee_ids), BULK_BATCH_SIZE):
+        batch = employee_ids[start:start + BULK_BATCH_SIZE]
+        try:
+            wait = await async_xero_api_client.run(_batch_wait, async_xero_api_client.client, len(batch))
+        except RateLimitExceeded as e:
+            diagnostics.warning("Stopping with %d employees left: %s", len(employee_ids) - start, e)
+            pairs.extend((employee_id, e) for employee_id in employee_ids[start:])
+            break
+        if wait > 0:
+            diagnostics("Waiting %.1fs for Xero's call budget before %d more employees", wait, len(batch))
+            await asyncio.sleep(wait)
+        responses = await async_xero_api_client.get_many([f"Employees/{employee_id}" for employee_id in batch])
+        pairs.extend(zip(batch, responses))
+    return pairs
+
+@metrics.timed("leave_function_seconds", errors="leave_function_errors_total")
+@tracing.traced()
+async def get_leave_summary_bulk_async(employee_ids: list = None, active_only: bool = True) -> dict:
+    """
+    Async get_leave_summary_bulk: the per-employee Employees/{id} GETs of each batch run
+    concurrently (capped at Xero's 5 concurrent calls), within the same call budget.
+
+    Returns:
+        dict: EmployeeID -> summary, or {"error": "..."} for an employee that could not be fetched
+    """
+    async_xero_api_client = _async_client()
+    xero_api_client = async_xero_api_client.client
+    today = datetime.now().date()
+    if employee_ids is None:
+        employees = await async_xero_api_client.run(lambda: list(xero_api_client.iter_employees(prefetch=True)))
+        employee_ids = [
+            employee.get("EmployeeID") for employee in employees
+            if not active_only or employee.get("Status") == "ACTIVE"
+        ]
+    employee_ids = [str(employee_id).strip() for employee_id in employee_ids]
+    applications_by_employee = await async_xero_api_client.run(_leave_applications_by_employee, employee_ids, today)
+    await async_xero_api_client.run(_check_bulk_budget, xero_api_client, len(employee_ids))
+
+    summaries = {}
+    for employee_id, response in await _employees_in_batches_async(async_xero_api_client, employee_ids):
+        if isinstance(response, Exception):
+            if not isinstance(response, RateLimitExceeded):
+                diagnostics.warning("Could not fetch employee %s: %s", employee_id, response)
+            summaries[employee_id] = {"error": str(response)}
+            continue
+        summaries[employee_id] = _build_leave_summary(_employee(response), applications_by_employee[employee_id], today)
+    return summaries
+
+async def predict_leave_balance_async(employee_id: str, leave_type: str, future_date: date, hours_per_week: float = 38.0) -> float:
+    """Async predict_leave_balance."""
+    return await _async_client().run(predict_leave_balance, employee_id, leave_type, future_date, hours_per_week)
+
+async def project_leave_balances_bulk_async(employee_ids: list, target_dates: list, hours_per_week: float = 38.0) -> dict:
+    """Async project_leave_balances_bulk."""
+    return await _async_client().run(project_leave_balances_bulk, employee_ids, target_dates, hours_per_week)
+
+async def leave_balance_timeline_async(employee_id: str, leave_type: str, start: date = None, end: date = None, hours_per_week: float = 38.0):
+    """Async leave_balance_timeline."""
+    return await _async_client().run(leave_balance_timeline, employee_id, leave_type, start, end, hours_per_week)
+
+async def create_leave_request_async(employee_id: str, leave_type: str, start_date: str, end_date: str, description: str, hours: float):
+    """Async create_leave_request."""
+    return await _async_client().run(create_leave_request, employee_id, leave_type, start_date, end_date, description, hours)
+
+async def approve_leave_request_async(leave_application_id: str):
+    """Async approve_leave_request."""
+    return await _async_client().run(approve_leave_request, leave_application_id)
+
+async def reject_leave_request_async(leave_application_id: str):
+    """Async reject_leave_request."""
+    return await _async_client().run(reject_leave_request, leave_application_id)
@@ -0,0 +1,99 @@
+# logconfig.py
+
+import atexit
+import logging
+import os
+
+# Level of the webhook log (DEBUG adds the per-request Wrike dumps and full payloads)
+LOG_LEVEL = os.getenv("XERO_PAYROLL_LOG_LEVEL", "INFO").upper()
+
+# Hand records to a background thread that does the file writes ("0" writes inline)
+LOG_QUEUE = os.getenv("XERO_PAYROLL_LOG_QUEUE", "1") != "0"
+
+# Where the leave module's diagnostics go: "logging" (the default: DEBUG records, WARNING for
+# warnings, on the module's logger), "print" (stdout) or "off" (warnings still logged)
+DIAGNOSTICS = os.getenv("XERO_PAYROLL_DIAGNOSTICS", "logging").lower()
+DIAGNOSTICS_MODES = ("print", "logging", "off")
+
+DEFAULT_FORMAT = "%(asctime)s %(levelname)s: [Xero_Payroll] %(message)s"
+
+_listener = None
+
+
+def configure(filename: str, level=LOG_LEVEL, fmt: str = DEFAULT_FORMAT, queue: bool = LOG_QUEUE):
+    """
+    Sets up the root logger to write to `filename`, like logging.basicConfig (and, like it,
+    does nothing if the root logger already has handlers).
+
+    With `queue`, the root logger only gets a QueueHandler; a QueueListener thread formats
+    the records and writes them to the file, so a slow disk never holds up a webhook.
+    Queued records are written out at exit (or by stop()).
+
+    Args:
+        filename (str): Log file, appended to
+        level (str | int): Root logger level
+        fmt (str): Record format of the log file
+        queue (bool): Write from a background thread
+    """
+    global _listener
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    handler = logging.FileHandler(filename)
+    handler.setFormatter(logging.Formatter(fmt))
+    root.setLevel(level)
+    if not queue:
+        root.addHandler(handler)
+        return
+
+    from logging.handlers import QueueHandler, QueueListener
+    from queue import SimpleQueue
+
+    records = SimpleQueue()
+    root.addHandler(QueueHandler(records))
+    _listener = QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop)
+
+
+def stop():
+    """Writes out the queued records and stops the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class Diagnostics:
+    """
+    A module's verbose progress output, routed by DIAGNOSTICS. Messages take logging's
+    %-style arguments and are only formatted when actually emitted, so in "logging" mode
+    below DEBUG (or in "off" mode) a call costs a method call and a level check:
+
+        diagnostics("Found %d leave applications for this employee", len(applications))
+        diagnostics.warning("Could not fetch employee %s: %s", employee_id, error)
+    """
+
+    def __init__(self, name: str, mode: str = None):
+        """
+        Args:
+            name (str): Logger name, normally the module's __name__
+            mode (str, optional): "print", "logging" or "off"; defaults to DIAGNOSTICS
+        """
+        mode = (mode or DIAGNOSTICS).lower()
+        if mode not in DIAGNOSTICS_MODES:
+            raise ValueError(f"Unknown diagnostics mode {mode!r}, expected one of {', '.join(DIAGNOSTICS_MODES)}")
+        self.mode = mode
+        self.logger = logging.getLogger(name)
+
+    def __call__(self, msg: str, *args):
+        if self.mode == "print":
+            print(msg % args if args else msg)
+        elif self.mode == "logging" and self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(msg.lstrip("\n"), *args)
+
+    def warning(self, msg: str, *args):
+        if self.mode == "print":
+            print("Warning: " + (msg % args if args else msg))
+        elif self.logger.isEnabledFor(logging.WARNING):
+            self.logger.warning(msg, *args)
@@ -0,0 +1,300 @@
+# metrics.py
+
+import atexit
+import functools
+import json
+import os
+import re
+import threading
+import time
+
+from .filelock import locked, write_text_atomic
+
+# Where metrics are written; unset (the default) disables collection entirely. A path ending
+# in ".jsonl" gets one JSON line per flush, anything else a Prometheus text file for
+# node_exporter's textfile collector.
+METRICS_FILE = os.getenv("XERO_PAYROLL_METRICS_FILE", "")
+
+# Histogram buckets in seconds (Prometheus' defaults, plus the slow tail of paged Xero calls)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HELP = {
+    "xero_api_requests_total": "Xero payroll API calls by method, endpoint and HTTP status",
+    "xero_api_request_seconds": "Xero payroll API call latency, including transport retries",
+    "xero_api_request_bytes_total": "Request body bytes sent to the Xero payroll API",
+    "xero_api_response_bytes_total": "Response body bytes received from the Xero payroll API",
+    "xero_api_retries_total": "Xero calls sent again, by reason (transport, 401 refresh, 429 rate limit)",
+    "xero_api_cache_total": "Xero GETs answered by the request or response cache, by result",
+    "wrike_api_requests_total": "Wrike API calls by method, endpoint and HTTP status",
+    "wrike_api_request_seconds": "Wrike API call latency",
+    "wrike_api_request_bytes_total": "Request body bytes sent to the Wrike API",
+    "wrike_api_response_bytes_total": "Response body bytes received from the Wrike API",
+    "wrike_api_retries_total": "Wrike calls sent again, by reason",
+    "oauth_token_refreshes_total": "OAuth token refreshes by token and outcome",
+    "oauth_token_refresh_seconds": "Time spent refreshing an OAuth token at the token endpoint",
+    "leave_function_seconds": "Run time of xero_payroll.leave functions",
+    "leave_function_errors_total": "xero_payroll.leave calls that raised",
+}
+
+
+class MetricsRegistry:
+    """
+    In-process counters and histograms, written out by flush().
+
+    Each process only keeps what it recorded since its last flush. For the Prometheus
+    text file those deltas are merged, under a lock file, into cumulative totals kept in
+    a ".state" file next to it, so the one-shot webhook processes and the daemon all add
+    to the same series. For JSON lines each flush appends its deltas as one line.
+    """
+
+    def __init__(self, path: str, buckets=LATENCY_BUCKETS):
+        """
+        Args:
+            path (str): Prometheus text file, or JSON lines file if it ends in ".jsonl"
+            buckets (tuple): Upper bounds of the histogram buckets
+        """
+        self.path = str(path)
+        self.format = "jsonl" if self.path.endswith(".jsonl") else "prometheus"
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def flush(self):
+        """Writes out everything recorded since the last flush."""
+        with self._lock:
+            counters, self._counters = self._counters, {}
+            histograms, self._histograms = self._histograms, {}
+        if not counters and not histograms:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with locked(self.path + ".lock"):
+            if self.format == "jsonl":
+                self._append_jsonl(counters, histograms)
+            else:
+                self._merge_prometheus(counters, histograms)
+
+    def _append_jsonl(self, counters, histograms):
+        record = {
+            "time": time.time(),
+            "pid": os.getpid(),
+            "counters": [dict(name=name, labels=dict(labels), value=value) for (name, labels), value in counters.items()],
+            "histograms": [
+                dict(name=name, labels=dict(labels), buckets=dict(zip(map(str, self.buckets), h["buckets"])),
+                     sum=h["sum"], count=h["count"])
+                for (name, labels), h in histograms.items()
+            ],
+        }
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def _merge_prometheus(self, counters, histograms):
+        state_file = self.path + ".state"
+        try:
+            with open(state_file, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            state = {}
+        totals = state.setdefault("counters", {})
+        for key, value in counters.items():
+            encoded = _encode(key)
+            totals[encoded] = totals.get(encoded, 0) + value
+        merged = state.setdefault("histograms", {})
+        for key, histogram in histograms.items():
+            encoded = _encode(key)
+            current = merged.get(encoded)
+            if current is None or len(current["buckets"]) != len(self.buckets):
+                merged[encoded] = histogram
+                continue
+            current["buckets"] = [a + b for a, b in zip(current["buckets"], histogram["buckets"])]
+            current["sum"] += histogram["sum"]
+            current["count"] += histogram["count"]
+        write_text_atomic(state_file, json.dumps(state))
+        write_text_atomic(self.path, self._render(state))
+
+    def _render(self, state) -> str:
+        series = {}
+        for encoded, value in sorted(state.get("counters", {}).items()):
+            name, labels = _decode(encoded)
+            series.setdefault((name, "counter"), []).append(f"{name}{_labels(labels)} {_number(value)}")
+        for encoded, histogram in sorted(state.get("histograms", {}).items()):
+            name, labels = _decode(encoded)
+            lines = series.setdefault((name, "histogram"), [])
+            for bound, count in zip(self.buckets, histogram["buckets"]):
+                lines.append(f"{name}_bucket{_labels(labels + [('le', _number(bound))])} {count}")
+            lines.append(f"{name}_bucket{_labels(labels + [('le', '+Inf')])} {histogram['count']}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(histogram['sum'])}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram['count']}")
+
+        out = []
+        for (name, kind), lines in sorted(series.items()):
+            if name in HELP:
+                out.append(f"# HELP {name} {HELP[name]}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(lines)
+        return "\n".join(out) + "\n"
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _encode(key):
+    name, labels = key
+    return json.dumps([name, [list(pair) for pair in labels]])
+
+
+def _decode(encoded):
+    name, labels = json.loads(encoded)
+    return name, [tuple(pair) for pair in labels]
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Path segments that are record ids: Xero GUIDs, numbers and Wrike ids (upper-case letters
+# and digits, e.g. IEAAB3DEI4ABCDEF), alone or comma-separated
+_ID = r"(?:[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|\d+|[A-Z0-9]{8,})"
+_ID_SEGMENT = re.compile(rf"{_ID}(?:,{_ID})*")
+
+
+def endpoint_label(endpoint: str) -> str:
+    """
+    Collapses record ids out of an endpoint to keep label sets small: "Employees/<guid>" ->
+    "Employees/{id}", "folders/<id>/tasks" -> "folders/{id}/tasks". The query string and,
+    for a full URL, the scheme and host are dropped.
+    """
+    path = str(endpoint).split("?", 1)[0]
+    if "://" in path:
+        path = path.split("://", 1)[1].partition("/")[2]
+    parts = [part for part in path.strip("/").split("/") if part]
+    if not parts:
+        return "/"
+    return "/".join("{id}" if _ID_SEGMENT.fullmatch(part) else part for part in parts)
+
+
+def record_http(service: str, method: str, endpoint: str, response, seconds: float):
+    """
+    Records one HTTP exchange under "<service>_..." metrics: the call count by status
+    ("error" if no response came back), latency, body sizes and transport-level retries.
+    """
+    if registry is None:
+        return
+    labels = {"method": method, "endpoint": endpoint_label(endpoint)}
+    status = str(response.status_code) if response is not None else "error"
+    registry.inc(f"{service}_requests_total", status=status, **labels)
+    registry.observe(f"{service}_request_seconds", seconds, **labels)
+    if response is None:
+        return
+    body = getattr(getattr(response, "request", None), "body", None)
+    registry.inc(f"{service}_request_bytes_total", len(body) if body else 0, **labels)
+    registry.inc(f"{service}_response_bytes_total", len(response.content or b""), **labels)
+    # urllib3 keeps the retries it made (connection resets, 5xx) on the raw response
+    history = getattr(getattr(getattr(response, "raw", None), "retries", None), "history", None)
+    if history:
+        registry.inc(f"{service}_retries_total", len(history), reason="transport")
+
+
+# Module-wide registry, None when metrics are disabled
+registry = MetricsRegistry(METRICS_FILE) if METRICS_FILE else None
+
+if registry is not None:
+    atexit.register(registry.flush)
+
+
+def enabled() -> bool:
+    return registry is not None
+
+
+def inc(name: str, value: float = 1, **labels):
+    """Adds `value` to a counter (no-op while metrics are disabled)."""
+    if registry is not None:
+        registry.inc(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels):
+    """Records one histogram observation (no-op while metrics are disabled)."""
+    if registry is not None:
+        registry.observe(name, value, **labels)
+
+
+def flush():
+    """Writes out pending metrics, e.g. after each webhook in the daemon (no-op while disabled)."""
+    if registry is not None:
+        try:
+            registry.flush()
+        except OSError as e:
+            # Metrics must never take a webhook down with them
+            print(f"Warning: Could not write metrics to {registry.path}: {e}")
+
+
+def timed(histogram: str, errors: str = None, **labels):
+    """
+    Decorator (for functions and coroutines) recording each call's run time in `histogram`
+    (and exceptions in the `errors` counter). Returns the function unchanged while metrics
+    are disabled, so there is no per-call cost at all.
+    """
+    def decorate(func):
+        if registry is None:
+            return func
+        import inspect
+
+        call_labels = dict(labels)
+        call_labels.setdefault("function", func.__name__)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    if errors:
+                        registry.inc(errors, **call_labels)
+                    raise
+                finally:
+                    registry.observe(histogram, time.perf_counter() - started, **call_labels)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                if errors:
+                    registry.inc(errors, **call_labels)
+                raise
+            finally:
+                registry.observe(histogram, time.perf_counter() - started, **call_labels)
+        return wrapper
+    return decorate
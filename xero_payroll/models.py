@@ -0,0 +1,156 @@
+# models.py
+
+import sys
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+
+from .dates import parse_xero_date
+
+# Leave period statuses that count as taken or committed leave
+APPROVED_STATUSES = frozenset({"APPROVED", "PROCESSED"})
+
+# Periods are a few hour/status combinations repeated across every application, so equal
+# ones share one LeavePeriod (see LeavePeriod.shared); emptied when it reaches this size
+SHARED_PERIODS_SIZE = 4096
+_shared_periods = {}
+
+
+def _id(value) -> str:
+    """An ID as the leave functions compare it: a stripped string, interned as the same IDs recur across records."""
+    return sys.intern(str(value).strip())
+
+
+def _code(value):
+    """A status or name shared by many records, interned (None stays None)."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+# Records are parsed once from Xero's JSON, keeping only the fields xero_payroll.leave
+# uses, with numbers and dates decoded. They are slotted rather than frozen (a frozen
+# dataclass is several times slower to build), but treated as read-only.
+
+@dataclass(slots=True)
+class LeavePeriod:
+    """One pay period of a leave application."""
+
+    hours: float
+    status: Optional[str]
+
+    @classmethod
+    def from_xero(cls, period: dict) -> "LeavePeriod":
+        return cls.shared(float(period.get("NumberOfUnits", 0.0)), period.get("LeavePeriodStatus"))
+
+    @classmethod
+    def shared(cls, hours: float, status) -> "LeavePeriod":
+        """The LeavePeriod for hours and status, reusing an equal instance when there is one."""
+        key = (hours, status)
+        period = _shared_periods.get(key)
+        if period is None:
+            if len(_shared_periods) >= SHARED_PERIODS_SIZE:
+                _shared_periods.clear()
+            period = _shared_periods[key] = cls(hours, _code(status))
+        return period
+
+
+@dataclass(slots=True)
+class LeaveApplication:
+    """
+    A leave application with its periods. hours and approved_hours (APPROVED/PROCESSED
+    periods only) are summed once here; start_date is None if the application has no
+    StartDate.
+    """
+
+    leave_application_id: str
+    employee_id: str
+    leave_type_id: str
+    start_date: Optional[date]
+    end_date: Optional[date]
+    periods: tuple
+    hours: float
+    approved_hours: float
+
+    @property
+    def status(self) -> Optional[str]:
+        """Status of the first leave period (None without periods)."""
+        return self.periods[0].status if self.periods else None
+
+    @classmethod
+    def from_xero(cls, app: dict) -> "LeaveApplication":
+        """
+        Raises:
+            ValueError / TypeError: StartDate isn't a Xero date, or a period's NumberOfUnits isn't a number
+        """
+        start = app.get("StartDate", "")
+        start_date = parse_xero_date(start) if start else None
+        if start and start_date is None:
+            raise ValueError(f"unrecognised StartDate {start!r}")
+        # One pass over the periods for both totals; this runs for every record a one-shot process reads
+        periods = []
+        hours = approved_hours = 0.0
+        for period in app.get("LeavePeriods") or ():
+            period = LeavePeriod.shared(float(period.get("NumberOfUnits", 0.0)), period.get("LeavePeriodStatus"))
+            periods.append(period)
+            hours += period.hours
+            if period.status in APPROVED_STATUSES:
+                approved_hours += period.hours
+        return cls(
+            str(app.get("LeaveApplicationID", "")).strip(),
+            _id(app.get("EmployeeID", "")),
+            _id(app.get("LeaveTypeID", "")),
+            start_date,
+            parse_xero_date(app.get("EndDate")),
+            tuple(periods),
+            hours,
+            approved_hours,
+        )
+
+
+@dataclass(slots=True)
+class LeaveBalance:
+    """An employee's current balance of one leave type, in hours."""
+
+    leave_name: Optional[str]
+    leave_type_id: Optional[str]
+    hours: float
+
+    @classmethod
+    def from_xero(cls, balance: dict) -> "LeaveBalance":
+        leave_type_id = balance.get("LeaveTypeID")
+        return cls(
+            _code(balance.get("LeaveName")),
+            _id(leave_type_id) if leave_type_id is not None else None,
+            float(balance.get("NumberOfUnits", 0.0)),
+        )
+
+
+@dataclass(slots=True)
+class Employee:
+    """An employee record with its leave balances (only Employees/{id} returns those)."""
+
+    employee_id: str
+    first_name: str
+    last_name: str
+    status: Optional[str]
+    leave_balances: tuple
+
+    @property
+    def name(self) -> str:
+        return f"{self.first_name} {self.last_name}".strip()
+
+    def balance(self, leave_name: str) -> Optional[LeaveBalance]:
+        """The first balance of the named leave type, or None."""
+        for balance in self.leave_balances:
+            if balance.leave_name == leave_name:
+                return balance
+        return None
+
+    @classmethod
+    def from_xero(cls, employee: dict) -> "Employee":
+        return cls(
+            str(employee.get("EmployeeID", "")).strip(),
+            employee.get("FirstName", ""),
+            employee.get("LastName", ""),
+            _code(employee.get("Status")),
+            tuple(LeaveBalance.from_xero(balance) for balance in employee.get("LeaveBalances", [])),
+        )
@@ -0,0 +1,167 @@
+# projection.py
+
+import numpy as np
+
+from .utils import ANNUAL_LEAVE_ACCRUAL_RATE_PER_HOUR
+
+# Accrual per calendar day for each hour of the employee's working week, by Xero leave
+# name, with how the day count is treated. These are the rates used by
+# predict_leave_balance:
+#   Annual Leave            4 weeks a year (utils.calculate_accrued_leave), nothing before today
+#   Personal/Carer's Leave  10 days a year
+#   Long Service Leave      3.25 days a year, always positive
+# Leave names not listed don't accrue.
+ACCRUAL_RULES = {
+    "Annual Leave": (ANNUAL_LEAVE_ACCRUAL_RATE_PER_HOUR / 7, "clip"),
+    "Personal/Carer's Leave": (10 / 5 / 365, "signed"),
+    "Long Service Leave": (3.25 / 5 / 365, "abs"),
+}
+
+_MODES = ("clip", "signed", "abs")
+
+
+def accrual_rates(leave_names):
+    """
+    Looks up ACCRUAL_RULES for a sequence of Xero leave names.
+
+    Returns:
+        tuple: (rates, modes) arrays - rate per day per weekly hour, and an index into ("clip", "signed", "abs")
+    """
+    rules = [ACCRUAL_RULES.get(name, (0.0, "signed")) for name in leave_names]
+    rates = np.array([rate for rate, _ in rules], dtype=np.float64)
+    modes = np.array([_MODES.index(mode) for _, mode in rules], dtype=np.int8)
+    return rates, modes
+
+
+def scheduled_leave_arrays(applications_per_row):
+    """
+    Flattens leave applications (models.LeaveApplication) into the (rows, start_dates,
+    hours) arrays project_leave_balances takes, keeping only APPROVED/PROCESSED period hours.
+
+    Args:
+        applications_per_row (list): One list of LeaveApplication records per projection row
+
+    Returns:
+        tuple: (rows int64, start_dates datetime64[D], hours float64)
+    """
+    rows = []
+    starts = []
+    hours = []
+    for row, applications in enumerate(applications_per_row):
+        for app in applications:
+            if app.approved_hours:
+                rows.append(row)
+                # Undated applications become NaT, which the projection ignores
+                starts.append(app.start_date)
+                hours.append(app.approved_hours)
+    return (
+        np.array(rows, dtype=np.int64),
+        np.array(starts, dtype="datetime64[D]"),
+        np.array(hours, dtype=np.float64),
+    )
+
+
+def project_leave_balances(current_balances, hours_per_week, leave_names, target_dates, today=None, scheduled=None):
+    """
+    Projects leave balances for many rows (e.g. employee x leave type pairs) over many
+    future dates in one array operation: current balance + accrual - scheduled leave
+    starting after today and on or before each target date.
+
+    Args:
+        current_balances (array-like): (n,) current balance in hours per row
+        hours_per_week (array-like or float): (n,) working hours per week per row
+        leave_names (sequence): (n,) Xero leave name per row, selecting its ACCRUAL_RULES entry
+        target_dates (array-like): (m,) dates to project to (date objects or datetime64)
+        today (date, optional): Projection start, defaults to today
+        scheduled (tuple, optional): (rows, start_dates, hours) arrays of scheduled leave,
+            see scheduled_leave_arrays
+
+    Returns:
+        numpy.ndarray: (n, m) projected balances in hours
+    """
+    from datetime import date
+
+    balances = np.asarray(current_balances, dtype=np.float64)
+    n = balances.shape[0]
+    weekly_hours = np.broadcast_to(np.asarray(hours_per_week, dtype=np.float64), (n,))
+    today = np.datetime64(today or date.today(), "D")
+    days = (np.asarray(target_dates, dtype="datetime64[D]") - today).astype(np.int64)
+
+    # Accrual: rate * weekly hours * day count, with the day count clipped/signed/absolute per rule
+    rates, modes = accrual_rates(leave_names)
+    day_counts = np.stack([np.maximum(days, 0), days, np.abs(days)])  # (3, m), indexed by mode
+    accrued = (rates * weekly_hours)[:, None] * day_counts[modes]
+
+    projected = balances[:, None] + accrued
+    if scheduled is not None:
+        projected -= _scheduled_totals(n, days, today, *scheduled)
+    return projected
+
+
+def _scheduled_totals(n, days, today, rows, start_dates, hours):
+    """
+    (n, m) hours of scheduled leave with today < start <= target, via a cumulative sum over
+    leave sorted by (row, start) and two binary searches per cell.
+    """
+    # NaT starts become the most negative int64, so "> 0" drops them along with past leave
+    start_days = (np.asarray(start_dates, dtype="datetime64[D]") - today).astype(np.int64)
+    keep = start_days > 0
+    rows = np.asarray(rows, dtype=np.int64)[keep]
+    start_days = start_days[keep]
+    hours = np.asarray(hours, dtype=np.float64)[keep]
+    if not rows.size:
+        return np.zeros((n, days.shape[0]))
+
+    # One sorted key space: each row owns the block [row * span, (row + 1) * span)
+    span = int(max(start_days.max(), days.max(initial=0))) + 1
+    keys = rows * span + start_days
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    cumulative = np.concatenate(([0.0], np.cumsum(hours[order])))
+
+    row_base = np.arange(n, dtype=np.int64)[:, None] * span
+    upper = np.searchsorted(keys, row_base + np.maximum(days, 0)[None, :], side="right")
+    lower = np.searchsorted(keys, row_base, side="right")
+    return cumulative[upper] - cumulative[lower]
+
+
+class LeaveBalanceTimeline:
+    """
+    A day-by-day projected balance curve for one employee and leave type, built once
+    and then queried without further Xero calls.
+    """
+
+    def __init__(self, dates, balances):
+        """
+        Args:
+            dates (numpy.ndarray): Consecutive datetime64[D] days
+            balances (numpy.ndarray): Projected balance in hours on each day
+        """
+        self.dates = dates
+        self.balances = balances
+        # Non-decreasing, so "first day the balance reaches N" is a binary search over it
+        self._running_max = np.maximum.accumulate(balances) if balances.size else balances
+
+    def balance_on(self, day) -> float:
+        """Projected balance in hours on a day within the timeline."""
+        index = int((np.datetime64(day, "D") - self.dates[0]).astype(np.int64)) if self.dates.size else -1
+        if not 0 <= index < self.dates.size:
+            raise ValueError(f"{day} is outside the timeline")
+        return float(self.balances[index])
+
+    def first_date_with_balance(self, hours: float):
+        """
+        Returns the first day on which the projected balance is at least `hours`,
+        or None if it never gets there within the timeline.
+        """
+        index = int(np.searchsorted(self._running_max, hours, side="left"))
+        if index >= self.dates.size:
+            return None
+        return self.dates[index].item()
+
+    def as_dict(self) -> dict:
+        """JSON-friendly {"dates": [...], "balances": [...]}."""
+        return {
+            "dates": [str(day) for day in self.dates],
+            "balances": [float(balance) for balance in self.balances],
+        }
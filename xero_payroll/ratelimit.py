@@ -0,0 +1,170 @@
+# ratelimit.py
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from .filelock import locked, write_json_atomic
+
+# Xero's limits per tenant (organisation)
+MINUTE_LIMIT = 60
+DAY_LIMIT = 5000
+CONCURRENT_LIMIT = 5
+
+# Longest a call is queued before giving up with RateLimitExceeded
+MAX_WAIT = 120
+
+# A call's concurrency slot is reclaimed after this long even if it was never released
+# (its process died mid-call). Longer than a paged call with all its transport retries.
+SLOT_LEASE = 300
+
+# How often a call waiting for a concurrency slot checks again
+SLOT_POLL_INTERVAL = 0.1
+
+
+class RateLimitExceeded(RuntimeError):
+    """Raised when a call would have to wait longer than the limiter's max_wait (e.g. the day limit is spent)."""
+
+
+class RateLimiter:
+    """
+    Paces Xero calls so a burst of webhooks queues up instead of being answered with 429s.
+
+    A token bucket of per_minute calls is shared by every process using the same state
+    file (guarded by a lock file) and corrected from Xero's X-MinLimit-Remaining /
+    X-DayLimit-Remaining headers. Once the day's budget is spent, calls fail with
+    RateLimitExceeded instead of reaching Xero. A 429's Retry-After holds back all callers
+    until it has passed. Calls in flight are counted in the same state, so the concurrency
+    cap holds across processes too.
+    """
+
+    def __init__(self, state_file: str, per_minute: int = MINUTE_LIMIT, per_day: int = DAY_LIMIT,
+                 concurrent: int = CONCURRENT_LIMIT, max_wait: float = MAX_WAIT):
+        """
+        Args:
+            state_file (str): JSON file holding the shared bucket state (a ".lock" file sits next to it)
+            per_minute (int): Calls allowed per minute
+            per_day (int): Calls allowed per day (reported by remaining() until Xero tells us otherwise)
+            concurrent (int): Calls allowed in flight at once, across all processes
+            max_wait (float): Seconds a call may be delayed before RateLimitExceeded is raised
+        """
+        self.state_file = state_file
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.concurrent = concurrent
+        self.max_wait = max_wait
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, tenant_id: str):
+        """Blocks until a call to the tenant may go ahead, and holds a concurrency slot while it runs."""
+        slot_id = self._take_token(tenant_id)
+        try:
+            yield
+        finally:
+            with self._state(tenant_id) as state:
+                state["in_flight"].pop(slot_id, None)
+
+    def record(self, tenant_id: str, response):
+        """Updates the shared state from a Xero response's rate limit headers."""
+        headers = response.headers
+        minute_remaining = _header_int(headers, "X-MinLimit-Remaining")
+        day_remaining = _header_int(headers, "X-DayLimit-Remaining")
+        with self._state(tenant_id) as state:
+            if minute_remaining is not None:
+                state["tokens"] = min(state["tokens"], float(minute_remaining))
+            if day_remaining is not None:
+                state["day_remaining"] = day_remaining
+                state["day_updated"] = time.time()
+            if response.status_code == 429:
+                retry_after = _header_int(headers, "Retry-After") or 60
+                state["retry_until"] = max(state["retry_until"], time.time() + retry_after)
+
+    def remaining(self, tenant_id: str) -> dict:
+        """
+        Current budget, so batch jobs can pace themselves.
+
+        Returns:
+            dict: minute (calls available now), day (calls left today as last reported by Xero),
+                  retry_after (seconds until calls are allowed again after a 429)
+        """
+        with self._state(tenant_id) as state:
+            now = time.time()
+            return {
+                "minute": int(state["tokens"]),
+                "day": state["day_remaining"],
+                "retry_after": max(0.0, state["retry_until"] - now),
+            }
+
+    def _take_token(self, tenant_id: str) -> str:
+        """Waits for a token and a free concurrency slot, takes both and returns the slot's id."""
+        deadline = time.time() + self.max_wait
+        while True:
+            with self._state(tenant_id) as state:
+                now = time.time()
+                if state["retry_until"] > now:
+                    wait = state["retry_until"] - now
+                elif state["day_remaining"] is not None and state["day_remaining"] <= 0:
+                    # Spent for today; Xero's allowance is back a day after it last reported one
+                    wait = state["day_updated"] + 24 * 60 * 60 - now
+                elif state["tokens"] < 1:
+                    wait = (1 - state["tokens"]) * 60.0 / self.per_minute
+                elif len(state["in_flight"]) >= self.concurrent:
+                    wait = SLOT_POLL_INTERVAL
+                else:
+                    state["tokens"] -= 1
+                    if state["day_remaining"] is not None:
+                        state["day_remaining"] -= 1
+                    slot_id = f"{os.getpid()}-{threading.get_ident()}-{now!r}"
+                    state["in_flight"][slot_id] = now + SLOT_LEASE
+                    return slot_id
+            if now + wait > deadline:
+                raise RateLimitExceeded(f"Xero rate limit for tenant {tenant_id}: next call allowed in {wait:.0f}s")
+            time.sleep(wait)
+
+    @contextmanager
+    def _state(self, tenant_id: str):
+        """Yields the tenant's bucket (refilled to now) under the lock, then writes it back if changed."""
+        with self._thread_lock, locked(self.state_file + ".lock"):
+            try:
+                with open(self.state_file, "r") as f:
+                    all_state = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                all_state = {}
+
+            now = time.time()
+            state = all_state.setdefault(tenant_id, {
+                "tokens": float(self.per_minute),
+                "updated": now,
+                "day_remaining": self.per_day,
+                "retry_until": 0.0,
+                "day_updated": now,
+            })
+            # Slots of calls whose process died without releasing them
+            state["in_flight"] = {
+                slot_id: expires for slot_id, expires in state.get("in_flight", {}).items() if expires > now
+            }
+            if now - state["day_updated"] > 24 * 60 * 60:
+                # Nothing heard from Xero for a day, so the daily allowance has rolled over
+                state["day_remaining"] = self.per_day
+                state["day_updated"] = now
+            elapsed = max(0.0, now - state["updated"])
+            state["tokens"] = min(float(self.per_minute), state["tokens"] + elapsed * self.per_minute / 60.0)
+            state["updated"] = now
+
+            # Refills, the daily rollover and expired slots come out the same when recomputed
+            # from the stored state, so the file is only rewritten when the caller changed it.
+            # It is rebuilt from scratch if lost, so it isn't fsynced either.
+            before = json.dumps(state, sort_keys=True)
+            yield state
+            if json.dumps(state, sort_keys=True) != before:
+                write_json_atomic(self.state_file, all_state, fsync=False)
+
+
+def _header_int(headers, name):
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
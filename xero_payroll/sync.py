@@ -0,0 +1,239 @@
+# sync.py
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import timedelta, timezone
+
+from .api import LEAVE_STORE_FILE, PAYROLL_PAGE_SIZE
+from .cache import XERO_TIMESTAMP_FORMAT
+from .dates import parse_xero_date, parse_xero_datetime
+from .filelock import locked
+
+# Don't ask Xero for changes more often than this (one webhook needs a single sync)
+SYNC_MAX_AGE = 60
+
+# Leave applications that disappear from Xero never show up in an incremental sync,
+# so the whole collection is re-downloaded this often
+FULL_RESYNC_INTERVAL = 24 * 60 * 60
+
+# Re-request a little before the newest UpdatedDateUTC seen, so records updated in the
+# same second as the last sync aren't missed (upserts make the overlap harmless)
+SYNC_OVERLAP = timedelta(seconds=1)
+
+_UPSERT_SQL = "INSERT OR REPLACE INTO leave_applications VALUES (?, ?, ?, ?, ?, ?, ?)"
+_SEEN_SQL = "INSERT OR IGNORE INTO synced_ids VALUES (?)"
+
+class LeaveApplicationStore:
+    """
+    Local SQLite copy of a tenant's LeaveApplications, keyed by LeaveApplicationID and
+    indexed by EmployeeID, LeaveTypeID and start date. sync() pulls only the records
+    changed since the previous sync, so lookups for one employee no longer depend on
+    the size of the whole tenant's leave history.
+    """
+
+    def __init__(self, path: str, max_age: float = SYNC_MAX_AGE, full_resync_interval: float = FULL_RESYNC_INTERVAL):
+        """
+        Args:
+            path (str): SQLite database file, created on first use
+            max_age (float): Seconds a sync stays current before sync() asks Xero again
+            full_resync_interval (float): Seconds between full re-downloads of the collection
+        """
+        self.path = path
+        self.max_age = max_age
+        self.full_resync_interval = full_resync_interval
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS leave_applications (
+                    leave_application_id TEXT PRIMARY KEY,
+                    tenant_id TEXT NOT NULL,
+                    employee_id TEXT NOT NULL,
+                    leave_type_id TEXT NOT NULL,
+                    start_date TEXT,
+                    updated_utc TEXT,
+                    body TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS ix_leave_employee
+                    ON leave_applications (tenant_id, employee_id, start_date);
+                CREATE INDEX IF NOT EXISTS ix_leave_type
+                    ON leave_applications (tenant_id, leave_type_id, start_date);
+                CREATE INDEX IF NOT EXISTS ix_leave_start
+                    ON leave_applications (tenant_id, start_date);
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    tenant_id TEXT PRIMARY KEY,
+                    modified_since TEXT,
+                    last_sync_at REAL NOT NULL,
+                    last_full_sync_at REAL NOT NULL
+                );
+                """
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _state(self, tenant_id: str):
+        """(modified_since, last_sync_at, last_full_sync_at) of the tenant's last sync, or None."""
+        with self._lock:
+            return self._connect().execute(
+                "SELECT modified_since, last_sync_at, last_full_sync_at FROM sync_state WHERE tenant_id = ?",
+                (tenant_id,),
+            ).fetchone()
+
+    def _write_page(self, rows: list, full: bool):
+        """Upserts one page of rows in its own short transaction (a full resync also notes their ids)."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(_UPSERT_SQL, rows)
+                if full:
+                    conn.executemany(_SEEN_SQL, [(row[0],) for row in rows])
+
+    def sync(self, client, force_full: bool = False) -> int:
+        """
+        Brings the store up to date with Xero for the client's tenant.
+
+        Pages are downloaded without holding the database: each one is written in its own
+        short transaction, so lookups (here and in other processes) carry on meanwhile. A
+        full resync keeps the old rows until the download is complete and then drops the
+        ones Xero no longer returned. Only one sync runs at a time across threads and
+        processes; one that had to wait re-checks the state first, since the sync it
+        waited for has usually made it current.
+
+        Args:
+            client (XeroAPI): Client used to talk to Xero
+            force_full (bool): Re-download the whole collection even if an incremental sync would do
+
+        Returns:
+            int: Number of leave applications written (0 if the store was already current)
+        """
+        tenant_id = client.get_tenant_id()
+        state = self._state(tenant_id)
+        if state and not force_full and time.time() - state[1] < self.max_age:
+            return 0
+
+        with locked(self.path + ".lock"):
+            now = time.time()
+            state = self._state(tenant_id)
+            if state and not force_full and now - state[1] < self.max_age:
+                return 0
+
+            full = force_full or not state or now - state[2] >= self.full_resync_interval
+            modified_since = None if full else state[0]
+            if full:
+                with self._lock:
+                    conn = self._connect()
+                    with conn:
+                        conn.execute("CREATE TEMP TABLE IF NOT EXISTS synced_ids (leave_application_id TEXT PRIMARY KEY)")
+                        conn.execute("DELETE FROM synced_ids")
+
+            # Write page by page so memory stays bounded by a page
+            count = 0
+            newest = None
+            rows = []
+            for app in client.iter_leave_applications(modified_since=modified_since, fresh=True, prefetch=True):
+                updated = parse_xero_datetime(app.get("UpdatedDateUTC"))
+                if updated:
+                    updated = updated.astimezone(timezone.utc)
+                    if newest is None or updated > newest:
+                        newest = updated
+                start = parse_xero_date(app.get("StartDate"))
+                rows.append((
+                    str(app.get("LeaveApplicationID", "")).strip(),
+                    tenant_id,
+                    str(app.get("EmployeeID", "")).strip(),
+                    str(app.get("LeaveTypeID", "")).strip(),
+                    start.isoformat() if start else None,
+                    updated.strftime(XERO_TIMESTAMP_FORMAT) if updated else None,
+                    json.dumps(app),
+                ))
+                if len(rows) >= PAYROLL_PAGE_SIZE:
+                    self._write_page(rows, full)
+                    count += len(rows)
+                    rows = []
+            if rows:
+                self._write_page(rows, full)
+                count += len(rows)
+
+            if newest is not None:
+                modified_since = (newest - SYNC_OVERLAP).strftime(XERO_TIMESTAMP_FORMAT)
+            elif full:
+                modified_since = None
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    if full:
+                        conn.execute(
+                            "DELETE FROM leave_applications WHERE tenant_id = ? "
+                            "AND leave_application_id NOT IN (SELECT leave_application_id FROM synced_ids)",
+                            (tenant_id,),
+                        )
+                        conn.execute("DELETE FROM synced_ids")
+                    conn.execute(
+                        "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)",
+                        (tenant_id, modified_since, now, now if full else state[2]),
+                    )
+        return count
+
+    def mark_stale(self, tenant_id: str):
+        """
+        Makes the next sync() for the tenant ask Xero again however recent the last one was.
+        Call after writing leave applications, so the change isn't missed for max_age seconds.
+
+        Args:
+            tenant_id (str): The Xero tenant ID
+        """
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("UPDATE sync_state SET last_sync_at = 0 WHERE tenant_id = ?", (tenant_id,))
+
+    def application_rows_for_employee(self, tenant_id: str, employee_id: str, leave_type_id: str = None, start_after=None, start_until=None) -> list:
+        """
+        Returns the stored leave applications of one employee, ordered by start date, as
+        (LeaveApplicationID, UpdatedDateUTC, JSON body) rows, so callers holding parsed
+        copies of unchanged records can skip decoding them. The filters run in SQLite,
+        so rows a caller would throw away are never decoded at all.
+
+        Args:
+            tenant_id (str): The Xero tenant ID
+            employee_id (str): The Xero EmployeeID
+            leave_type_id (str, optional): Only applications of this LeaveTypeID
+            start_after (date, optional): Only applications starting after this date
+            start_until (date, optional): Only applications starting on or before this date
+
+        Undated applications pass both date filters.
+        """
+        query = "SELECT leave_application_id, updated_utc, body FROM leave_applications WHERE tenant_id = ? AND employee_id = ?"
+        args = [tenant_id, str(employee_id).strip()]
+        if leave_type_id:
+            # Unary + keeps SQLite on ix_leave_employee: one employee's rows beat every row of a leave type
+            query += " AND +leave_type_id = ?"
+            args.append(str(leave_type_id).strip())
+        if start_after:
+            query += " AND (start_date IS NULL OR start_date > ?)"
+            args.append(start_after.isoformat())
+        if start_until:
+            query += " AND (start_date IS NULL OR start_date <= ?)"
+            args.append(start_until.isoformat())
+        query += " ORDER BY start_date"
+        with self._lock:
+            return self._connect().execute(query, args).fetchall()
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM leave_applications")
+                conn.execute("DELETE FROM sync_state")
+
+
+# Default store used by xero_payroll.leave - the database is only opened on first use
+leave_application_store = LeaveApplicationStore(LEAVE_STORE_FILE) if LEAVE_STORE_FILE else None
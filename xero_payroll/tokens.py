@@ -0,0 +1,172 @@
+# tokens.py
+
+import json
+import os
+import threading
+import time
+
+from . import metrics
+from .filelock import locked, write_json_atomic
+
+# Refresh this many seconds before the access token expires (Xero access tokens last 30 minutes)
+REFRESH_MARGIN = int(os.getenv("XERO_TOKEN_REFRESH_MARGIN", "300"))
+
+# Within this many seconds of the last check the in-memory token is used without even a stat()
+RECHECK_INTERVAL = 1.0
+
+
+class TokenManager:
+    """
+    Owns an OAuth token file shared by every webhook process (Xero's, and Wrike's in main.py).
+
+    Reads are served from memory; the file is stat()ed at most every recheck_interval
+    seconds and only re-read when its mtime changes.
+    Writes go to a temporary file that is renamed over the original under a lock file,
+    so readers never see a half-written token. Refreshes are single-flight: the
+    refresher takes the lock and re-reads the file first, so when several processes
+    notice an expiring token at once only one of them calls TOKEN_URL and the others
+    pick up its result. That matters because refresh tokens are rotated on use.
+    """
+
+    def __init__(self, token_file: str, margin: int = REFRESH_MARGIN, recheck_interval: float = RECHECK_INTERVAL,
+                 name: str = "xero"):
+        """
+        Args:
+            token_file (str): Path of the JSON token file
+            margin (int): Seconds before expiry at which a token is refreshed proactively
+            recheck_interval (float): Seconds the in-memory token is trusted before the file is checked again
+            name (str): Which token this is, for the refresh metrics
+        """
+        self.token_file = str(token_file)
+        self.name = name
+        self.lock_file = self.token_file + ".lock"
+        self.margin = margin
+        self.recheck_interval = recheck_interval
+        self._token = None
+        self._stamp = None
+        self._checked_at = 0.0
+        self._thread_lock = threading.Lock()
+        self._background_lock = threading.Lock()  # separate, so starting a refresh never waits on one in progress
+        self._background = None
+
+    def load(self):
+        """Returns the current token, re-reading the file only if it changed since the last read (None if missing)."""
+        now = time.monotonic()
+        if self._token is not None and now - self._checked_at < self.recheck_interval:
+            return self._token
+        try:
+            st = os.stat(self.token_file)
+        except FileNotFoundError:
+            return None
+        self._checked_at = now
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp != self._stamp:
+            token = self._read()
+            if token is not None:
+                self._token = token
+                self._stamp = stamp
+        return self._token
+
+    def save(self, token: dict):
+        """Writes a token atomically (under the lock) and makes it the in-memory copy."""
+        _normalise(token)
+        with self._thread_lock, locked(self.lock_file):
+            self._write(token)
+
+    def expires_in(self, token: dict) -> float:
+        """Seconds until the token expires (infinite if it carries no expiry)."""
+        expires_at = (token or {}).get("expires_at")
+        return float("inf") if expires_at is None else float(expires_at) - time.time()
+
+    def is_expired(self, token: dict) -> bool:
+        return self.expires_in(token) <= 0
+
+    def needs_refresh(self, token: dict) -> bool:
+        """True once the token is within the refresh margin of expiring."""
+        return self.expires_in(token) <= self.margin
+
+    def refresh(self, request_refresh, stale_token: dict = None, force: bool = False) -> dict:
+        """
+        Single-flight refresh. Under the lock the file is re-read; if another process has
+        already replaced `stale_token` (or the token on disk no longer needs refreshing)
+        that token is returned without calling the token endpoint.
+
+        Args:
+            request_refresh (callable): Takes the current token and returns a new one from TOKEN_URL
+            stale_token (dict, optional): The token the caller found expiring or rejected
+            force (bool): Refresh even if the token on disk doesn't look due (e.g. after a 401)
+
+        Returns:
+            dict: The fresh token, also written to the token file
+        """
+        with self._thread_lock, locked(self.lock_file):
+            current = self._read() or stale_token
+            replaced = (
+                stale_token is not None and current is not None
+                and current.get("access_token") != stale_token.get("access_token")
+            )
+            if current is not None and (replaced or not (force or self.needs_refresh(current))):
+                metrics.inc("oauth_token_refreshes_total", token=self.name, outcome="reused")
+                self._remember(current)
+                return current
+
+            started = time.perf_counter()
+            try:
+                token = request_refresh(current)
+            except Exception:
+                metrics.inc("oauth_token_refreshes_total", token=self.name, outcome="failed")
+                raise
+            finally:
+                metrics.observe("oauth_token_refresh_seconds", time.perf_counter() - started, token=self.name)
+            metrics.inc("oauth_token_refreshes_total", token=self.name, outcome="refreshed")
+            _normalise(token)
+            self._write(token)
+            return token
+
+    def refresh_in_background(self, request_refresh, stale_token: dict = None):
+        """Starts a refresh on a daemon thread unless one is already running; callers carry on with the current token."""
+        with self._background_lock:
+            if self._background is not None and self._background.is_alive():
+                return
+            self._background = threading.Thread(
+                target=self._refresh_quietly,
+                args=(request_refresh, stale_token),
+                name="token-refresh",
+                daemon=True,
+            )
+            self._background.start()
+
+    def _refresh_quietly(self, request_refresh, stale_token):
+        try:
+            self.refresh(request_refresh, stale_token)
+        except Exception as e:
+            # The token is still valid; the next call will try again
+            print(f"Warning: Background token refresh failed: {e}")
+
+    def _read(self):
+        try:
+            with open(self.token_file, "r") as f:
+                return _normalise(json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write(self, token: dict):
+        write_json_atomic(self.token_file, token)
+        self._remember(token)
+
+    def _remember(self, token: dict):
+        self._token = token
+        self._checked_at = time.monotonic()
+        try:
+            st = os.stat(self.token_file)
+            self._stamp = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            self._stamp = None
+
+
+def _normalise(token):
+    # ensure expires_at exists if only expires_in is present, counting from obtained_at when recorded
+    if token and "expires_at" not in token and token.get("expires_in") is not None:
+        token["expires_at"] = int(token.get("obtained_at") or time.time()) + int(token["expires_in"])
+    return token
+
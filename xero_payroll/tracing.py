@@ -0,0 +1,258 @@
+# tracing.py
+
+import atexit
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+
+from .filelock import locked
+
+# Where finished spans are written; unset (the default) disables tracing. Each line is an
+# OTLP/JSON ExportTraceServiceRequest, the format of the OpenTelemetry Collector's file
+# exporter, so the file can be replayed into a collector or loaded by trace viewers.
+TRACE_FILE = os.getenv("XERO_PAYROLL_TRACE_FILE", "")
+
+SERVICE_NAME = os.getenv("XERO_PAYROLL_SERVICE_NAME", "xero-payroll")
+
+# OTLP SpanKind / StatusCode values
+KIND_INTERNAL = 1
+KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current = contextvars.ContextVar("xero_payroll_span", default=None)
+
+
+class Span:
+    """
+    One timed step of a webhook. Spans nest through a context variable: a span started
+    while another is current becomes its child and shares its trace id.
+    """
+
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent", "root", "attributes",
+                 "start_ns", "end_ns", "status", "status_message", "_token")
+
+    def __init__(self, name: str, parent=None, kind: int = KIND_INTERNAL, attributes=None):
+        self.name = name
+        self.kind = kind
+        self.parent = parent
+        self.root = parent.root if parent is not None else self
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = None
+        self.status_message = None
+        self._token = None
+
+    def set_attribute(self, key: str, value):
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_error(self, message):
+        self.status = STATUS_ERROR
+        self.status_message = str(message)
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None and self.status is None:
+            self.set_error(f"{exc_type.__name__}: {exc}")
+        _current.reset(self._token)
+        self.end()
+        return False
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            exporter.finished(self)
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": self.status or STATUS_OK},
+        }
+        if self.parent is not None:
+            span["parentSpanId"] = self.parent.span_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+
+class _NoopSpan:
+    """Stands in for Span while tracing is disabled."""
+
+    __slots__ = ()
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_error(self, message):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class FileExporter:
+    """
+    Buffers finished spans and appends them to a file as OTLP/JSON lines. Spans are
+    written when their trace's local root span ends; spans that finish after that (e.g.
+    the status update sent by the background outbox) are written as they end.
+    """
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def finished(self, span: Span):
+        with self._lock:
+            self._pending.append(span)
+        if span.root.end_ns is not None:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            spans, self._pending = self._pending, []
+        if not spans:
+            return
+        request = {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": SERVICE_NAME}},
+                    {"key": "process.pid", "value": {"intValue": str(os.getpid())}},
+                ]},
+                "scopeSpans": [{"scope": {"name": "xero_payroll"}, "spans": [span.to_otlp() for span in spans]}],
+            }]
+        }
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with locked(self.path + ".lock"), open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(request) + "\n")
+        except OSError as e:
+            # Tracing must never take a webhook down with it
+            print(f"Warning: Could not write trace spans to {self.path}: {e}")
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+# Module-wide exporter, None when tracing is disabled
+exporter = FileExporter(TRACE_FILE) if TRACE_FILE else None
+
+if exporter is not None:
+    atexit.register(exporter.flush)
+
+
+def enabled() -> bool:
+    return exporter is not None
+
+
+def span(name: str, kind: int = KIND_INTERNAL, **attributes):
+    """
+    Starts a span as a context manager, child of the current span if there is one:
+
+        with tracing.span("wrike.get_task", **{"wrike.task_id": task_id}) as span:
+            ...
+            span.set_attribute("http.status_code", 200)
+
+    Returns a shared no-op span while tracing is disabled.
+    """
+    if exporter is None:
+        return NOOP_SPAN
+    return Span(name, _current.get(), kind, attributes)
+
+
+def current_span():
+    """The span currently open in this context (None if none, or tracing is disabled)."""
+    return _current.get()
+
+
+def current_or_noop():
+    """Like current_span, but a no-op span rather than None, for setting attributes unconditionally."""
+    return _current.get() or NOOP_SPAN
+
+
+class use_span:
+    """Makes `parent` the current span for a block, e.g. in a worker thread doing work for it."""
+
+    def __init__(self, parent):
+        self.parent = parent
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current.set(self.parent)
+        return self.parent
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        return False
+
+
+def propagate(func):
+    """
+    Wraps `func` so it runs under the span current at wrap time, for thread pools (which,
+    unlike asyncio.to_thread, don't carry context variables into their workers).
+    """
+    if exporter is None:
+        return func
+    parent = _current.get()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with use_span(parent):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def traced(name: str = None, kind: int = KIND_INTERNAL):
+    """
+    Decorator (for functions and coroutines) running each call in a span named after the
+    function. Returns the function unchanged while tracing is disabled.
+    """
+    def decorate(func):
+        if exporter is None:
+            return func
+        import inspect
+
+        span_name = name or func.__name__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with Span(span_name, _current.get(), kind):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(span_name, _current.get(), kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
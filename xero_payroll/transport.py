@@ -0,0 +1,136 @@
+# transport.py
+
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Hosts the Xero client talks to by default (XeroAPI passes the configured API root and
+# token URL instead); each gets its own keep-alive pool on the shared adapter
+XERO_HOSTS = ("https://api.xero.com", "https://identity.xero.com")
+
+# Connections kept open per host. Covers the rate limiter's 5 concurrent calls plus page prefetching.
+POOL_MAXSIZE = 10
+
+# Retries for connection resets and 5xx answers. Only idempotent methods are retried once the
+# request has been sent, so a POST is never applied twice; nor is a PUT, which creates records
+# in the Payroll AU API. 429 is left to the rate limiter.
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 0.5
+RETRY_JITTER = 0.5
+RETRY_STATUSES = (500, 502, 503, 504)
+RETRY_METHODS = frozenset(["GET", "HEAD", "DELETE", "OPTIONS"])
+
+# (connect, read) timeouts in seconds. Large paged collections get longer to answer than
+# single records, the token endpoint less.
+DEFAULT_TIMEOUT = (5, 30)
+ENDPOINT_TIMEOUTS = {
+    "Employees": (5, 60),
+    "LeaveApplications": (5, 60),
+    "connect/token": (5, 15),
+}
+
+
+def make_retry(total: int = RETRY_TOTAL, backoff_factor: float = RETRY_BACKOFF, jitter: float = RETRY_JITTER) -> Retry:
+    """Retry policy for Xero calls: exponential backoff with jitter, so parallel workers don't retry in lockstep."""
+    kwargs = dict(
+        total=total,
+        connect=total,
+        read=total,
+        status=total,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=RETRY_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,  # hand the last response back so callers' raise_for_status still applies
+    )
+    try:
+        return Retry(backoff_jitter=jitter, **kwargs)
+    except TypeError:  # urllib3 < 2 has no backoff_jitter
+        return Retry(**kwargs)
+
+
+def timeout_for(endpoint: str, timeouts=None, default=DEFAULT_TIMEOUT):
+    """(connect, read) timeout for a payroll endpoint such as "Employees/{id}" or a full URL."""
+    path = urlsplit(endpoint).path if "://" in endpoint else endpoint
+    for name, timeout in (ENDPOINT_TIMEOUTS if timeouts is None else timeouts).items():
+        if path.strip("/").endswith(name):
+            return timeout
+    return default
+
+
+def host_prefix(url: str) -> str:
+    """The scheme://host[:port] part of a URL, the prefix requests matches mounted adapters by."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class XeroTransport(HTTPAdapter):
+    """
+    HTTPAdapter for the Xero hosts: pooled keep-alive connections, jittered retries and a
+    default timeout for calls that don't pass one (e.g. OAuth2Session's token refresh).
+    Mount one instance on every session that talks to Xero so they share the pools.
+    """
+
+    def __init__(self, pool_maxsize: int = POOL_MAXSIZE, max_retries=None, default_timeout=DEFAULT_TIMEOUT, timeouts=None,
+                 hosts=XERO_HOSTS):
+        """
+        Args:
+            pool_maxsize (int): Keep-alive connections kept per host
+            max_retries (Retry, optional): Retry policy, defaults to make_retry()
+            default_timeout (tuple): (connect, read) timeout for requests sent without one
+            timeouts (dict, optional): Per-endpoint (connect, read) timeouts, defaults to ENDPOINT_TIMEOUTS
+            hosts (tuple): URLs whose scheme://host[:port] prefixes mount_on routes through this transport
+        """
+        self.default_timeout = default_timeout
+        self.timeouts = dict(ENDPOINT_TIMEOUTS if timeouts is None else timeouts)
+        self.hosts = tuple(dict.fromkeys(host_prefix(url) for url in hosts))
+        super().__init__(
+            pool_connections=len(self.hosts) + 2,
+            pool_maxsize=pool_maxsize,
+            max_retries=max_retries if max_retries is not None else make_retry(),
+        )
+
+    def send(self, request, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = self.default_timeout
+        return super().send(request, timeout=timeout, **kwargs)
+
+    def timeout_for(self, endpoint: str):
+        """(connect, read) timeout this transport uses for an endpoint or URL."""
+        return timeout_for(endpoint, self.timeouts, self.default_timeout)
+
+    def mount_on(self, session):
+        """Mounts this transport on a requests session for its hosts and asks for gzip responses."""
+        for host in self.hosts:
+            session.mount(host, self)
+        session.headers["Accept-Encoding"] = "gzip, deflate"
+        return session
+
+    def stats(self) -> dict:
+        """
+        Connection reuse per host, from urllib3's pool counters.
+
+        Returns:
+            dict: {host: {"requests", "connections", "reused"}} plus a "total" entry; "connections"
+                  is the number of TCP/TLS connections opened, so reused == requests - connections
+        """
+        result = {}
+        total = {"requests": 0, "connections": 0, "reused": 0}
+        pools = self.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_sent = pool.num_requests
+            connections = pool.num_connections
+            entry = {
+                "requests": requests_sent,
+                "connections": connections,
+                "reused": max(0, requests_sent - connections),
+            }
+            result[f"{pool.scheme}://{pool.host}"] = entry
+            for name in total:
+                total[name] += entry[name]
+        result["total"] = total
+        return result